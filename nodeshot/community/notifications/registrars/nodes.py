@@ -3,12 +3,12 @@ from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
-from nodeshot.core.nodes.signals import node_status_changed
-from nodeshot.core.nodes.models import Node
+from nodeshot.core.nodes.signals import node_status_changed, nodes_bulk_created, nodes_bulk_updated
+from nodeshot.core.nodes.models import Node, Status
 
 from ..settings import settings
 from ..models import Notification
-from ..tasks import create_notifications
+from ..tasks import create_notifications, create_many_notifications
 
 
 base_queryset = User.objects.filter(is_active=True)
@@ -37,6 +37,14 @@ def node_created_handler(sender, **kwargs):
         })
 
 
+@receiver(nodes_bulk_created, sender=Node)
+def nodes_bulk_created_handler(sender, instances, **kwargs):
+    """ same as node_created_handler for nodes created in bulk (one background job) """
+    create_many_notifications.delay(Notification, [
+        (exclude_owner_of_node(obj), "node_created", obj) for obj in instances
+    ])
+
+
 # ------ NODE STATUS CHANGED ------ #
 
 @receiver(node_status_changed)
@@ -63,6 +71,39 @@ def node_status_changed_handler(**kwargs):
         })
 
 
+def status_changed_notifications(obj, old_status, new_status):
+    """ returns the notifications of a status change (see create_many_notifications) """
+    obj.old_status = old_status.name
+    obj.new_status = new_status.name
+    notifications = [(exclude_owner_of_node(obj), "node_status_changed", obj)]
+    # if node has owner send a different notification to him
+    if obj.user_id is not None:
+        notifications.append(([obj.user], "node_own_status_changed", obj))
+    return notifications
+
+
+def bulk_status_changed_notifications(instances, old_statuses):
+    """ returns the notifications of the nodes updated in bulk whose status has changed """
+    notifications = []
+    for obj in instances:
+        old_status_id = old_statuses.get(obj.pk)
+        if not obj.status_id or not old_status_id or obj.status_id == old_status_id:
+            continue
+        old_status = Status.get_cached(pk=old_status_id)
+        new_status = Status.get_cached(pk=obj.status_id)
+        if old_status is not None and new_status is not None:
+            notifications += status_changed_notifications(obj, old_status, new_status)
+    return notifications
+
+
+@receiver(nodes_bulk_updated, sender=Node)
+def nodes_bulk_updated_handler(sender, instances, old_statuses, **kwargs):
+    """ same as node_status_changed_handler for nodes updated in bulk (one background job) """
+    notifications = bulk_status_changed_notifications(instances, old_statuses)
+    if notifications:
+        create_many_notifications.delay(Notification, notifications)
+
+
 # ------ NODE DELETED ------ #
 
 @receiver(pre_delete, sender=Node)
@@ -83,22 +124,58 @@ def node_deleted_handler(sender, **kwargs):
 def disconnect():
     """ disconnect signals """
     post_save.disconnect(node_created_handler, sender=Node)
+    nodes_bulk_created.disconnect(nodes_bulk_created_handler, sender=Node)
     node_status_changed.disconnect(node_status_changed_handler)
+    nodes_bulk_updated.disconnect(nodes_bulk_updated_handler, sender=Node)
     pre_delete.disconnect(node_deleted_handler, sender=Node)
 
 
 def reconnect():
     """ reconnect signals """
     post_save.connect(node_created_handler, sender=Node)
+    nodes_bulk_created.connect(nodes_bulk_created_handler, sender=Node)
     node_status_changed.connect(node_status_changed_handler)
+    nodes_bulk_updated.connect(nodes_bulk_updated_handler, sender=Node)
     pre_delete.connect(node_deleted_handler, sender=Node)
 
 
+# ------ BATCH UTILITY ------ #
+
+def batch(events):
+    """ creates the notifications of all the events buffered by nodeshot_batch in one background job """
+    notifications = []
+    for signal, kwargs in events:
+        if signal is post_save and kwargs['created']:
+            obj = kwargs['instance']
+            notifications.append((exclude_owner_of_node(obj), "node_created", obj))
+        elif signal is nodes_bulk_created:
+            notifications += [(exclude_owner_of_node(obj), "node_created", obj) for obj in kwargs['instances']]
+        elif signal is node_status_changed:
+            notifications += status_changed_notifications(kwargs['instance'],
+                                                          kwargs['old_status'],
+                                                          kwargs['new_status'])
+        elif signal is nodes_bulk_updated:
+            notifications += bulk_status_changed_notifications(kwargs['instances'], kwargs['old_statuses'])
+        elif signal is pre_delete:
+            obj = kwargs['instance']
+            notifications.append((exclude_owner_of_node(obj), "node_deleted", obj))
+    if notifications:
+        create_many_notifications.delay(Notification, notifications)
+
+
 from nodeshot.core.base.settings import DISCONNECTABLE_SIGNALS
 DISCONNECTABLE_SIGNALS.append(
     {
         'disconnect': disconnect,
-        'reconnect': reconnect
+        'reconnect': reconnect,
+        'receivers': [
+            (post_save, node_created_handler, Node),
+            (nodes_bulk_created, nodes_bulk_created_handler, Node),
+            (node_status_changed, node_status_changed_handler, None),
+            (nodes_bulk_updated, nodes_bulk_updated_handler, Node),
+            (pre_delete, node_deleted_handler, Node)
+        ],
+        'batch': batch
     }
 )
 setattr(settings, 'NODESHOT_DISCONNECTABLE_SIGNALS', DISCONNECTABLE_SIGNALS)
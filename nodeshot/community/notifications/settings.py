@@ -13,9 +13,9 @@ REGISTER = getattr(settings, 'NODESHOT_NOTIFICATIONS_REGISTER', ('nodeshot.commu
 # boolean: users can only turn on or off
 # distance: users can turn off (-1), turn on for all (0) or set a range of km (n)
 USER_SETTING = getattr(settings, 'NODESHOT_NOTIFICATIONS_USER_SETTING', {
-    'node_created':             { 'type': 'distance', 'geo_field': 'geometry' },
-    'node_status_changed':      { 'type': 'distance', 'geo_field': 'geometry' },
-    'node_deleted':             { 'type': 'distance', 'geo_field': 'geometry' },
+    'node_created':             { 'type': 'distance', 'geo_field': 'representative_point' },
+    'node_status_changed':      { 'type': 'distance', 'geo_field': 'representative_point' },
+    'node_deleted':             { 'type': 'distance', 'geo_field': 'representative_point' },
     'node_own_status_changed':  { 'type': 'boolean' },
 })
 DEFAULT_BOOLEAN = getattr(settings, 'NODESHOT_NOTIFICATIONS_DEFAULT_BOOLEAN', True)
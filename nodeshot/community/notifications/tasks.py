@@ -40,3 +40,14 @@ def create_notifications(users, notification_model, notification_type, related_o
             n.related_object = related_object
         # create notification and send according to user settings
         n.save()
+
+
+@task
+def create_many_notifications(notification_model, notifications):
+    """
+    same as create_notifications for many related objects in one background job
+
+    :param notifications: list of (users, notification_type, related_object) tuples
+    """
+    for users, notification_type, related_object in notifications:
+        create_notifications(users, notification_model, notification_type, related_object)
@@ -8,7 +8,7 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 from nodeshot.core.base.tests import user_fixtures, BaseTestCase
-from nodeshot.core.base.utils import ago
+from nodeshot.core.base.utils import ago, now
 from nodeshot.core.nodes.models import Node
 
 from .models import *
@@ -138,6 +138,63 @@ class TestNotification(BaseTestCase):
             # ensure owner notification object for owner has not been created in DB
             self.assertEqual(Notification.objects.filter(to_user_id=1).count(), 0)
 
+        def test_nodes_bulk_created_to_all(self):
+            from nodeshot.core.nodes.bulk import bulk_create_nodes
+            all_users = User.objects.all()
+
+            for user in all_users:
+                user.email_notification_settings.node_created = 0
+                user.email_notification_settings.save()
+                user.web_notification_settings.node_created = 0
+                user.web_notification_settings.save()
+
+            date = now()
+            bulk_create_nodes([Node(**{
+                'name': 'test notification %d' % i,
+                'slug': 'test-notification-%d' % i,
+                'layer_id': 1,
+                'geometry': 'POINT (-2.46 48.12)',
+                'user_id': 1,
+                'added': date,
+                'updated': date
+            }) for i in range(2)])
+
+            # all users except the owner have been notified about each node
+            self.assertEqual(Notification.objects.filter(type='node_created').count(), (all_users.count() - 1) * 2)
+            self.assertEqual(Notification.objects.filter(to_user_id=1).count(), 0)
+
+        def test_nodes_created_in_batch(self):
+            from nodeshot.core.base.utils import nodeshot_batch
+            from . import tasks
+            all_users = User.objects.all()
+
+            for user in all_users:
+                user.email_notification_settings.node_created = 0
+                user.email_notification_settings.save()
+                user.web_notification_settings.node_created = 0
+                user.web_notification_settings.save()
+
+            jobs = []
+            delay = tasks.create_many_notifications.delay
+            tasks.create_many_notifications.delay = lambda *args: jobs.append(args) or delay(*args)
+            try:
+                with nodeshot_batch():
+                    for i in range(2):
+                        Node.objects.create(**{
+                            'name': 'test notification %d' % i,
+                            'slug': 'test-notification-%d' % i,
+                            'layer_id': 1,
+                            'geometry': 'POINT (-2.46 48.12)',
+                            'user_id': 1
+                        })
+                    self.assertEqual(Notification.objects.count(), 0)
+            finally:
+                tasks.create_many_notifications.delay = delay
+
+            # one background job for all the nodes
+            self.assertEqual(len(jobs), 1)
+            self.assertEqual(Notification.objects.filter(type='node_created').count(), (all_users.count() - 1) * 2)
+
         def test_node_created_to_all_web_noone_mail(self):
             all_users = User.objects.all()
 
@@ -544,6 +601,34 @@ class TestNotification(BaseTestCase):
             self.assertEqual(notification.to_user_id, 1)
             self.assertEqual(len(mail.outbox), 8)  # all users have received emails
 
+        def test_nodes_bulk_updated_status_changed(self):
+            from nodeshot.core.nodes.bulk import bulk_update_nodes
+            all_users = User.objects.all()
+
+            for user in all_users:
+                user.email_notification_settings.node_status_changed = 0
+                user.email_notification_settings.save()
+                user.web_notification_settings.node_created = -1
+                user.web_notification_settings.node_status_changed = 0
+                user.web_notification_settings.save()
+
+            node = Node.objects.create(**{
+                'name': 'test notification',
+                'slug': 'test-notification',
+                'layer_id': 1,
+                'geometry': 'POINT (-2.46 48.12)',
+                'user_id': 1
+            })
+            Notification.objects.all().delete()
+            # nodes whose status has not changed are not notified
+            unchanged = Node.objects.get(pk=node.pk)
+            node.status_id = 3
+            bulk_update_nodes([node, unchanged])
+
+            self.assertEqual(Notification.objects.filter(type='node_status_changed').count(), all_users.count()-1)
+            notification = Notification.objects.get(type='node_own_status_changed')
+            self.assertEqual(notification.to_user_id, 1)
+
         def test_node_status_changed_all_email_noone_web(self):
             all_users = User.objects.all()
 
@@ -753,6 +838,19 @@ class TestNotification(BaseTestCase):
             response = self.client.get(url, { 'action': 'doesntexist' })
             self.assertEquals(30, len(response.data))
 
+        def test_notifications_cursor_pagination_API(self):
+            url = reverse('api_notification_list')
+            for i in range(1, 8):
+                Notification.objects.create(to_user_id=4, type='custom', text='notification n. %d' % i)
+            # notifications of other users are not listed
+            Notification.objects.create(to_user_id=1, type='custom', text='not listed')
+            self.client.login(username='romano', password='tester')
+            expected = Notification.objects.filter(to_user_id=4).order_by('-id').values_list('id', flat=True)
+            self.assertCursorPagination(url, expected, action='all', limit=3)
+            # the cursor implies action=all and does not mark notifications as read
+            self.assertCursorPagination(url, expected, limit=3)
+            self.assertEqual(Notification.objects.filter(to_user_id=4, is_read=False).count(), 7)
+
         def test_notification_detail_API(self):
             # set user #4 to receive notifications
             user = User.objects.get(pk=4)
@@ -3,11 +3,13 @@ from django.http import Http404
 from rest_framework import generics, permissions, authentication
 from rest_framework.response import Response
 
+from nodeshot.core.base.mixins import CursorPaginationMixin
+
 from .models import *
 from .serializers import *
 
 
-class NotificationList(generics.ListAPIView):
+class NotificationList(CursorPaginationMixin, generics.ListAPIView):
     """
     Retrieve a list of notifications of the current user.
 
@@ -19,6 +21,8 @@ class NotificationList(generics.ListAPIView):
      * `action=all`: retrieve all notifications with pagination
         * `limit=<n>`: specify number of items per page (defaults to 30)
         * `limit=0`: turns off pagination
+        * `cursor`: paginate by cursor (newest first), follow the `next` and `previous` links
+     * `cursor`: same as `action=all&cursor` (unless another action is specified)
     """
     authentication_classes = (authentication.SessionAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
@@ -27,6 +31,7 @@ class NotificationList(generics.ListAPIView):
     serializer_class = NotificationSerializer
     pagination_serializer_class = PaginatedNotificationSerializer
     queryset = Notification.objects.select_related('from_user')
+    cursor_ordering = ('-id',)
 
     def get_queryset(self):
         """ filter only notifications of current user """
@@ -34,7 +39,9 @@ class NotificationList(generics.ListAPIView):
 
     def get(self, request, format=None):
         """ get HTTP method """
-        action = request.QUERY_PARAMS.get('action', 'unread')
+        # the cursor is meaningful only for the list of all notifications
+        default = 'all' if self.cursor_query_param in request.QUERY_PARAMS else 'unread'
+        action = request.QUERY_PARAMS.get('action', default)
         # action can be only "unread" (default), "count" and "all"
         action = action if action == 'count' or action == 'all' else 'unread'
         # mark as read parameter, defaults to true
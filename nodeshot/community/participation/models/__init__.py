@@ -139,8 +139,9 @@ Node.comments_allowed = _comments_allowed
 
 from django.dispatch import receiver
 from django.db.models.signals import post_save
+from nodeshot.core.nodes.signals import nodes_bulk_created
 
-from ..tasks import create_related_object
+from ..tasks import create_related_object, create_related_objects
 
 
 @receiver(post_save, sender=Node)
@@ -156,6 +157,13 @@ def create_node_rating_counts_settings(sender, **kwargs):
         create_related_object.delay(NodeParticipationSettings, {'node': node})
 
 
+@receiver(nodes_bulk_created, sender=Node)
+def create_bulk_node_rating_counts_settings(sender, instances, **kwargs):
+    """ create rating counts and settings of nodes created in bulk with two queries """
+    create_related_objects.delay(NodeRatingCount, [{'node': node} for node in instances])
+    create_related_objects.delay(NodeParticipationSettings, [{'node': node} for node in instances])
+
+
 @receiver(post_save, sender=Layer)
 def create_layer_rating_settings(sender, **kwargs):
     """ create layer rating settings """
@@ -166,3 +174,47 @@ def create_layer_rating_settings(sender, **kwargs):
         # task will be executed in background unless settings.CELERY_ALWAYS_EAGER is True
         # if CELERY_ALWAYS_EAGER is False celery worker must be running otherwise task won't be executed
         create_related_object.delay(LayerParticipationSettings, {'layer': layer})
+
+
+# ------ DISCONNECT UTILITY ------ #
+
+def disconnect():
+    """ disconnect signals """
+    post_save.disconnect(create_node_rating_counts_settings, sender=Node)
+    nodes_bulk_created.disconnect(create_bulk_node_rating_counts_settings, sender=Node)
+
+
+def reconnect():
+    """ reconnect signals """
+    post_save.connect(create_node_rating_counts_settings, sender=Node)
+    nodes_bulk_created.connect(create_bulk_node_rating_counts_settings, sender=Node)
+
+
+def batch(events):
+    """ creates rating counts and settings of the nodes created inside nodeshot_batch in two queries """
+    nodes = []
+    for signal, kwargs in events:
+        if signal is post_save and kwargs['created']:
+            nodes.append(kwargs['instance'])
+        elif signal is nodes_bulk_created:
+            nodes += kwargs['instances']
+    if nodes:
+        create_related_objects.delay(NodeRatingCount, [{'node': node} for node in nodes])
+        create_related_objects.delay(NodeParticipationSettings, [{'node': node} for node in nodes])
+
+
+from nodeshot.core.base.settings import DISCONNECTABLE_SIGNALS
+DISCONNECTABLE_SIGNALS.append(
+    {
+        'disconnect': disconnect,
+        'reconnect': reconnect,
+        'receivers': [
+            (post_save, create_node_rating_counts_settings, Node),
+            (nodes_bulk_created, create_bulk_node_rating_counts_settings, Node)
+        ],
+        'batch': batch,
+        # not disconnected by pause_disconnectable_signals
+        'critical': True
+    }
+)
+setattr(settings, 'NODESHOT_DISCONNECTABLE_SIGNALS', DISCONNECTABLE_SIGNALS)
@@ -179,7 +179,9 @@ ExtensibleNodeSerializer.add_relationship(
 ExtensibleNodeSerializer.add_relationship(
     'counts',
     serializer=ParticipationSerializer,
-    queryset=lambda obj, request: obj.noderatingcount
+    queryset=lambda obj, request: obj.noderatingcount,
+    batch=lambda ids, request: NodeRatingCount.objects.filter(node_id__in=ids),
+    batch_key='node_id'
 )
 
 ExtensibleNodeSerializer.add_relationship(
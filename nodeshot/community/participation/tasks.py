@@ -9,4 +9,11 @@ def create_related_object(model, kwargs):
     """
     create object with specified kwargs in background
     """
-    model.objects.create(**kwargs)
\ No newline at end of file
+    model.objects.create(**kwargs)
+
+@task
+def create_related_objects(model, kwargs_list):
+    """
+    create many objects of the same model in background with one query
+    """
+    model.objects.bulk_create([model(**kwargs) for kwargs in kwargs_list])
@@ -34,6 +34,33 @@ class ParticipationTests(TestCase):
         node.participation_settings
         node.layer.participation_settings
 
+    def test_bulk_created_nodes(self):
+        """ rating counts and settings of nodes created in bulk are created too """
+        from django.contrib.gis.geos import GEOSGeometry
+        from nodeshot.core.nodes.bulk import bulk_create_nodes
+        from .models import NodeRatingCount, NodeParticipationSettings
+        layer = Layer.objects.get(slug='rome')
+        nodes = bulk_create_nodes([
+            Node(name='bulk one', slug='bulk-one', layer=layer, geometry=GEOSGeometry('POINT (12.51 41.89)')),
+            Node(name='bulk two', slug='bulk-two', layer=layer, geometry=GEOSGeometry('POINT (12.52 41.9)'))
+        ])
+        ids = [node.pk for node in nodes]
+        self.assertEqual(NodeRatingCount.objects.filter(node__in=ids).count(), 2)
+        self.assertEqual(NodeParticipationSettings.objects.filter(node__in=ids).count(), 2)
+
+    def test_node_created_and_deleted_in_batch(self):
+        """ nothing is created for nodes which are deleted in the same batch """
+        from django.contrib.gis.geos import GEOSGeometry
+        from nodeshot.core.base.utils import nodeshot_batch
+        from .models import NodeRatingCount
+        count = NodeRatingCount.objects.count()
+        with nodeshot_batch():
+            node = Node(name='batch', layer=Layer.objects.get(slug='rome'),
+                        geometry=GEOSGeometry('POINT (12.51 41.89)'))
+            node.save()
+            node.delete()
+        self.assertEqual(NodeRatingCount.objects.count(), count)
+
     def test_update_comment_count(self):
         """
         Comment count should be updated when a comment is created or deleted
@@ -1,9 +1,18 @@
 """
 utilities for caching
 """
+import uuid
+from threading import local
+from contextlib import contextmanager
+
 from django.core.cache import cache
 
 
+TAG_KEY = 'cache-tag:%s'
+USER_GROUP_KEY = 'user-group:%s'
+_deferred = local()
+
+
 def cache_delete_pattern_or_all(pattern):
     # clear only cached pages if supported
     if hasattr(cache, 'delete_pattern'):
@@ -13,6 +22,49 @@ def cache_delete_pattern_or_all(pattern):
         cache.clear()
 
 
+def get_user_group_name(user):
+    """
+    Returns the name of the group of an authenticated user (the one with higher id)
+    or None if the user does not belong to any group.
+
+    The result is memoized on the user instance, which is shared by the whole request,
+    and stored in the cache until the groups of the user change (see clear_user_group_cache)
+    """
+    try:
+        return user._group_name
+    except AttributeError:
+        pass
+    key = USER_GROUP_KEY % user.pk
+    name = cache.get(key)
+    if name is None:
+        group = user.groups.all().order_by('-id').first()
+        # empty string means no group, None means not cached
+        name = group.name if group else ''
+        cache.set(key, name)
+    user._group_name = name or None
+    return user._group_name
+
+
+def clear_user_group_cache(user_ids):
+    """ deletes the cached group of the specified users """
+    cache.delete_many([USER_GROUP_KEY % user_id for user_id in user_ids])
+
+
+def get_group_name(request):
+    """
+    Returns the name of the group used to build cache keys:
+        * public
+        * superuser
+        * the rest are retrieved from DB (registered, community, trusted are the default ones)
+    """
+    if request.user.is_anonymous():
+        return 'public'
+    elif request.user.is_superuser:
+        return 'superuser'
+    else:
+        return get_user_group_name(request.user) or 'public'
+
+
 def cache_by_group(view_instance, view_method, request, args, kwargs):
     """
     Cache view response by media type and user group.
@@ -23,21 +75,95 @@ def cache_by_group(view_instance, view_method, request, args, kwargs):
         * superuser
         * the rest are retrieved from DB (registered, community, trusted are the default ones)
     """
-    if request.user.is_anonymous():
-        group = 'public'
-    elif request.user.is_superuser:
-        group = 'superuser'
-    else:
-        try:
-            group = request.user.groups.all().order_by('-id').first().name
-        except IndexError:
-            group = 'public'
-
     key = '%s:%s.%s.%s' % (
         view_instance.__class__.__name__,
         request.META['PATH_INFO'],
-        group,
+        get_group_name(request),
         request.accepted_media_type
     )
 
     return key
+
+
+def cache_by_group_and_querystring(view_instance, view_method, request, args, kwargs):
+    """
+    Same as cache_by_group but takes into account also the querystring,
+    needed for views which accept filtering parameters.
+    The cache_key is constructed this way: "{view_name:path?querystring.group.media_type}"
+    EG: "NodeTileList:/api/v1/nodes/tiles/0/0/0.mvt?layers=rome.public.application/vnd.mapbox-vector-tile"
+    """
+    key = '%s:%s?%s.%s.%s' % (
+        view_instance.__class__.__name__,
+        request.META['PATH_INFO'],
+        request.META.get('QUERY_STRING', ''),
+        get_group_name(request),
+        request.accepted_media_type
+    )
+
+    return key
+
+
+# ------ Tags ------ #
+
+
+def get_tags_version(tags):
+    """
+    Returns a string representing the current version of the specified tags.
+    Tags which are not in the cache yet (or have been evicted) get a new version.
+    """
+    keys = [TAG_KEY % tag for tag in tags]
+    versions = cache.get_many(keys)
+    missing = dict((key, uuid.uuid4().hex) for key in keys if key not in versions)
+    if missing:
+        cache.set_many(missing)
+        versions.update(missing)
+    return '.'.join(versions[key] for key in keys)
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidates the cache entries marked with the specified tags by changing the version of the tags,
+    old entries are not deleted but won't be retrieved anymore and will expire on their own.
+    If called inside deferred_invalidation the tags are invalidated at the end of the block.
+    """
+    pending = getattr(_deferred, 'tags', None)
+    if pending is not None:
+        pending.update(tags)
+        return
+    cache.set_many(dict((TAG_KEY % tag, uuid.uuid4().hex) for tag in tags))
+
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Collects the tags invalidated inside the block and invalidates them only once at the end.
+    Use when managing large chunks of objects, eg:
+
+        with deferred_invalidation():
+            for node in nodes:
+                node.save()
+    """
+    # nested blocks are flushed by the outer one
+    if getattr(_deferred, 'tags', None) is not None:
+        yield
+        return
+    _deferred.tags = set()
+    try:
+        yield
+    finally:
+        tags = _deferred.tags
+        _deferred.tags = None
+        if tags:
+            invalidate_tags(*tags)
+
+
+def tagged(key_func):
+    """
+    Appends the version of the tags returned by view_instance.get_cache_tags()
+    to the cache key built by key_func, so cached responses can be invalidated with invalidate_tags.
+    EG: cache_response(86400, key_func=tagged(cache_by_group))
+    """
+    def tagged_key_func(view_instance, view_method, request, args, kwargs):
+        key = key_func(view_instance, view_method, request, args, kwargs)
+        return '%s.%s' % (key, get_tags_version(view_instance.get_cache_tags()))
+    return tagged_key_func
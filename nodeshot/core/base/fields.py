@@ -121,8 +121,26 @@ class RGBColorField(models.CharField):
         return super(RGBColorField, self).formfield(**kwargs)
 
 
+class TSVectorField(models.Field):
+    """
+    PostgreSQL full text search vector (tsvector),
+    the value is computed by the database and is not editable
+    """
+    description = 'PostgreSQL full text search vector'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('serialize', False)
+        super(TSVectorField, self).__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        return 'tsvector'
+
+
 # needed for South compatibility
 if 'south' in settings.INSTALLED_APPS:
     from south.modelsinspector import add_introspection_rules
     add_introspection_rules([], ["^coop\.utils\.fields\.MultiSelectField"])
-    add_introspection_rules([], ["^nodeshot\.core\.base\.fields\.RGBColorField"])
\ No newline at end of file
+    add_introspection_rules([], ["^nodeshot\.core\.base\.fields\.RGBColorField"])
+    add_introspection_rules([], ["^nodeshot\.core\.base\.fields\.TSVectorField"])
\ No newline at end of file
@@ -7,6 +7,7 @@ from django_hstore.query import HStoreQuerySet, HStoreGeoQuerySet
 from django_hstore.managers import HStoreManager, HStoreGeoManager
 
 from nodeshot.core.base.choices import ACCESS_LEVELS
+from nodeshot.core.base.cache import get_user_group_name
 
 
 # -------- MIXINS -------- #
@@ -66,9 +67,9 @@ class ACLMixin(BaseUtilityMixin):
             except AttributeError:
                 queryset = self
         elif user.is_authenticated():
-            # get user group (higher id)
-            group = user.groups.all().order_by('-id')[0]
-            queryset = self.filter(access_level__lte=ACCESS_LEVELS.get(group.name))
+            # get user group (higher id), retrieved only once per request
+            group_name = get_user_group_name(user) or 'public'
+            queryset = self.filter(access_level__lte=ACCESS_LEVELS.get(group_name))
         else:
             queryset = self.filter(access_level__lte=ACCESS_LEVELS.get('public'))
         return queryset
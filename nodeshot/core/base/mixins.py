@@ -2,8 +2,27 @@
 reusable restframework mixins for API views
 """
 
+import hashlib
+import base64
+import simplejson as json
+from calendar import timegm
+
 import reversion
+from django.http import StreamingHttpResponse
+from django.db.models import Max, Count, Q
+from django.utils.http import http_date, parse_etags, quote_etag, parse_http_date_safe
+from django.utils.cache import patch_vary_headers
+from django.utils.datastructures import SortedDict
+from django.utils.translation import ugettext_lazy as _
+from django.core.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ParseError
+from rest_framework.templatetags.rest_framework import replace_query_param
+
+from .settings import GEOJSON_STREAMING, GEOJSON_STREAMING_CHUNK_SIZE
+from .utils import queryset_iterator
+from .cache import get_group_name, get_tags_version
 
 
 class ACLMixin(object):
@@ -19,6 +38,189 @@ class ACLMixin(object):
         return self.queryset.accessible_to(user=self.request.user)
 
 
+class StreamingGeoJSONMixin(object):
+    """
+    Streams unpaginated GeoJSON FeatureCollections one feature at a time,
+    so memory usage does not grow with the number of records.
+
+    Paginated responses and formats different than JSON are rendered as usual.
+    Must be used with a GeoFeatureModelSerializer.
+    """
+    streaming = GEOJSON_STREAMING
+    streaming_chunk_size = GEOJSON_STREAMING_CHUNK_SIZE
+
+    def is_streamable(self):
+        """ stream only if enabled, if pagination is off and if JSON has been requested """
+        return (self.streaming and
+                not self.get_paginate_by() and
+                isinstance(self.request.accepted_renderer, JSONRenderer))
+
+    def get_features(self, queryset):
+        """ generator that yields the serialized features of queryset one by one """
+        for obj in queryset_iterator(queryset, self.streaming_chunk_size):
+            yield self.get_serializer(obj).data
+
+    def stream_features(self, queryset):
+        """ generator that yields the FeatureCollection chunk by chunk """
+        renderer = JSONRenderer()
+        yield '{"type": "FeatureCollection", "features": ['
+        separator = ''
+        for feature in self.get_features(queryset):
+            yield separator + renderer.render(feature)
+            separator = ', '
+        yield ']}'
+
+    def list(self, request, *args, **kwargs):
+        """ stream response if possible """
+        if not self.is_streamable():
+            return super(StreamingGeoJSONMixin, self).list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_features(queryset),
+                                     content_type=self.request.accepted_renderer.media_type)
+
+
+class ConditionalGetMixin(object):
+    """
+    Answers conditional GET requests (If-None-Match and If-Modified-Since) of collections
+    with "304 Not Modified" without serializing the collection.
+
+    The version of the collection is derived from the most recent "updated" date,
+    from the number of records of the filtered queryset, from the group of the user
+    (see nodeshot.core.base.cache.get_group_name) and from the version of the tags
+    returned by get_cache_tags, which must be invalidated when related data change
+    (eg: the name of the layer of a node) or when records are updated in bulk.
+    If-Modified-Since considers only the "updated" date, clients should prefer If-None-Match.
+    Without a persistent cache backend tags get a new version at each request, hence the etag changes too.
+    Model must inherit BaseDate and views must implement get_cache_tags!
+    """
+    conditional = True
+
+    def get_collection_version(self, queryset):
+        """ returns a tuple containing the etag and the last modification date of queryset """
+        version = queryset.order_by().aggregate(last_modified=Max('updated'), count=Count('pk'))
+        last_modified = version['last_modified']
+        etag = hashlib.md5('%s-%s-%s-%s-%s' % (
+            version['count'],
+            last_modified.isoformat() if last_modified else '',
+            self.request.accepted_renderer.format,
+            get_group_name(self.request),
+            get_tags_version(self.get_cache_tags())
+        )).hexdigest()
+        return etag, last_modified
+
+    def is_not_modified(self, etag, last_modified):
+        """ returns True if the client has the current version of the collection """
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return etag in etags or '*' in etags
+        if_modified_since = parse_http_date_safe(self.request.META.get('HTTP_IF_MODIFIED_SINCE'))
+        if if_modified_since and last_modified:
+            return timegm(last_modified.utctimetuple()) <= if_modified_since
+        return False
+
+    def list(self, request, *args, **kwargs):
+        """ return 304 if collection has not been modified """
+        if not self.conditional:
+            return super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        etag, last_modified = self.get_collection_version(self.filter_queryset(self.get_queryset()))
+        if self.is_not_modified(etag, last_modified):
+            response = Response(status=304)
+        else:
+            response = super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        response['ETag'] = quote_etag(etag)
+        # the collection depends on the user
+        patch_vary_headers(response, ('Cookie', 'Authorization'))
+        if last_modified:
+            response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+        return response
+
+
+class CursorPaginationMixin(object):
+    """
+    Opt-in keyset pagination: if the "cursor" querystring parameter is present
+    (empty for the first page) the list is paginated by cursor instead of by page number,
+    which avoids OFFSET scans and the count of the records.
+
+    Responses contain the opaque "next" and "previous" cursors but not the total count.
+    Records are sorted by cursor_ordering, which must identify each record univocally
+    and whose fields must be sorted in the same direction, eg: ('updated', 'id') or ('-id',)
+    """
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('id',)
+    cursor_page_size = 50
+
+    def encode_cursor(self, obj, reverse):
+        """ returns the cursor pointing to the position of obj """
+        position = []
+        for field in self.cursor_ordering:
+            value = getattr(obj, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': reverse}))
+
+    def decode_cursor(self, cursor):
+        """ returns a tuple containing the position (list of values) and the direction of cursor """
+        if not cursor:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(str(cursor)))
+            if len(cursor['p']) != len(self.cursor_ordering):
+                raise ValueError()
+            opts = self.get_queryset().model._meta
+            position = [opts.get_field(field.lstrip('-')).to_python(value)
+                        for field, value in zip(self.cursor_ordering, cursor['p'])]
+            return position, bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise ParseError(_('invalid cursor'))
+
+    def get_cursor_filter(self, ordering, position):
+        """ returns a Q object which selects the records which follow position according to ordering """
+        query = Q()
+        for i, field in enumerate(ordering):
+            lookup = '%s__%s' % (field.lstrip('-'), 'lt' if field.startswith('-') else 'gt')
+            conditions = dict((previous.lstrip('-'), position[j]) for j, previous in enumerate(ordering[:i]))
+            conditions[lookup] = position[i]
+            query |= Q(**conditions)
+        return query
+
+    def get_cursor_url(self, cursor):
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def list_by_cursor(self, queryset):
+        """ returns a response containing the page pointed by the cursor querystring parameter """
+        position, reverse = self.decode_cursor(self.request.QUERY_PARAMS[self.cursor_query_param])
+        page_size = self.get_paginate_by() or self.cursor_page_size
+        ordering = list(self.cursor_ordering)
+        # previous pages are retrieved in reverse order
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else '-%s' % field for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_cursor_filter(ordering, position))
+        # retrieve one more record to know if there are more pages
+        objects = list(queryset[:page_size + 1])
+        has_more = len(objects) > page_size
+        objects = objects[:page_size]
+        if reverse:
+            objects.reverse()
+        next_url = previous_url = None
+        if objects and (has_more if not reverse else position is not None):
+            next_url = self.get_cursor_url(self.encode_cursor(objects[-1], reverse=False))
+        if objects and (has_more if reverse else position is not None):
+            previous_url = self.get_cursor_url(self.encode_cursor(objects[0], reverse=True))
+        data = SortedDict()
+        data['next'] = next_url
+        data['previous'] = previous_url
+        data['results'] = self.get_serializer(objects, many=True).data
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        """ paginate by cursor if requested """
+        if self.cursor_query_param not in request.QUERY_PARAMS:
+            return super(CursorPaginationMixin, self).list(request, *args, **kwargs)
+        return self.list_by_cursor(self.filter_queryset(self.get_queryset()))
+
+
 class CustomDataMixin(object):
     """
     Implements custom data in views
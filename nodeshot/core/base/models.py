@@ -172,3 +172,46 @@ class BaseOrderedACL(BaseOrdered, BaseAccessLevel):
     class Meta:
         ordering = ["order"]
         abstract = True
+
+
+# ------ Signals ------ #
+
+
+from django.dispatch import receiver
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from .cache import clear_user_group_cache, invalidate_tags
+
+
+@receiver(m2m_changed)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """ deletes the cached group of users whose groups have been changed """
+    if sender is not get_user_model().groups.through:
+        return
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        clear_user_group_cache([instance.pk])
+        # group memoized on the instance (see get_user_group_name)
+        instance.__dict__.pop('_group_name', None)
+    # instance is a group
+    elif reverse and action in ('post_add', 'post_remove'):
+        clear_user_group_cache(pk_set)
+    elif reverse and action == 'pre_clear':
+        clear_user_group_cache(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """ deletes the cached group of the users of a group which has been renamed or deleted """
+    clear_user_group_cache(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    """ invalidates cached responses which show usernames, logins (which update only last_login) are ignored """
+    if sender is not get_user_model():
+        return
+    if update_fields and set(update_fields) <= set(['last_login']):
+        return
+    invalidate_tags('users')
@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django.core.urlresolvers import NoReverseMatch
 
 from rest_framework import serializers
@@ -82,6 +84,18 @@ class DynamicRelationshipsMixin(object):
         'view_name': 'api_node_comments',
         'lookup_field': 'slug'
     })
+
+    Relationships which use a serializer can be loaded in batch mode,
+    which retrieves the relationship of all the serialized objects with one query:
+
+    >>> NodeDetailSerializer.add_relationship(
+        'images',
+        serializer=ImageRelationSerializer,
+        many=True,
+        queryset=lambda obj, request: obj.image_set.all(),
+        batch=lambda ids, request: Image.objects.filter(node_id__in=ids),
+        batch_key='node_id'
+    )
     """
     _relationships = {}
 
@@ -89,7 +103,7 @@ class DynamicRelationshipsMixin(object):
     def add_relationship(_class, name,
                          view_name=None, lookup_field=None,
                          serializer=None, many=False, queryset=None,
-                         function=None):
+                         function=None, batch=None, batch_key=None):
         """ adds a relationship to serializer
         :param name: relationship name (dictionary key)
         :type name: str
@@ -105,6 +119,10 @@ class DynamicRelationshipsMixin(object):
         :type queryset: QuerySet
         :param function: function that returns the value to display (dict, list or str)
         :type function: function(obj, request)
+        :param batch: function that returns the related objects of a list of primary keys (batch mode)
+        :type batch: function(ids, request)
+        :param batch_key: attribute of the related objects containing the primary key of the object
+        :type batch_key: str
         :returns: None
         """
         if view_name is not None and lookup_field is not None:
@@ -118,7 +136,9 @@ class DynamicRelationshipsMixin(object):
                 'type': 'serializer',
                 'serializer': serializer,
                 'many': many,
-                'queryset': queryset
+                'queryset': queryset,
+                'batch': batch,
+                'batch_key': batch_key
             }
         elif function is not None:
             _class._relationships[name] = {
@@ -149,6 +169,50 @@ class DynamicRelationshipsMixin(object):
         else:
             return getattr(obj, string)
 
+    def prefetch_relationships(self, objects):
+        """
+        loads the relationships which support batch mode
+        for all the objects which are going to be serialized (one query per relationship)
+        """
+        batch_relationships = [(key, options) for key, options in self._relationships.iteritems()
+                               if options['type'] == 'serializer' and options.get('batch')]
+        # querysets are evaluated only once, generators can't be iterated twice
+        if not batch_relationships or not hasattr(objects, '__len__'):
+            return
+        request = self.context['request']
+        ids = [obj.pk for obj in objects]
+        self._prefetched_relationships = {}
+        for key, options in batch_relationships:
+            related = defaultdict(list)
+            for item in options['batch'](ids, request):
+                related[getattr(item, options['batch_key'])].append(item)
+            self._prefetched_relationships[key] = related
+
+    @property
+    def data(self):
+        """ prefetch relationships when serializing a list of objects """
+        if self._data is None and self.many and self.object is not None:
+            self.prefetch_relationships(self.object)
+        return super(DynamicRelationshipsMixin, self).data
+
+    def field_to_native(self, obj, field_name):
+        """ prefetch relationships when used as nested serializer of a list (eg: pagination) """
+        if self.many and obj is not None and self.source != '*':
+            objects = getattr(obj, self.source or field_name, None)
+            if objects is not None:
+                self.prefetch_relationships(objects)
+        return super(DynamicRelationshipsMixin, self).field_to_native(obj, field_name)
+
+    def get_related(self, key, options, obj, request):
+        """ returns the related objects of a relationship which uses a serializer """
+        prefetched = getattr(self, '_prefetched_relationships', {})
+        if key not in prefetched:
+            return options['queryset'](obj, request)
+        related = prefetched[key].get(obj.pk, [])
+        if options['many']:
+            return related
+        return related[0] if related else None
+
     def get_relationships(self, obj):
         request = self.context['request']
         format = self.context['format']
@@ -167,7 +231,7 @@ class DynamicRelationshipsMixin(object):
                                 format=format)
             # if relationship is a serializer
             elif options['type'] == 'serializer':
-                queryset = options['queryset'](obj, request)
+                queryset = self.get_related(key, options, obj, request)
                 # get serializer representation
                 value = options['serializer'](instance=queryset,
                                               context=self.context,
@@ -8,3 +8,5 @@ ACCESS_LEVELS = getattr(settings, 'NODESHOT_ACCESS_LEVELS', {
 ACL_DEFAULT_VALUE = getattr(settings, 'NODESHOT_ACL_DEFAULT_VALUE', 'public')
 ACL_DEFAULT_EDITABLE  = getattr(settings, 'NODESHOT_ACL_DEFAULT_EDITABLE', True)
 DISCONNECTABLE_SIGNALS = getattr(settings, 'NODESHOT_DISCONNECTABLE_SIGNALS', [])
+GEOJSON_STREAMING = getattr(settings, 'NODESHOT_GEOJSON_STREAMING', True)
+GEOJSON_STREAMING_CHUNK_SIZE = getattr(settings, 'NODESHOT_GEOJSON_STREAMING_CHUNK_SIZE', 500)
@@ -4,6 +4,9 @@ from django.test import TestCase
 from django.conf import settings
 
 from urlparse import urlparse, urlsplit
+from functools import wraps
+
+import simplejson as json
 
 
 if 'nodeshot.community.profiles' in settings.INSTALLED_APPS:
@@ -37,9 +40,89 @@ class Client(BaseClient):
         return self.request(**r)
 
 
+def streamed_json(response):
+    """ returns the python representation of a streamed JSON response """
+    return json.loads(''.join(response.streaming_content))
+
+
+def local_memory_cache(*modules):
+    """
+    decorator which replaces the "cache" attribute of the specified modules
+    (nodeshot.core.base.cache by default) with an empty local memory cache while the test runs
+    """
+    def decorator(test):
+        @wraps(test)
+        def wrapper(*args, **kwargs):
+            from django.core.cache import get_cache
+            from nodeshot.core.base import cache as cache_utils
+            patched = modules or (cache_utils,)
+            originals = [module.cache for module in patched]
+            cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+            cache.clear()
+            for module in patched:
+                module.cache = cache
+            try:
+                return test(*args, **kwargs)
+            finally:
+                for module, original in zip(patched, originals):
+                    module.cache = original
+        return wrapper
+    return decorator
+
+
 class BaseTestCase(TestCase):
     """
     Test case with a client that can do patch requests
     """
     
-    client_class = Client
\ No newline at end of file
+    client_class = Client
+
+    def assertCursorPagination(self, url, expected, field='id', **params):
+        """
+        follows the next and then the previous links of a list paginated by cursor
+        and checks that the values of field are the expected ones in the expected order
+        """
+        params['cursor'] = ''
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        pages = [[item[field] for item in response.data['results']]]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append([item[field] for item in response.data['results']])
+        self.assertEqual(sum(pages, []), list(expected))
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            pages.pop()
+            self.assertEqual([item[field] for item in response.data['results']], pages[-1])
+        self.assertEqual(len(pages), 1)
+        # invalid cursor
+        params['cursor'] = 'wrong'
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 400)
+
+
+class CacheTest(TestCase):
+    fixtures = [
+        'initial_data.json',
+        user_fixtures
+    ]
+
+    @local_memory_cache()
+    def test_user_group_cache(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group
+        from nodeshot.core.base import cache as cache_utils
+        from nodeshot.core.nodes.models import Node
+        User = get_user_model()
+        user = User.objects.get(username='registered')
+        self.assertEqual(cache_utils.get_user_group_name(user), 'registered')
+        # memoized on the instance and cached
+        with self.assertNumQueries(0):
+            Node.objects.accessible_to(user)
+            self.assertEqual(cache_utils.get_user_group_name(User(pk=user.pk)), 'registered')
+        # changing groups invalidates the cache
+        user.groups.add(Group.objects.get(name='trusted'))
+        self.assertEqual(cache_utils.get_user_group_name(user), 'trusted')
+        self.assertEqual(cache_utils.get_user_group_name(User.objects.get(pk=user.pk)), 'trusted')
@@ -1,12 +1,17 @@
 from datetime import datetime, timedelta
+from threading import local, current_thread
+from contextlib import contextmanager
 
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ugettext
 from django.utils.timezone import utc
 from django.conf import settings
+from django.utils.datastructures import SortedDict
+from django.db.models.signals import pre_delete, post_delete
 
 from .settings import DISCONNECTABLE_SIGNALS
 from .exceptions import DependencyError
+from .cache import deferred_invalidation
 
 
 __all__ = [
@@ -17,6 +22,12 @@ __all__ = [
     'now',
     'now_after',
     'after',
+    'queryset_iterator',
+    'pause_disconnectable_signals',
+    'resume_disconnectable_signals',
+    'nodeshot_batch',
+    'call_after_batch',
+    'in_batch',
 ]
 
 
@@ -77,13 +88,19 @@ def get_key_by_value(dictionary, search_value):
             return ugettext(key)
 
 
+_signals = local()
+
+
 def pause_disconnectable_signals():
     """
     Disconnects non critical signals like notifications, websockets and stuff like that.
     Use when managing large chunks of nodes
+    (signals flagged as critical in DISCONNECTABLE_SIGNALS are not disconnected)
     """
+    _signals.paused = True
     for signal in DISCONNECTABLE_SIGNALS:
-        signal['disconnect']()
+        if not signal.get('critical'):
+            signal['disconnect']()
 
 
 def resume_disconnectable_signals():
@@ -91,8 +108,201 @@ def resume_disconnectable_signals():
     Reconnects non critical signals like notifications, websockets and stuff like that.
     Use when managing large chunks of nodes
     """
+    _signals.paused = False
     for signal in DISCONNECTABLE_SIGNALS:
-        signal['reconnect']()
+        if not signal.get('critical'):
+            signal['reconnect']()
+
+
+def _merge_events(previous, kwargs):
+    """ merges the arguments of two signals sent for the same object inside nodeshot_batch """
+    merged = dict(kwargs)
+    # post_save: the object is new if it was created by any of the buffered saves
+    if previous.get('created'):
+        merged['created'] = True
+    # values preceding the batch are preserved (eg: old_status of node_status_changed)
+    for key, value in previous.items():
+        if key.startswith('old_'):
+            merged[key] = value
+    return merged
+
+
+def _drop_events(batch, instance):
+    """
+    drops the buffered events of an object which is being deleted (except the ones of its deletion),
+    eg: post_save must not be flushed for an object created and deleted in the same batch
+    """
+    obj = (instance.__class__, instance.pk)
+    if obj in batch['deleted']:
+        return
+    batch['deleted'].add(obj)
+    for key in batch['objects'].pop(obj, []):
+        if batch['events'][key][1] not in (pre_delete, post_delete):
+            del batch['events'][key]
+
+
+def _buffering_receiver(entry, signal, receiver, thread):
+    """ returns a receiver which buffers the signals sent by thread in the current batch """
+    def buffer(sender, **kwargs):
+        # signals sent by other threads are not part of the batch
+        if current_thread() is not thread:
+            return receiver(sender=sender, **kwargs)
+        kwargs.pop('signal', None)
+        instance = kwargs.get('instance')
+        batch = _signals.batch
+        events = batch['events']
+        if instance is not None and instance.pk is not None:
+            if signal in (pre_delete, post_delete):
+                _drop_events(batch, instance)
+            key = (id(receiver), id(signal), instance.__class__, instance.pk)
+            batch['objects'].setdefault((instance.__class__, instance.pk), set()).add(key)
+        else:
+            key = (id(receiver), id(signal), len(events))
+        if key in events:
+            kwargs = _merge_events(events[key][4], kwargs)
+        events[key] = (entry, signal, receiver, sender, kwargs)
+    return buffer
+
+
+def _flush_batch(entries, batch):
+    # objects deleted in the batch are removed from the events of many objects (eg: nodes_bulk_created)
+    deleted = batch['deleted']
+    for key, event in batch['events'].items():
+        instances = event[4].get('instances')
+        if not deleted or instances is None:
+            continue
+        instances = [instance for instance in instances
+                     if instance.pk is not None and (instance.__class__, instance.pk) not in deleted]
+        if instances:
+            event[4]['instances'] = instances
+        else:
+            del batch['events'][key]
+    for entry in entries:
+        entry_events = [event for event in batch['events'].values() if event[0] is entry]
+        if not entry_events:
+            continue
+        # registrars can process all the events at once
+        if entry.get('batch'):
+            entry['batch']([(signal, kwargs) for e, signal, receiver, sender, kwargs in entry_events])
+        # otherwise receivers are called once for each object
+        else:
+            for e, signal, receiver, sender, kwargs in entry_events:
+                receiver(signal=signal, sender=sender, **kwargs)
+    for func, kwargs, args in batch['calls'].values():
+        func(args, **kwargs)
+
+
+@contextmanager
+def nodeshot_batch():
+    """
+    Buffers the signals of DISCONNECTABLE_SIGNALS which are sent inside the block
+    and flushes them when the block exits, eg:
+
+        with nodeshot_batch():
+            for node in nodes:
+                node.save()
+
+    Signals sent more than once for the same object are merged in one, the events
+    of objects which are deleted in the block are dropped (except the ones of their deletion),
+    registrars which define a "batch" function receive all their events at once
+    (eg: one websocket message for all the nodes), the receivers of the other registrars
+    are called once for each object. Cache tags are invalidated only once (see deferred_invalidation)
+    and functions passed to call_after_batch are called once with all their arguments.
+
+    Only registrars which declare their "receivers" are buffered; signals which
+    have been paused with pause_disconnectable_signals stay disconnected.
+    Nested blocks are flushed by the outer one, signals sent by other threads are not buffered.
+    If the block raises an exception buffered signals are discarded.
+    """
+    # nested blocks are flushed by the outer one
+    if getattr(_signals, 'batch', None) is not None:
+        yield
+        return
+    paused = getattr(_signals, 'paused', False)
+    entries = [entry for entry in DISCONNECTABLE_SIGNALS
+               if entry.get('receivers') and (entry.get('critical') or not paused)]
+    thread = current_thread()
+    buffers = []
+    disconnected = []
+
+    def restore():
+        while buffers:
+            signal, buffer, sender = buffers.pop()
+            signal.disconnect(buffer, sender=sender)
+        while disconnected:
+            disconnected.pop()['reconnect']()
+
+    _signals.batch = {'events': SortedDict(), 'calls': SortedDict(), 'objects': {}, 'deleted': set()}
+    try:
+        with deferred_invalidation():
+            try:
+                for entry in entries:
+                    entry['disconnect']()
+                    disconnected.append(entry)
+                    for signal, receiver, sender in entry['receivers']:
+                        buffer = _buffering_receiver(entry, signal, receiver, thread)
+                        signal.connect(buffer, sender=sender, weak=False)
+                        buffers.append((signal, buffer, sender))
+                yield
+            finally:
+                restore()
+            batch = _signals.batch
+            _signals.batch = None
+            _flush_batch(entries, batch)
+    finally:
+        _signals.batch = None
+
+
+def call_after_batch(func, args, **kwargs):
+    """
+    Calls func(args, **kwargs) immediately, or only once at the end of nodeshot_batch
+    with the union of the args of all the calls which share the same kwargs.
+
+    :param func: function which accepts an iterable as first argument
+    :param args: iterable of hashable items (eg: a list of ids)
+    """
+    batch = getattr(_signals, 'batch', None)
+    if batch is None:
+        return func(args, **kwargs)
+    key = (func, tuple(sorted(kwargs.items())))
+    if key not in batch['calls']:
+        batch['calls'][key] = (func, kwargs, set())
+    batch['calls'][key][2].update(args)
+
+
+def in_batch():
+    """ returns True if the current thread is inside a nodeshot_batch block """
+    return getattr(_signals, 'batch', None) is not None
+
+
+def queryset_iterator(queryset, chunk_size=500):
+    """
+    Iterates over a queryset loading at most chunk_size objects in memory at a time.
+
+    QuerySet.iterator() is not enough because psycopg2 loads the whole result set in memory anyway,
+    hence the queryset is split in chunks by primary key; querysets which have been explicitly
+    ordered by something else (eg: search results sorted by relevance) can't be split
+    without losing their ordering, so they are retrieved with a single query.
+
+    :param queryset: queryset to iterate over (values() querysets must include the "id" column)
+    :param chunk_size: number of objects retrieved with each query
+    """
+    ordering = list(queryset.query.extra_order_by or queryset.query.order_by)
+    if ordering and ordering not in (['pk'], ['id']):
+        for obj in queryset.iterator():
+            yield obj
+        return
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        for obj in chunk:
+            yield obj
+        if len(chunk) < chunk_size:
+            break
+        last = chunk[-1]
+        last_pk = last['id'] if isinstance(last, dict) else last.pk
 
 
 # time shortcuts
@@ -48,6 +48,18 @@ class LayerAdmin(PublishActionsAdminMixin, GeoAdmin):
         )
     view_nodes.allow_tags = True
 
+    def save_model(self, request, obj, form, change):
+        super(LayerAdmin, self).save_model(request, obj, form, change)
+        request._nodeshot_saved_layer = obj
+
+    def change_view(self, request, *args, **kwargs):
+        response = super(LayerAdmin, self).change_view(request, *args, **kwargs)
+        # the view runs in a transaction, nodes are published or unpublished once it has been committed
+        layer = getattr(request, '_nodeshot_saved_layer', None)
+        if layer is not None and layer._nodes_published_pending:
+            layer.update_nodes_published()
+        return response
+
     def publish_action(self, request, queryset):
         super(LayerAdmin, self).publish_action(request, queryset)
         # unpublish all nodes of selected layers
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import datetime
+import simplejson as json
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models, connection
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'LayerStats'
+        db.create_table('layers_layerstats', (
+            ('layer', self.gf('django.db.models.fields.related.OneToOneField')(related_name='stats', unique=True, primary_key=True, to=orm['layers.Layer'])),
+            ('nodes', self.gf('django.db.models.fields.IntegerField')(default=0)),
+            ('nodes_by_status', self.gf('jsonfield.fields.JSONField')(default={}, blank=True)),
+            ('links', self.gf('django.db.models.fields.IntegerField')(default=0)),
+            ('extent', self.gf('django.contrib.gis.db.models.fields.PolygonField')(null=True, blank=True)),
+            ('last_update', self.gf('django.db.models.fields.DateTimeField')(null=True, blank=True)),
+        ))
+        db.send_create_signal('layers', ['LayerStats'])
+
+        # Populating statistics of existing layers (published nodes only)
+        if not db.dry_run:
+            db.execute("""
+                INSERT INTO layers_layerstats (layer_id, nodes, nodes_by_status, links, extent, last_update)
+                SELECT layers_layer.id, COUNT(nodes_node.id), '{}', 0,
+                       CASE WHEN COUNT(nodes_node.id) > 0 THEN ST_MakeEnvelope(
+                           ST_XMin(ST_Extent(nodes_node.geometry)), ST_YMin(ST_Extent(nodes_node.geometry)),
+                           ST_XMax(ST_Extent(nodes_node.geometry)), ST_YMax(ST_Extent(nodes_node.geometry)), 4326
+                       ) END,
+                       MAX(nodes_node.updated)
+                FROM layers_layer
+                LEFT JOIN nodes_node ON nodes_node.layer_id = layers_layer.id AND nodes_node.is_published
+                GROUP BY layers_layer.id
+            """)
+            nodes_by_status = {}
+            for layer_id, slug, count in db.execute("""
+                SELECT nodes_node.layer_id, nodes_status.slug, COUNT(nodes_node.id)
+                FROM nodes_node INNER JOIN nodes_status ON nodes_status.id = nodes_node.status_id
+                WHERE nodes_node.is_published AND nodes_node.layer_id IS NOT NULL
+                GROUP BY nodes_node.layer_id, nodes_status.slug
+            """):
+                nodes_by_status.setdefault(layer_id, {})[slug] = count
+            for layer_id, statuses in nodes_by_status.items():
+                db.execute('UPDATE layers_layerstats SET nodes_by_status = %s WHERE layer_id = %s',
+                           [json.dumps(statuses), layer_id])
+            if 'links_link' in connection.introspection.table_names():
+                db.execute("""
+                    UPDATE layers_layerstats SET links = counts.links
+                    FROM (SELECT layer_id, COUNT(id) AS links FROM links_link
+                          WHERE layer_id IS NOT NULL GROUP BY layer_id) AS counts
+                    WHERE layers_layerstats.layer_id = counts.layer_id
+                """)
+
+    def backwards(self, orm):
+        # Deleting model 'LayerStats'
+        db.delete_table('layers_layerstats')
+
+    models = {
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'layers.layer': {
+            'Meta': {'object_name': 'Layer'},
+            'added': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime(2014, 10, 2, 0, 0)'}),
+            'area': ('django.contrib.gis.db.models.fields.GeometryField', [], {}),
+            'data': (u'django_hstore.fields.DictionaryField', [], {'null': 'True', 'blank': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '250', 'null': 'True', 'blank': 'True'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '75', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_external': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_published': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'mantainers': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['profiles.Profile']", 'symmetrical': 'False', 'blank': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '50'}),
+            'new_nodes_allowed': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'nodes_minimum_distance': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'organization': ('django.db.models.fields.CharField', [], {'max_length': '255', 'blank': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '50'}),
+            'text': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime(2014, 10, 2, 0, 0)'}),
+            'website': ('django.db.models.fields.URLField', [], {'max_length': '200', 'null': 'True', 'blank': 'True'})
+        },
+        'layers.layerstats': {
+            'Meta': {'object_name': 'LayerStats', 'db_table': "'layers_layerstats'"},
+            'extent': ('django.contrib.gis.db.models.fields.PolygonField', [], {'null': 'True', 'blank': 'True'}),
+            'last_update': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'layer': ('django.db.models.fields.related.OneToOneField', [], {'related_name': "'stats'", 'unique': 'True', 'primary_key': 'True', 'to': "orm['layers.Layer']"}),
+            'links': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'nodes': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'nodes_by_status': ('jsonfield.fields.JSONField', [], {'default': '{}', 'blank': 'True'})
+        },
+        'profiles.profile': {
+            'Meta': {'object_name': 'Profile'},
+            'about': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'address': ('django.db.models.fields.CharField', [], {'max_length': '150', 'blank': 'True'}),
+            'birth_date': ('django.db.models.fields.DateField', [], {'null': 'True', 'blank': 'True'}),
+            'city': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'country': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime(2014, 10, 2, 0, 0)'}),
+            'email': ('django.db.models.fields.EmailField', [], {'db_index': 'True', 'unique': 'True', 'max_length': '75', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'gender': ('django.db.models.fields.CharField', [], {'max_length': '1', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Group']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Permission']"}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '254', 'db_index': 'True'})
+        }
+    }
+
+    complete_apps = ['layers']
\ No newline at end of file
@@ -1,8 +1,9 @@
 from nodeshot.core.base.utils import check_dependencies
 from layer import Layer
+from stats import LayerStats
 
 
-__all__ = ['Layer']
+__all__ = ['Layer', 'LayerStats']
 
 
 check_dependencies(
@@ -20,3 +21,117 @@ ExtensibleNodeSerializer.add_relationship(**{
     'view_name': 'api_layer_detail',
     'lookup_field': 'layer.slug'
 })
+
+
+# ------ Signals ------ #
+
+from django.dispatch import receiver
+from django.db.models.signals import pre_save, post_save, post_delete
+from nodeshot.core.base.cache import invalidate_tags
+from nodeshot.core.base.utils import call_after_batch, in_batch
+from nodeshot.core.nodes.models import Node, NodeChange, Status
+from nodeshot.core.nodes.signals import nodes_bulk_created, nodes_bulk_updated
+from nodeshot.core.nodes.geometry import simplified_geometries
+from ..signals import layer_nodes_published_changed
+
+
+@receiver(pre_save, sender=Layer)
+def set_simplified_areas(sender, instance, **kwargs):
+    """ keeps the simplified versions of the area in sync """
+    for level, area in simplified_geometries(instance.area).items():
+        setattr(instance, 'area_%s' % level, area)
+
+
+@receiver(post_save, sender=Layer)
+@receiver(post_delete, sender=Layer)
+def clear_layer_cache(sender, **kwargs):
+    """ invalidates cached responses which contain layers or their names (eg: node collections) """
+    invalidate_tags('layers')
+
+
+@receiver(layer_nodes_published_changed, sender=Layer)
+def clear_layer_nodes_cache(sender, instance, **kwargs):
+    """ invalidates cached responses which contain the nodes of the layer once the cascade is completed """
+    invalidate_tags('nodes', 'layer:%s' % instance.pk)
+
+
+@receiver(layer_nodes_published_changed, sender=Layer)
+def log_layer_nodes_published_changed(sender, instance, **kwargs):
+    """ the cascade updates the nodes without sending post_save, log the changes at once """
+    NodeChange.log_queryset('updated', Node.objects.filter(layer_id=instance.pk))
+
+
+def refresh_layer_stats(layer_ids, create=True):
+    """
+    refreshes the node statistics of the specified layers and invalidates the cached stats
+    (inside nodeshot_batch each layer is refreshed only once at the end of the batch)
+    """
+    layer_ids = set(layer_id for layer_id in layer_ids if layer_id)
+    for layer_id in layer_ids:
+        LayerStats.refresh_nodes(layer_id, create=create)
+    if layer_ids:
+        invalidate_tags('layer_stats')
+
+
+@receiver(post_save, sender=Node)
+def node_saved_layer_stats(sender, instance, created, **kwargs):
+    """
+    updates the stats of the layer of the node incrementally; the stats are recomputed
+    if the node is unpublished or moved (to another layer or to other coordinates)
+    and at the end of nodeshot_batch (once for each layer);
+    if only the last update has changed (the most common case) one query is performed
+    """
+    old_layer_id = None if created else instance._current_layer_id
+    was_published = not created and bool(instance._current_is_published)
+    if in_batch() or (old_layer_id and old_layer_id != instance.layer_id) or \
+       (was_published and not instance.is_published) or (was_published and instance.geometry_has_changed):
+        call_after_batch(refresh_layer_stats, [instance.layer_id, old_layer_id])
+        return
+    if not instance.is_published:
+        return
+    statuses = {}
+    old_status = Status.get_cached(pk=instance._current_status) if was_published else None
+    new_status = Status.get_cached(pk=instance.status_id)
+    if old_status != new_status:
+        if old_status:
+            statuses[old_status.slug] = -1
+        if new_status:
+            statuses[new_status.slug] = 1
+    # neither the count, nor the statuses nor the extent have changed
+    if was_published and not statuses:
+        if instance.updated and LayerStats.update_last_update(instance.layer_id, instance.updated):
+            invalidate_tags('layer_stats')
+        return
+    LayerStats.update_nodes(
+        instance.layer_id,
+        count=0 if was_published else 1,
+        statuses=statuses,
+        bbox=instance.geometry.extent if instance.geometry else None,
+        updated=instance.updated
+    )
+    invalidate_tags('layer_stats')
+
+
+@receiver(post_delete, sender=Node)
+def node_deleted_layer_stats(sender, instance, **kwargs):
+    # the layer itself might be being deleted, in that case its stats must not be created again
+    call_after_batch(refresh_layer_stats, [instance.layer_id], create=False)
+
+
+@receiver(nodes_bulk_created, sender=Node)
+@receiver(nodes_bulk_updated, sender=Node)
+def nodes_bulk_created_layer_stats(sender, instances, **kwargs):
+    call_after_batch(refresh_layer_stats, [instance.layer_id for instance in instances])
+
+
+@receiver(layer_nodes_published_changed, sender=Layer)
+def layer_nodes_published_changed_stats(sender, instance, **kwargs):
+    refresh_layer_stats([instance.pk])
+
+
+@receiver(post_save, sender=Layer)
+def layer_stats(sender, instance, created, **kwargs):
+    """ ensure each layer has its statistics, unpublished layers are excluded from the stats """
+    if created:
+        LayerStats.refresh_nodes(instance.pk)
+    invalidate_tags('layer_stats')
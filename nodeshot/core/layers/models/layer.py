@@ -1,7 +1,7 @@
 from django.contrib.gis.db import models
+from django.db import connection, transaction
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
-from django.contrib.gis.measure import D
 from django.contrib.gis.geos import Polygon, Point, GEOSException
 
 from django_hstore.fields import DictionaryField
@@ -12,6 +12,7 @@ from nodeshot.core.nodes.models import Node
 from ..settings import settings, NODES_MINIMUM_DISTANCE, HSTORE_SCHEMA
 from ..managers import LayerManager
 from ..signals import layer_is_published_changed
+from ..tasks import update_nodes_published, get_publish_progress
 
 
 class Layer(BaseDate):
@@ -32,6 +33,11 @@ class Layer(BaseDate):
     # geographic related fields
     area = models.GeometryField(_('area'), help_text=_('If a polygon is used nodes of this layer will have to be contained in it.\
                                                         If a point is used nodes of this layer can be located anywhere. Lines are not allowed.'))
+    # simplified versions of the area used at low zoom levels, kept in sync on save
+    # (empty for points, see nodeshot.core.nodes.geometry)
+    area_low = models.GeometryField(blank=True, null=True, editable=False, spatial_index=False)
+    area_medium = models.GeometryField(blank=True, null=True, editable=False, spatial_index=False)
+    area_high = models.GeometryField(blank=True, null=True, editable=False, spatial_index=False)
     # organizational
     organization = models.CharField(_('organization'), max_length=255, blank=True,
                                     help_text=_('Organization which is responsible to manage this layer'))
@@ -54,6 +60,8 @@ class Layer(BaseDate):
     # explained here:
     # http://stackoverflow.com/questions/1355150/django-when-saving-how-can-you-check-if-a-field-has-changed
     _current_is_published = None
+    # set by save when is_published changes inside a transaction, see update_nodes_published
+    _nodes_published_pending = False
 
     class Meta:
         db_table = 'layers_layer'
@@ -84,8 +92,12 @@ class Layer(BaseDate):
                 old_is_published=self._current_is_published,
                 new_is_published=self.is_published
             )
-            # unpublish nodes
-            self.update_nodes_published()
+            # unpublish nodes, the background job must see the change of the layer:
+            # inside a transaction it's queued by the caller once the transaction has been committed
+            if transaction.get_autocommit():
+                self.update_nodes_published()
+            else:
+                self._nodes_published_pending = True
 
         # update _current_is_published
         self._current_is_published = self.is_published
@@ -112,9 +124,20 @@ class Layer(BaseDate):
             return self.area.centroid
 
     def update_nodes_published(self):
-        """ publish or unpublish nodes of current layer """
+        """
+        publish or unpublish nodes of current layer in a background job
+        (see nodeshot.core.layers.tasks.update_nodes_published);
+        layers saved inside a transaction don't queue the job, callers must call
+        this method once the transaction has been committed (see _nodes_published_pending)
+        """
         if self.pk:
-            self.node_set.all().update(is_published=self.is_published)
+            self._nodes_published_pending = False
+            update_nodes_published.delay(self.pk)
+
+    @property
+    def publish_progress(self):
+        """ progress of the last publish/unpublish of the nodes of this layer """
+        return get_publish_progress(self.pk)
 
     if 'grappelli' in settings.INSTALLED_APPS:
         @staticmethod
@@ -145,14 +168,12 @@ def new_nodes_allowed_for_layer(self):
 
 def nodes_minimum_distance_validation(self):
     """
-    if minimum distance is specified, ensure node is not too close to other nodes;
+    if minimum distance is specified, ensure node is not too close to other nodes of the same layer;
+    the check is skipped if coordinates and layer are not changing
     """
-    if self.layer and self.layer.nodes_minimum_distance:
-        minimum_distance = self.layer.nodes_minimum_distance
-        # TODO - lower priority: do this check only when coordinates are changing
-        near_nodes = Node.objects.exclude(pk=self.id).filter(geometry__distance_lte=(self.geometry, D(m=minimum_distance))).count()
-        if near_nodes > 0:
-            raise ValidationError(_('Distance between nodes cannot be less than %s meters') % minimum_distance)
+    errors = bulk_nodes_minimum_distance_validation([self])
+    if errors:
+        raise ValidationError(errors[0])
 
 
 def node_contained_in_layer_area_validation(self):
@@ -167,3 +188,78 @@ def node_contained_in_layer_area_validation(self):
 Node.add_validation_method(new_nodes_allowed_for_layer)
 Node.add_validation_method(nodes_minimum_distance_validation)
 Node.add_validation_method(node_contained_in_layer_area_validation)
+
+
+# ------ Bulk validation for lists of new nodes ------ #
+
+
+# uses the GiST index on geometry::geography (see nodes migration 0004)
+MINIMUM_DISTANCE_SQL = """
+WITH batch (index, id, layer_id, geometry, distance, checked) AS (VALUES %(values)s)
+SELECT a.index FROM batch a
+WHERE a.checked AND (EXISTS (
+    SELECT 1 FROM nodes_node n
+    WHERE n.layer_id = a.layer_id
+    AND ST_DWithin(n.geometry::geography, a.geometry::geography, a.distance)
+    AND n.id NOT IN (SELECT id FROM batch WHERE id IS NOT NULL)
+) OR EXISTS (
+    SELECT 1 FROM batch b
+    WHERE b.layer_id = a.layer_id AND b.index <> a.index AND (NOT b.checked OR b.index < a.index)
+    AND ST_DWithin(b.geometry::geography, a.geometry::geography, a.distance)
+))
+"""
+
+
+def bulk_new_nodes_allowed_for_layer(nodes):
+    """ bulk version of new_nodes_allowed_for_layer """
+    errors = {}
+    for index, node in enumerate(nodes):
+        if not node.pk and node.layer and not node.layer.new_nodes_allowed:
+            errors[index] = _('New nodes are not allowed for this layer')
+    return errors
+
+
+def bulk_nodes_minimum_distance_validation(nodes):
+    """
+    bulk version of nodes_minimum_distance_validation, can be used to validate
+    thousands of new or existing nodes with one query: nodes are compared
+    to the other nodes of their layer, including the ones in the list
+    (when two nodes of the list are too close only the latter is invalid)
+
+    :returns: dictionary which maps the index of each invalid node to an error message
+    """
+    values = []
+    params = []
+    checked_count = 0
+    for index, node in enumerate(nodes):
+        if not node.layer_id or not node.layer.nodes_minimum_distance or node.geometry is None:
+            continue
+        checked = node.geometry_has_changed
+        checked_count += int(checked)
+        values.append('(%s, %s::integer, %s, ST_GeomFromEWKT(%s), %s, %s)')
+        params += [index, node.pk, node.layer_id, node.geometry.ewkt,
+                   node.layer.nodes_minimum_distance, checked]
+    # nothing to check
+    if not checked_count:
+        return {}
+    cursor = connection.cursor()
+    cursor.execute(MINIMUM_DISTANCE_SQL % {'values': ', '.join(values)}, params)
+    errors = {}
+    for (index,) in cursor.fetchall():
+        minimum_distance = nodes[index].layer.nodes_minimum_distance
+        errors[index] = _('Distance between nodes cannot be less than %s meters') % minimum_distance
+    return errors
+
+
+def bulk_node_contained_in_layer_area_validation(nodes):
+    """ bulk version of node_contained_in_layer_area_validation """
+    errors = {}
+    for index, node in enumerate(nodes):
+        if node.layer and isinstance(node.layer.area, Polygon) and not node.layer.area.contains(node.geometry):
+            errors[index] = _('Node must be inside layer area')
+    return errors
+
+
+Node.add_bulk_validation_method(bulk_new_nodes_allowed_for_layer)
+Node.add_bulk_validation_method(bulk_nodes_minimum_distance_validation)
+Node.add_bulk_validation_method(bulk_node_contained_in_layer_area_validation)
@@ -0,0 +1,117 @@
+from django.contrib.gis.db import models
+from django.contrib.gis.geos import Polygon
+from django.db import transaction
+from django.db.models import Count, Max, F, Q
+from django.utils.translation import ugettext_lazy as _
+
+from jsonfield import JSONField
+
+from nodeshot.core.nodes.models import Node
+
+from .layer import Layer
+
+
+class LayerStats(models.Model):
+    """
+    Precomputed statistics of a layer, updated incrementally when nodes or links
+    of the layer change and recomputed when they are deleted, unpublished or moved (see signals)
+    """
+    layer = models.OneToOneField(Layer, verbose_name=_('layer'), primary_key=True, related_name='stats')
+    nodes = models.IntegerField(_('nodes'), default=0)
+    nodes_by_status = JSONField(_('nodes by status'), blank=True, default={})
+    links = models.IntegerField(_('links'), default=0)
+    extent = models.PolygonField(_('extent'), blank=True, null=True,
+                                 help_text=_('bounding box of the nodes'))
+    last_update = models.DateTimeField(_('last update'), blank=True, null=True,
+                                       help_text=_('last time a node of the layer was updated'))
+
+    objects = models.GeoManager()
+
+    class Meta:
+        db_table = 'layers_layerstats'
+        app_label = 'layers'
+        verbose_name = _('layer statistics')
+        verbose_name_plural = _('layer statistics')
+
+    def __unicode__(self):
+        return unicode(self.layer_id)
+
+    @classmethod
+    def _update_or_create(cls, layer_id, create=True, **kwargs):
+        if not cls.objects.filter(layer_id=layer_id).update(**kwargs) and create:
+            cls.objects.create(layer_id=layer_id, **kwargs)
+
+    @classmethod
+    def refresh_nodes(cls, layer_id, create=True):
+        """
+        recomputes the statistics of the published nodes of the specified layer
+        (if create is False missing statistics are not created, eg: while the layer is being deleted)
+        """
+        queryset = Node.objects.filter(layer_id=layer_id, is_published=True).order_by()
+        aggregate = queryset.aggregate(count=Count('id'), last_update=Max('updated'))
+        nodes_by_status = {}
+        for row in queryset.values('status__slug').annotate(count=Count('id')):
+            if row['status__slug']:
+                nodes_by_status[row['status__slug']] = row['count']
+        extent = queryset.extent() if aggregate['count'] else None
+        cls._update_or_create(
+            layer_id,
+            create=create,
+            nodes=aggregate['count'],
+            nodes_by_status=nodes_by_status,
+            extent=Polygon.from_bbox(extent) if extent else None,
+            last_update=aggregate['last_update']
+        )
+
+    @classmethod
+    def update_nodes(cls, layer_id, count=0, statuses=None, bbox=None, updated=None):
+        """
+        applies the changes of a single node to the statistics of the specified layer
+        without scanning its nodes (the row is locked to serialize concurrent updates)
+
+        :param count: variation of the number of published nodes
+        :param statuses: variation of the number of published nodes by status slug
+        :param bbox: bounding box (xmin, ymin, xmax, ymax) which the extent must include
+        :param updated: last update of the node
+        """
+        with transaction.atomic():
+            try:
+                stats = cls.objects.select_for_update().get(layer_id=layer_id)
+            except cls.DoesNotExist:
+                return cls.refresh_nodes(layer_id)
+            stats.nodes += count
+            nodes_by_status = dict(stats.nodes_by_status or {})
+            for slug, delta in (statuses or {}).items():
+                nodes_by_status[slug] = nodes_by_status.get(slug, 0) + delta
+                if nodes_by_status[slug] <= 0:
+                    del nodes_by_status[slug]
+            stats.nodes_by_status = nodes_by_status
+            if bbox:
+                if stats.extent:
+                    extent = stats.extent.extent
+                    bbox = (min(extent[0], bbox[0]), min(extent[1], bbox[1]),
+                            max(extent[2], bbox[2]), max(extent[3], bbox[3]))
+                stats.extent = Polygon.from_bbox(bbox)
+            if updated and (stats.last_update is None or updated > stats.last_update):
+                stats.last_update = updated
+            stats.save()
+
+    @classmethod
+    def update_last_update(cls, layer_id, updated):
+        """
+        stores the last update of a node of the specified layer with one query,
+        returns True if the statistics have changed
+        """
+        queryset = cls.objects.filter(layer_id=layer_id).filter(Q(last_update__lt=updated) |
+                                                                Q(last_update__isnull=True))
+        return queryset.update(last_update=updated) > 0
+
+    @classmethod
+    def refresh_links(cls, layer_id, count, create=True):
+        """ stores the number of links of the specified layer (counted by nodeshot.networking.links) """
+        cls._update_or_create(layer_id, create=create, links=count)
+
+    @classmethod
+    def update_links(cls, layer_id, count):
+        """ adds count (which may be negative) to the number of links of the specified layer """
+        return cls.objects.filter(layer_id=layer_id).update(links=F('links') + count)
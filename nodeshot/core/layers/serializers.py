@@ -8,7 +8,7 @@ from nodeshot.core.base.serializers import GeoJSONPaginationSerializer
 from nodeshot.core.nodes.models import Node
 from nodeshot.core.nodes.serializers import NodeListSerializer
 
-from .models import Layer
+from .models import Layer, LayerStats
 from .settings import ADDITIONAL_LAYER_FIELDS
 
 
@@ -19,7 +19,8 @@ __all__ = [
     'GeoLayerListSerializer',
     'CustomNodeListSerializer',
     'PaginatedLayerListSerializer',
-    'PaginatedGeojsonLayerListSerializer'
+    'PaginatedGeojsonLayerListSerializer',
+    'LayerStatsSerializer'
 ]
 
 
@@ -96,3 +97,20 @@ class LayerNodeListSerializer(LayerDetailSerializer):
     class Meta:
         model = Layer
         fields = ['name', 'description', 'text', 'organization', 'website'] + ADDITIONAL_LAYER_FIELDS
+
+
+class LayerStatsSerializer(serializers.ModelSerializer):
+    """
+    Precomputed statistics of a layer
+    """
+    slug = serializers.Field(source='layer.slug')
+    name = serializers.Field(source='layer.name')
+    nodes_by_status = serializers.Field()
+    bbox = serializers.SerializerMethodField('get_bbox')
+
+    def get_bbox(self, obj):
+        return list(obj.extent.extent) if obj.extent else None
+
+    class Meta:
+        model = LayerStats
+        fields = ['slug', 'name', 'nodes', 'nodes_by_status', 'links', 'bbox', 'last_update']
@@ -11,3 +11,6 @@ if HSTORE_SCHEMA:
     ADDITIONAL_LAYER_FIELDS = [field.get('name') for field in HSTORE_SCHEMA]
 else:
     ADDITIONAL_LAYER_FIELDS = []
+
+# number of nodes updated in each step when a layer is published or unpublished
+PUBLISH_CASCADE_CHUNK_SIZE = getattr(settings, 'NODESHOT_LAYERS_PUBLISH_CASCADE_CHUNK_SIZE', 1000)
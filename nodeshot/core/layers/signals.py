@@ -1,3 +1,5 @@
 import django.dispatch
 
 layer_is_published_changed = django.dispatch.Signal(providing_args=["instance", "old_status", "new_status"])
+# sent once when all the nodes of a layer have been published or unpublished
+layer_nodes_published_changed = django.dispatch.Signal(providing_args=["instance", "is_published", "count"])
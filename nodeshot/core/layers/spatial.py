@@ -0,0 +1,82 @@
+"""
+lookup of the layers which contain many points at once,
+either with one spatial join in the database or with an in memory index
+of the areas of the layers (see Node.intersecting_layers for the single point version)
+"""
+from bisect import bisect_right
+
+from django.db import connection
+
+from .models import Layer
+
+
+__all__ = [
+    'layers_containing',
+    'LayerAreaIndex',
+]
+
+
+LAYERS_CONTAINING_SQL = """
+SELECT p.index, l.id
+FROM (VALUES %(values)s) AS p (index, geometry)
+JOIN layers_layer l ON ST_Contains(l.area, p.geometry)
+ORDER BY p.index, l.id
+"""
+
+
+def layers_containing(points, chunk_size=5000):
+    """
+    returns a list which contains, for each of the specified points,
+    the list of layers whose area contains the point;
+    runs one spatial join for each chunk of points and one query to retrieve the layers
+    """
+    matches = [[] for point in points]
+    cursor = connection.cursor()
+    for start in range(0, len(points), chunk_size):
+        values = []
+        params = []
+        for index, point in enumerate(points[start:start + chunk_size], start):
+            values.append('(%s, ST_GeomFromText(%s, %s))')
+            params += [index, point.wkt, point.srid or 4326]
+        cursor.execute(LAYERS_CONTAINING_SQL % {'values': ', '.join(values)}, params)
+        for index, layer_id in cursor.fetchall():
+            matches[index].append(layer_id)
+    layer_ids = set(layer_id for layer_ids in matches for layer_id in layer_ids)
+    layers = Layer.objects.in_bulk(layer_ids) if layer_ids else {}
+    return [[layers[layer_id] for layer_id in layer_ids] for layer_ids in matches]
+
+
+class LayerAreaIndex(object):
+    """
+    In memory index of the areas of layers, points are looked up without queries.
+    Areas are sorted by the minimum longitude of their extent so that only
+    the areas whose extent might contain a point are tested (with prepared geometries).
+
+    Usage:
+        index = LayerAreaIndex()
+        index.query(node.point)
+    """
+    def __init__(self, layers=None):
+        if layers is None:
+            layers = Layer.objects.all()
+        entries = []
+        for layer in layers:
+            if layer.area is None:
+                continue
+            xmin, ymin, xmax, ymax = layer.area.extent
+            entries.append((xmin, ymin, xmax, ymax, layer.area.prepared, layer))
+        entries.sort(key=lambda entry: entry[0])
+        self._entries = entries
+        self._xmins = [entry[0] for entry in entries]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def query(self, point):
+        """ returns the list of layers whose area contains point, ordered by id """
+        layers = []
+        # areas whose extent starts after the point can't contain it
+        for xmin, ymin, xmax, ymax, prepared, layer in self._entries[:bisect_right(self._xmins, point.x)]:
+            if point.x <= xmax and ymin <= point.y <= ymax and prepared.contains(point):
+                layers.append(layer)
+        return sorted(layers, key=lambda layer: layer.pk)
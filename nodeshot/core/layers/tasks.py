@@ -0,0 +1,59 @@
+from celery import task
+from django.core.cache import cache
+
+from .settings import PUBLISH_CASCADE_CHUNK_SIZE
+from .signals import layer_nodes_published_changed
+
+
+PROGRESS_KEY = 'layer_publish_progress:%s'
+
+
+def get_publish_progress(layer_id):
+    """
+    returns the progress of the last publish/unpublish cascade of the specified layer, eg:
+    {'is_published': False, 'total': 25000, 'done': 3000, 'completed': False}
+    returns None if no information is available
+    """
+    return cache.get(PROGRESS_KEY % layer_id)
+
+
+def set_publish_progress(layer_id, **kwargs):
+    cache.set(PROGRESS_KEY % layer_id, kwargs, 86400)
+
+
+@task
+def update_nodes_published(layer_id, chunk_size=PUBLISH_CASCADE_CHUNK_SIZE):
+    """
+    Publish or unpublish all the nodes of a layer, one chunk at time.
+    The progress is stored in the cache (see get_publish_progress) and
+    the layer_nodes_published_changed signal is sent only once at the end.
+
+    The current value of Layer.is_published is read from the database,
+    so jobs queued by quick consecutive changes can't leave the nodes out of step with the layer.
+
+    :param layer_id: id of the layer
+    """
+    # putting the models inside prevents circular imports
+    from nodeshot.core.nodes.models import Node
+    from .models import Layer
+
+    try:
+        layer = Layer.objects.get(pk=layer_id)
+    except Layer.DoesNotExist:
+        return 0
+    is_published = layer.is_published
+    queryset = Node.objects.filter(layer_id=layer_id).exclude(is_published=is_published)
+    total = queryset.count()
+    done = 0
+    set_publish_progress(layer_id, is_published=is_published, total=total, done=done, completed=False)
+
+    while done < total:
+        ids = list(queryset.order_by().values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            break
+        done += Node.objects.filter(pk__in=ids).update(is_published=is_published)
+        set_publish_progress(layer_id, is_published=is_published, total=total, done=done, completed=False)
+
+    set_publish_progress(layer_id, is_published=is_published, total=total, done=done, completed=True)
+    layer_nodes_published_changed.send(sender=Layer, instance=layer, is_published=is_published, count=done)
+    return done
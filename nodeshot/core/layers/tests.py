@@ -10,10 +10,12 @@ from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext as _
 from django.contrib.gis.geos import GEOSGeometry, Point
 
-from nodeshot.core.base.tests import user_fixtures
-from nodeshot.core.nodes.models import Node  # test additional validation added by layer model
+from nodeshot.core.base import cache as cache_utils
+from nodeshot.core.base.tests import user_fixtures, streamed_json, local_memory_cache
+from nodeshot.core.nodes.models import Node, Status  # test additional validation added by layer model
 
 from .models import Layer
+from . import tasks
 
 
 class LayerTest(TestCase):
@@ -97,13 +99,45 @@ class LayerTest(TestCase):
         layer.nodes_minimum_distance = 100
         layer.save()
 
+        # validation is skipped if coordinates are not changing
+        new_node.full_clean()
+
+        # moving the node near to another node of the same layer fails
+        new_node.geometry = GEOSGeometry('POINT (%s %s)' % (node.geometry.x + 0.0001, node.geometry.y))
         try:
             new_node.full_clean()
         except ValidationError as e:
             self.assertIn(_('Distance between nodes cannot be less than %s meters') % layer.nodes_minimum_distance, e.messages)
-            return
+        else:
+            self.assertTrue(False, 'validation not working as expected')
+
+        # nodes of other layers are not taken into account
+        new_node.layer = Layer.objects.get(slug='pisa')
+        new_node.layer.nodes_minimum_distance = 100
+        new_node.full_clean()
 
-        self.assertTrue(False, 'validation not working as expected')
+    def test_layer_nodes_minimum_distance_bulk(self):
+        """ ensure the bulk version of the minimum distance validation works as expected """
+        from .models.layer import bulk_nodes_minimum_distance_validation
+        layer = Layer.objects.get(slug='rome')
+        layer.nodes_minimum_distance = 100
+        layer.save()
+        node = layer.node_set.all()[0]
+        nodes = [
+            # too close to an existing node
+            Node(name='bulk1', layer=layer, geometry=node.geometry),
+            # far from everything
+            Node(name='bulk2', layer=layer, geometry=GEOSGeometry('POINT (12.9 41.9)')),
+            # too close to the previous node of the list
+            Node(name='bulk3', layer=layer, geometry=GEOSGeometry('POINT (12.9001 41.9)')),
+            # existing node which is not moving
+            node
+        ]
+        errors = bulk_nodes_minimum_distance_validation(nodes)
+        self.assertEqual(sorted(errors.keys()), [0, 2])
+        # existing nodes which are not moving are not checked at all
+        with self.assertNumQueries(0):
+            self.assertEqual(bulk_nodes_minimum_distance_validation([node]), {})
 
     def test_layers_api(self, *args, **kwargs):
         """
@@ -158,7 +192,7 @@ class LayerTest(TestCase):
 
         # api_layer_nodes_geojson
         response = self.client.get(reverse('api_layer_nodes_geojson', args=[layer_slug]))
-        self.assertEqual(len(response.data['features']), layer_public_nodes_count)
+        self.assertEqual(len(streamed_json(response)['features']), layer_public_nodes_count)
 
     def test_layers_api_post(self):
         layer_count = Layer.objects.all().count()
@@ -186,6 +220,11 @@ class LayerTest(TestCase):
         layer.is_published = False
         layer.full_clean()
         layer.save()
+        # inside a transaction the job is queued by the caller once it has been committed
+        self.assertTrue(layer._nodes_published_pending)
+        self.assertTrue(layer.node_set.filter(is_published=True).exists())
+        layer.update_nodes_published()
+        self.assertFalse(layer._nodes_published_pending)
         for node in layer.node_set.all():
             self.assertFalse(node.is_published)
 
@@ -193,9 +232,50 @@ class LayerTest(TestCase):
         layer.is_published = True
         layer.full_clean()
         layer.save()
+        layer.update_nodes_published()
         for node in layer.node_set.all():
             self.assertTrue(node.is_published)
 
+    def test_unpublish_layer_through_api(self):
+        """ the API queues the job after the transaction of the request """
+        layer = Layer.objects.get(slug='rome')
+        self.assertTrue(layer.node_set.filter(is_published=True).exists())
+        self.client.login(username='admin', password='tester')
+        url = reverse('api_layer_detail', args=[layer.slug])
+        response = self.client.patch(url, json.dumps({'is_published': False}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(layer.node_set.filter(is_published=True).exists())
+
+    @local_memory_cache(tasks, cache_utils)
+    def test_unpublish_layer_nodes_in_chunks(self):
+        from .signals import layer_nodes_published_changed
+        layer = Layer.objects.get(slug='rome')
+        count = layer.node_set.filter(is_published=True).count()
+        self.assertTrue(count > 1)
+        sent = []
+
+        def handler(sender, **kwargs):
+            sent.append(kwargs)
+        layer_nodes_published_changed.connect(handler)
+        try:
+            version = cache_utils.get_tags_version(['layer:%s' % layer.pk])
+            self.assertIsNone(layer.publish_progress)
+            Layer.objects.filter(pk=layer.pk).update(is_published=False)
+            self.assertEqual(tasks.update_nodes_published(layer.pk, chunk_size=1), count)
+            self.assertEqual(layer.node_set.filter(is_published=True).count(), 0)
+            self.assertEqual(layer.publish_progress, {
+                'is_published': False,
+                'total': count,
+                'done': count,
+                'completed': True
+            })
+            # signal is sent and cache is invalidated only once
+            self.assertEqual(len(sent), 1)
+            self.assertEqual(sent[0]['count'], count)
+            self.assertNotEqual(cache_utils.get_tags_version(['layer:%s' % layer.pk]), version)
+        finally:
+            layer_nodes_published_changed.disconnect(handler)
+
     def test_layer_area_point_or_polygon(self):
         layer = Layer.objects.get(slug='rome')
         layer.area = GEOSGeometry('LINESTRING (12.19 41.92, 12.58 42.17)')
@@ -275,11 +355,17 @@ class LayerTest(TestCase):
         response = self.client.put(url, json.dumps(json_data), content_type='application/json')
         self.assertEqual(200, response.status_code)
 
-        # re-enable minimum distance and update again with coords too near. Insert should fail
+        # re-enable minimum distance and update again with the same coords. Update should succeed
+        # because minimum distance is not checked if coordinates are not changing
         layer.nodes_minimum_distance = 100
         layer.save()
         url = reverse('api_node_details', args=[node_slug])
         response = self.client.put(url, json.dumps(json_data), content_type='application/json')
+        self.assertEqual(200, response.status_code)
+
+        # update again with different coords which are too near. Update should fail
+        json_data['geometry'] = json.loads(GEOSGeometry("POINT (12.5822391918 41.872042279)").json)
+        response = self.client.put(url, json.dumps(json_data), content_type='application/json')
         self.assertEqual(400, response.status_code)
 
         # Defining an area for the layer and testing if node is inside the area
@@ -313,6 +399,92 @@ class LayerTest(TestCase):
         # delete new nodes just added before
         n.delete()
 
+    def test_layers_containing_points(self):
+        from .spatial import layers_containing, LayerAreaIndex
+        rome = Layer.objects.get(slug='rome')
+        rome.area = GEOSGeometry('POLYGON ((12.19 41.92, 12.58 42.17, 12.82 41.86, 12.43 41.64, 12.43 41.65, 12.19 41.92))')
+        rome.save()
+        points = [
+            Point(12.5, 41.9),
+            Point(50, 50),
+            # areas made of a point contain only that point
+            Layer.objects.get(slug='viterbo').area
+        ]
+        expected = [list(Layer.objects.filter(area__contains=point).order_by('id')) for point in points]
+        self.assertEqual(expected[0], [rome])
+        self.assertEqual(expected[1], [])
+        with self.assertNumQueries(2):
+            self.assertEqual(layers_containing(points), expected)
+        index = LayerAreaIndex()
+        with self.assertNumQueries(0):
+            self.assertEqual([index.query(point) for point in points], expected)
+
+    @local_memory_cache()
+    def test_layer_stats(self):
+        from .models import LayerStats, node_saved_layer_stats
+        rome = Layer.objects.get(slug='rome')
+        nodes = rome.node_set.filter(is_published=True)
+        stats = LayerStats.objects.get(layer=rome)
+        self.assertEqual(stats.nodes, nodes.count())
+        self.assertEqual(sum(stats.nodes_by_status.values()), nodes.exclude(status=None).count())
+        self.assertEqual(stats.last_update, max(node.updated for node in nodes))
+        for node in nodes:
+            self.assertTrue(stats.extent.intersects(node.geometry))
+        # refreshed when nodes change
+        node = Node(name='stats', layer=rome, geometry=GEOSGeometry('POINT (12.51 41.89)'))
+        node.save()
+        new_stats = LayerStats.objects.get(layer=rome)
+        self.assertEqual(new_stats.nodes, stats.nodes + 1)
+        self.assertEqual(sum(new_stats.nodes_by_status.values()), sum(stats.nodes_by_status.values()) + 1)
+        self.assertEqual(new_stats.last_update, node.updated)
+        self.assertTrue(new_stats.extent.intersects(node.geometry))
+        # status changes are applied incrementally
+        old_status = node.status
+        node.status = Status.objects.exclude(pk=old_status.pk).first()
+        node.save()
+        new_stats = LayerStats.objects.get(layer=rome)
+        self.assertEqual(new_stats.nodes, stats.nodes + 1)
+        self.assertEqual(new_stats.nodes_by_status.get(node.status.slug),
+                         stats.nodes_by_status.get(node.status.slug, 0) + 1)
+        self.assertEqual(new_stats.nodes_by_status.get(old_status.slug, 0),
+                         stats.nodes_by_status.get(old_status.slug, 0))
+        # changes which don't affect count, statuses and extent update only the last update
+        node.description = 'changed'
+        node.save()
+        self.assertEqual(LayerStats.objects.get(layer=rome).last_update, node.updated)
+        node._current_status = node.status_id
+        with self.assertNumQueries(1):
+            node_saved_layer_stats(sender=Node, instance=node, created=False)
+        # unpublishing recomputes the stats
+        node.is_published = False
+        node.save()
+        self.assertEqual(LayerStats.objects.get(layer=rome).nodes, stats.nodes)
+        node.is_published = True
+        node.save()
+        self.assertEqual(LayerStats.objects.get(layer=rome).nodes, stats.nodes + 1)
+        # moving a node to another layer refreshes both layers
+        pisa_count = LayerStats.objects.get(layer__slug='pisa').nodes
+        node.layer = Layer.objects.get(slug='pisa')
+        node.save()
+        self.assertEqual(LayerStats.objects.get(layer=rome).nodes, stats.nodes)
+        self.assertEqual(LayerStats.objects.get(layer__slug='pisa').nodes, pisa_count + 1)
+        node.delete()
+        self.assertEqual(LayerStats.objects.get(layer__slug='pisa').nodes, pisa_count)
+
+        url = reverse('api_layer_stats')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        published = Layer.objects.published().count()
+        self.assertEqual(len(response.data), published)
+        data = dict((layer['slug'], layer) for layer in response.data)
+        self.assertEqual(data['rome']['nodes'], stats.nodes)
+        self.assertEqual(data['rome']['bbox'], list(stats.extent.extent))
+        # cached response is invalidated when a node changes
+        Node(name='stats', layer=rome, geometry=GEOSGeometry('POINT (12.51 41.89)')).save()
+        response = self.client.get(url)
+        data = dict((layer['slug'], layer) for layer in response.data)
+        self.assertEqual(data['rome']['nodes'], stats.nodes + 1)
+
     def test_layer_center(self):
         l = Layer.objects.first()
         self.assertIsInstance(l.center, Point)
@@ -324,6 +496,26 @@ class LayerTest(TestCase):
         l.area = None
         self.assertIsNone(l.center)
 
+    def test_layer_simplified_area(self):
+        layer = Layer.objects.get(slug='rome')
+        # points are not simplified
+        self.assertIsNone(layer.area_low)
+        coords = ['%s 41.9' % (12.4 + i * 0.001) for i in range(100)] + ['12.6 42.0', '12.4 42.0', '12.4 41.9']
+        layer.area = GEOSGeometry('POLYGON ((%s))' % ', '.join(coords))
+        layer.save()
+        layer = Layer.objects.get(pk=layer.pk)
+        self.assertTrue(layer.area_low.num_coords < layer.area.num_coords)
+        url = reverse('api_layer_geojson')
+        response = self.client.get(url, {'simplify': 'low'})
+        self.assertEqual(response.status_code, 200)
+        features = dict((feature['properties']['slug'], feature) for feature in response.data['features'])
+        self.assertEqual(len(features['rome']['geometry']['coordinates'][0]), layer.area_low.num_coords)
+        response = self.client.get(url)
+        features = dict((feature['properties']['slug'], feature) for feature in response.data['features'])
+        self.assertEqual(len(features['rome']['geometry']['coordinates'][0]), 103)
+        response = self.client.get(url, {'zoom': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
     def test_external_layer_nodes_geojson(self):
         """ test node geojson list """
         url = reverse('api_layer_nodes_geojson', args=['vienna'])
@@ -343,7 +535,7 @@ class LayerTest(TestCase):
         # ensure all results returned by default
         response = self.client.get(url)
         count = Node.objects.filter(layer__slug='rome').published().access_level_up_to('public').count()
-        self.assertEqual(len(response.data['features']), count)
+        self.assertEqual(len(streamed_json(response)['features']), count)
         # ensure pagination doesn't break geojson format
         response = self.client.get(url, {'limit': '1'})
         self.assertIn('type', response.data)
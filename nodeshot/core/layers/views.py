@@ -3,13 +3,16 @@ from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import generics, permissions, authentication
 from rest_framework.response import Response
+from rest_framework_extensions.cache.decorators import cache_response
 
 from nodeshot.core.base.utils import Hider
-from nodeshot.core.nodes.views import NodeList
+from nodeshot.core.base.mixins import ConditionalGetMixin
+from nodeshot.core.base.cache import cache_by_group, tagged
+from nodeshot.core.nodes.views import NodeList, NodeGeoJSONListMixin, SimplifiedGeometryMixin
 from nodeshot.core.nodes.serializers import NodeGeoSerializer, PaginatedGeojsonNodeListSerializer
 
 from .settings import REVERSION_ENABLED
-from .models import Layer
+from .models import Layer, LayerStats
 from .serializers import *  # noqa
 
 
@@ -29,9 +32,10 @@ else:
         pass
 
 
-class LayerList(LayerListBase):
+class LayerList(ConditionalGetMixin, LayerListBase):
     """
     Retrieve list of all layers.
+    Supports conditional requests (ETag and Last-Modified).
 
     ### POST
 
@@ -45,6 +49,9 @@ class LayerList(LayerListBase):
     paginate_by_param = 'limit'
     paginate_by = None
 
+    def get_cache_tags(self):
+        return ['layers']
+
 layer_list = LayerList.as_view()
 
 
@@ -62,9 +69,39 @@ class LayerDetail(LayerDetailBase):
     serializer_class = LayerDetailSerializer
     lookup_field = 'slug'
 
+    def dispatch(self, request, *args, **kwargs):
+        response = super(LayerDetail, self).dispatch(request, *args, **kwargs)
+        # nodes are published or unpublished once the change of the layer has been committed
+        layer = getattr(self, 'object', None)
+        if response.status_code < 400 and layer is not None and layer._nodes_published_pending:
+            layer.update_nodes_published()
+        return response
+
 layer_detail = LayerDetail.as_view()
 
 
+class LayerStatsList(generics.ListAPIView):
+    """
+    Retrieve the statistics of all the published layers:
+    number of published nodes (total and by status), number of links,
+    bounding box of the nodes and last time a node has been updated.
+
+    Statistics are precomputed each time nodes or links change.
+    """
+    queryset = LayerStats.objects.filter(layer__is_published=True).select_related('layer').order_by('layer__name')
+    serializer_class = LayerStatsSerializer
+    paginate_by = None
+
+    def get_cache_tags(self):
+        return ['layer_stats']
+
+    @cache_response(86400, key_func=tagged(cache_by_group))  # cache for 1 day
+    def get(self, request, *args, **kwargs):
+        return super(LayerStatsList, self).get(request, *args, **kwargs)
+
+layer_stats = LayerStatsList.as_view()
+
+
 class LayerNodesList(NodeList):
     """
     Retrieve list of nodes of the specified layer
@@ -90,6 +127,10 @@ class LayerNodesList(NodeList):
         self.get_layer()
         return super(LayerNodesList, self).get_queryset().filter(layer_id=self.layer.id)
 
+    def get_cache_tags(self):
+        self.get_layer()
+        return ['layer:%s' % self.layer.pk, 'layers', 'statuses', 'users']
+
     def get_nodes(self, request, *args, **kwargs):
         """ this method might be overridden by other modules (eg: nodeshot.interop.sync) """
         # ListSerializerMixin.list returns a serializer object
@@ -107,13 +148,18 @@ class LayerNodesList(NodeList):
 nodes_list = LayerNodesList.as_view()
 
 
-class LayerNodesGeoJSONList(LayerNodesList):
+class LayerNodesGeoJSONList(ConditionalGetMixin, NodeGeoJSONListMixin, LayerNodesList):
     """
     Retrieve list of nodes of the specified layer in GeoJSON format.
+    Supports conditional requests (ETag and Last-Modified) if the layer is not external.
 
     Parameters:
 
      * `search=<word>`: search <word> in name, slug, description and address of nodes
+     * `bbox=<min_lng>,<min_lat>,<max_lng>,<max_lat>`: retrieve only nodes contained in the bounding box
+     * `zoom=<n>`: zoom level of the map, at low zoom levels nodes are grouped in clusters
+        and geometries are simplified
+     * `simplify=<level>`: retrieve simplified geometries (low, medium, high)
      * `limit=<n>`: specify number of items per page (show all by default)
     """
     pagination_serializer_class = PaginatedGeojsonNodeListSerializer
@@ -123,17 +169,25 @@ class LayerNodesGeoJSONList(LayerNodesList):
 
     def get(self, request, *args, **kwargs):
         """ Retrieve list of nodes of the specified layer in GeoJSON format. """
-        # overwritten just to tweak the docstring for auto documentation purposes
+        self.get_layer()
+        # nodes of local layers can be streamed
+        if not self.layer.is_external:
+            return self.list(request, *args, **kwargs)
+        # nodes of external layers might be retrieved by their synchronizer (see get_nodes)
+        self.streaming = False
+        self.conditional = False
         return super(LayerNodesGeoJSONList, self).get(request, *args, **kwargs)
 
 nodes_geojson_list = LayerNodesGeoJSONList.as_view()
 
 
-class LayerGeoJSONList(generics.ListAPIView):
+class LayerGeoJSONList(SimplifiedGeometryMixin, generics.ListAPIView):
     """
     Retrieve list of layers in GeoJSON format.
     Parameters:
 
+     * `zoom=<n>`: zoom level of the map, areas are simplified according to the zoom level
+     * `simplify=<level>`: retrieve simplified areas (low, medium, high)
      * `limit=<n>`: specify number of items per page (defaults to 40)
      * `page=<n>`: show page n
     """
@@ -143,4 +197,16 @@ class LayerGeoJSONList(generics.ListAPIView):
     serializer_class = GeoLayerListSerializer
     queryset = Layer.objects.published().exclude(area__isnull=True)
 
+    def filter_queryset(self, queryset):
+        """ replaces the area of the layers with the simplified one if requested """
+        queryset = super(LayerGeoJSONList, self).filter_queryset(queryset)
+        level = self.get_simplify_level()
+        if level is None:
+            return queryset
+        # the list of layers is short, the areas are replaced in python
+        layers = list(queryset)
+        for layer in layers:
+            layer.area = getattr(layer, 'area_%s' % level) or layer.area
+        return layers
+
 layers_geojson_list = LayerGeoJSONList.as_view()
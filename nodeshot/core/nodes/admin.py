@@ -71,6 +71,16 @@ class NodeAdmin(PublishActionsAdminMixin, GeoAdmin):
         html_editor_fields = ['description']
 
 
+def _refresh_status_registry(view):
+    """ admin views save statuses in a transaction, the registry is refreshed once it has ended """
+    def wrapper(self, request, *args, **kwargs):
+        try:
+            return view(self, request, *args, **kwargs)
+        finally:
+            Status.registry_changed()
+    return wrapper
+
+
 class StatusAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug', 'description', 'order', 'is_default')
     prepopulated_fields = {'slug': ('name',)}
@@ -78,6 +88,11 @@ class StatusAdmin(admin.ModelAdmin):
 
     change_list_template = 'smuggler/change_list.html'
 
+    add_view = _refresh_status_registry(admin.ModelAdmin.add_view)
+    change_view = _refresh_status_registry(admin.ModelAdmin.change_view)
+    changelist_view = _refresh_status_registry(admin.ModelAdmin.changelist_view)
+    delete_view = _refresh_status_registry(admin.ModelAdmin.delete_view)
+
 
 admin.site.register(Node, NodeAdmin)
 admin.site.register(Status, StatusAdmin)
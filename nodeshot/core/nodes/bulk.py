@@ -0,0 +1,239 @@
+"""
+creation and update of many nodes at once: features are validated with set based queries,
+inserted with one bulk insert (or updated in one transaction) and announced with one aggregated signal
+"""
+import simplejson as json
+
+from django.db import transaction
+from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.contrib.gis.geos import GEOSGeometry, GEOSException, GeometryCollection
+from django.contrib.gis.gdal import OGRException
+from django.template.defaultfilters import slugify
+from django.utils.timezone import now
+from django.utils.translation import ugettext_lazy as _
+
+from .models import Node, Status
+from .search import update_search_vector
+from .geometry import update_representative_point, update_simplified_geometries
+from .signals import nodes_bulk_created, nodes_bulk_updated
+
+
+__all__ = [
+    'features_to_nodes',
+    'bulk_create_nodes',
+    'bulk_update_nodes',
+]
+
+
+# properties of the features which are copied on the nodes
+FIELDS = ('name', 'elev', 'address', 'description')
+# columns derived from the other fields, updated with set based queries
+DERIVED_FIELDS = ('search_vector', 'representative_point', 'geometry_low', 'geometry_medium', 'geometry_high')
+
+
+def _add_error(errors, index, field, message):
+    errors[index].setdefault(field, []).append(unicode(message))
+
+
+def _can_change(user, node):
+    """ same rules of IsOwnerOrReadOnly """
+    layer = getattr(node, 'layer', None)
+    if layer is not None and layer.is_external:
+        return False
+    return node.user_id == user.pk or user.has_perm('nodes.change_node')
+
+
+def features_to_nodes(features, user=None, update=False):
+    """
+    converts a list of GeoJSON features in Node instances and validates them
+    with a fixed number of queries, regardless of the number of features
+
+    if update is True the "id" of each feature must be the slug of an existing node
+    which user is allowed to change, the properties contained in the feature are changed,
+    otherwise unsaved nodes are returned
+
+    returns a tuple containing the list of nodes and a list containing the errors
+    of each feature (an empty dictionary means the feature is valid)
+    """
+    errors = [{} for feature in features]
+    nodes = []
+    has_layer = hasattr(Node, 'layer')
+    date = now()
+
+    # statuses come from the status registry, layers and existing nodes are retrieved with one query
+    registry = Status.get_registry()
+    statuses = dict((status.slug, status) for status in registry['id'].values())
+    default_status = registry['default']
+    layers = {}
+    if has_layer:
+        Layer = Node._meta.get_field('layer').rel.to
+        slugs = [(feature.get('properties') or {}).get('layer') for feature in features
+                 if isinstance(feature, dict)]
+        layers = dict((layer.slug, layer) for layer in Layer.objects.filter(slug__in=slugs))
+    existing = {}
+    if update:
+        ids = [feature.get('id') for feature in features if isinstance(feature, dict)]
+        queryset = Node.objects.filter(slug__in=[id for id in ids if id])
+        if has_layer:
+            queryset = queryset.select_related('layer')
+        existing = dict((node.slug, node) for node in queryset)
+
+    for index, feature in enumerate(features):
+        if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+            nodes.append(Node(user=user, added=date, updated=date))
+            _add_error(errors, index, '__all__', _('not a valid GeoJSON feature'))
+            continue
+        properties = feature.get('properties') or {}
+        if update:
+            node = existing.get(feature.get('id'))
+            if node is None:
+                nodes.append(Node(updated=date))
+                _add_error(errors, index, '__all__', _('node "%s" does not exist') % feature.get('id'))
+                continue
+            if not _can_change(user, node):
+                nodes.append(node)
+                _add_error(errors, index, '__all__', _('you are not allowed to change node "%s"') % node.slug)
+                continue
+            node.updated = date
+            fields = [field for field in FIELDS if field in properties]
+            # columns written by bulk_update_nodes
+            node._changed_fields = set(fields + ['updated'])
+        else:
+            node = Node(user=user, added=date, updated=date)
+            fields = FIELDS
+        nodes.append(node)
+        for field in fields:
+            setattr(node, field, properties.get(field))
+        # geometry
+        if not update or 'geometry' in feature:
+            try:
+                node.geometry = GEOSGeometry(json.dumps(feature.get('geometry')))
+            except (ValueError, TypeError, GEOSException, OGRException):
+                _add_error(errors, index, 'geometry', _('invalid geometry'))
+            else:
+                # same as Node.save: collections of 1 item are converted to that item
+                if isinstance(node.geometry, GeometryCollection) and 0 < len(node.geometry) < 2:
+                    node.geometry = node.geometry[0]
+                if update:
+                    node._changed_fields.add('geometry')
+        # status
+        status = properties.get('status')
+        if status and status not in statuses:
+            _add_error(errors, index, 'status', _('status "%s" does not exist') % status)
+        elif status or not update:
+            node.status = statuses.get(status, default_status)
+            if update:
+                node._changed_fields.add('status')
+        # layer
+        if has_layer and (not update or 'layer' in properties):
+            layer = properties.get('layer')
+            if layer not in layers:
+                _add_error(errors, index, 'layer', _('layer "%s" does not exist') % layer)
+            else:
+                node.layer = layers[layer]
+                if update:
+                    node._changed_fields.add('layer')
+        if node.name:
+            node._autofill_slug()
+            if update and 'name' in properties:
+                node._changed_fields.add('slug')
+        # validation of single fields which doesn't require queries
+        try:
+            node.clean_fields(exclude=['geometry', 'status', 'layer', 'user', 'search_vector'])
+        except ValidationError as e:
+            for field, messages in e.message_dict.items():
+                for message in messages:
+                    _add_error(errors, index, field, message)
+
+    # names and slugs must be unique, both in the database and in the submitted features
+    names = [node.name for node in nodes if node.name]
+    slugs = [node.slug for node in nodes if node.slug]
+    taken_names = set()
+    taken_slugs = set()
+    if names:
+        queryset = Node.objects.filter(Q(name__in=names) | Q(slug__in=slugs))
+        # nodes which are being updated don't conflict with themselves
+        queryset = queryset.exclude(pk__in=[node.pk for node in nodes if node.pk])
+        for name, slug in queryset.values_list('name', 'slug'):
+            taken_names.add(name)
+            taken_slugs.add(slug)
+    for index, node in enumerate(nodes):
+        if not node.name:
+            continue
+        if node.name in taken_names or node.slug in taken_slugs:
+            _add_error(errors, index, 'name', _('Node with this name already exists.'))
+        taken_names.add(node.name)
+        taken_slugs.add(node.slug)
+
+    # additional validation is performed only on the nodes which are valid so far
+    valid = [index for index, error in enumerate(errors) if not error]
+    bulk_errors = Node.bulk_validation([nodes[index] for index in valid])
+    for position, messages in bulk_errors.items():
+        for message in messages:
+            _add_error(errors, valid[position], '__all__', message)
+
+    return nodes, errors
+
+
+def bulk_create_nodes(nodes):
+    """
+    inserts the specified nodes (which must have been validated with features_to_nodes)
+    in one transaction and sends the nodes_bulk_created signal once
+
+    returns the list of created nodes
+    """
+    with transaction.atomic():
+        Node.objects.bulk_create(nodes)
+        # bulk_create doesn't set the primary keys of the objects
+        queryset = Node.objects.filter(slug__in=[node.slug for node in nodes])
+        update_search_vector(queryset)
+        update_representative_point(queryset)
+        update_simplified_geometries(queryset)
+    related = ['status', 'user', 'layer'] if hasattr(Node, 'layer') else ['status', 'user']
+    created = list(queryset.select_related(*related))
+    nodes_bulk_created.send(sender=Node, instances=created)
+    return created
+
+
+def bulk_update_nodes(nodes):
+    """
+    saves the specified existing nodes (which must have been validated) in one transaction,
+    updates their derived columns with set based queries and sends the nodes_bulk_updated signal once
+    (post_save and node_status_changed are not sent)
+
+    only the columns listed in the _changed_fields attribute of each node (set by features_to_nodes)
+    are written, all the columns are written for nodes which don't have it
+
+    returns the list of updated nodes
+    """
+    fields = [field for field in Node._meta.fields
+              if not field.primary_key and field.name not in DERIVED_FIELDS]
+    with transaction.atomic():
+        texts = []
+        geometries = []
+        for node in nodes:
+            changed = getattr(node, '_changed_fields', None)
+            values = dict((field.name, getattr(node, field.attname)) for field in fields
+                          if changed is None or field.name in changed)
+            Node.objects.filter(pk=node.pk).update(**values)
+            # derived columns are updated only if their source columns have changed
+            if changed is None or changed & set(('name', 'slug', 'address', 'description')):
+                texts.append(node.pk)
+            if changed is None or 'geometry' in changed:
+                geometries.append(node.pk)
+        if texts:
+            update_search_vector(Node.objects.filter(pk__in=texts))
+        if geometries:
+            queryset = Node.objects.filter(pk__in=geometries)
+            update_representative_point(queryset)
+            update_simplified_geometries(queryset)
+    # status of each node before the update (node pk: status id)
+    old_statuses = dict((node.pk, node._current_status) for node in nodes)
+    nodes_bulk_updated.send(sender=Node, instances=nodes, old_statuses=old_statuses)
+    # same as Node.save
+    for node in nodes:
+        node._current_status = node.status_id
+        node._set_current_geometry()
+        node._changed_fields = None
+    return nodes
@@ -0,0 +1,67 @@
+"""
+server side grid clustering of nodes, used by the GeoJSON lists at low zoom levels
+"""
+import simplejson as json
+
+from django.db import connection
+
+from .settings import CLUSTER_GRID_SIZE
+
+
+__all__ = [
+    'grid_cell_size',
+    'cluster_queryset',
+]
+
+
+CLUSTER_SQL = """
+SELECT COUNT(n.id),
+       ST_AsGeoJSON(ST_Centroid(ST_Collect(n.representative_point))),
+       MIN(n.id)
+FROM nodes_node n
+WHERE n.id IN (%(subquery)s)
+GROUP BY ST_SnapToGrid(n.representative_point, %(size)s)
+"""
+
+
+def grid_cell_size(zoom):
+    """
+    returns the size in degrees of the cells of the clustering grid at the specified zoom level
+    (tiles are 256 pixels wide, cells are CLUSTER_GRID_SIZE pixels wide)
+    """
+    return 360.0 / (2 ** zoom) * CLUSTER_GRID_SIZE / 256
+
+
+def cluster_queryset(queryset, zoom):
+    """
+    groups the nodes of the specified queryset in a grid whose size depends on the zoom level
+
+    returns a tuple containing:
+        * a list of GeoJSON features representing the clusters (cells containing more than one node)
+        * a list of ids of the nodes which are alone in their cell
+    """
+    subquery, params = queryset.order_by().values_list('id', flat=True).query.sql_with_params()
+    sql = CLUSTER_SQL % {
+        'subquery': subquery,
+        'size': grid_cell_size(zoom)
+    }
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+
+    clusters = []
+    single_ids = []
+
+    for count, geometry, node_id in cursor.fetchall():
+        if count > 1:
+            clusters.append({
+                'type': 'Feature',
+                'geometry': json.loads(geometry),
+                'properties': {
+                    'cluster': True,
+                    'count': count
+                }
+            })
+        else:
+            single_ids.append(node_id)
+
+    return clusters, single_ids
@@ -0,0 +1,95 @@
+"""
+set based updates of the geometric columns which are derived from the geometry of nodes
+"""
+from django.db import connection
+
+from .settings import SIMPLIFY_TOLERANCES
+
+
+__all__ = [
+    'update_representative_point',
+    'SIMPLIFY_LEVELS',
+    'simplify_level_for_zoom',
+    'simplified_geometries',
+    'update_simplified_geometries',
+]
+
+
+# levels of simplification from the coarsest to the finest,
+# each level is stored in a column named <geometry column>_<level>
+SIMPLIFY_LEVELS = ('low', 'medium', 'high')
+
+
+# same result of Node.compute_point (ST_PointOnSurface does not support collections)
+REPRESENTATIVE_POINT_SQL = """
+UPDATE nodes_node SET representative_point = CASE
+    WHEN GeometryType(geometry) = 'POINT' THEN geometry
+    WHEN GeometryType(geometry) = 'GEOMETRYCOLLECTION' THEN ST_Centroid(geometry)
+    ELSE ST_PointOnSurface(geometry)
+END
+WHERE id IN (%(subquery)s)
+"""
+
+
+def update_representative_point(queryset):
+    """
+    updates the representative point of the nodes contained in queryset with one query
+    (useful when Node.save is not called, eg: bulk_create, migrations)
+    returns the number of updated nodes
+    """
+    subquery, params = queryset.order_by().values_list('id', flat=True).query.sql_with_params()
+    sql = REPRESENTATIVE_POINT_SQL % {
+        # placeholders of the subquery are left untouched and filled by cursor.execute
+        'subquery': subquery
+    }
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.rowcount
+
+
+# points can't be simplified, NULL means the original geometry has to be used
+SIMPLIFIED_GEOMETRY_SQL = """
+CASE WHEN GeometryType(%(field)s) IN ('POINT', 'MULTIPOINT') THEN NULL
+ELSE ST_SimplifyPreserveTopology(%(field)s, %(tolerance)s) END
+"""
+
+
+def simplify_level_for_zoom(zoom):
+    """
+    returns the coarsest level of simplification which is not noticeable at the specified zoom level
+    (its tolerance is not bigger than the size of a pixel) or None if the original geometry must be used
+    """
+    # size of a pixel in degrees (tiles are 256 pixels wide)
+    pixel = 360.0 / (2 ** zoom) / 256
+    for level in SIMPLIFY_LEVELS:
+        if SIMPLIFY_TOLERANCES[level] <= pixel:
+            return level
+    return None
+
+
+def simplified_geometries(geometry):
+    """
+    returns a dictionary containing the simplified versions of geometry
+    for each level of simplification (None for points)
+    """
+    if geometry is None or geometry.geom_type in ('Point', 'MultiPoint'):
+        return dict((level, None) for level in SIMPLIFY_LEVELS)
+    return dict((level, geometry.simplify(SIMPLIFY_TOLERANCES[level], preserve_topology=True))
+                for level in SIMPLIFY_LEVELS)
+
+
+def update_simplified_geometries(queryset, field='geometry'):
+    """
+    updates the simplified versions of the specified geometry field
+    of the records contained in queryset with one query
+    returns the number of updated records
+    """
+    subquery, params = queryset.order_by().values_list('id', flat=True).query.sql_with_params()
+    columns = ['%s_%s = %s' % (field, level, SIMPLIFIED_GEOMETRY_SQL % {
+        'field': field,
+        'tolerance': SIMPLIFY_TOLERANCES[level]
+    }) for level in SIMPLIFY_LEVELS]
+    sql = 'UPDATE %s SET %s WHERE id IN (%s)' % (queryset.model._meta.db_table, ', '.join(columns), subquery)
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.rowcount
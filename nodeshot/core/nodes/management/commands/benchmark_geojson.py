@@ -0,0 +1,74 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from django.test.client import RequestFactory
+from django.core.urlresolvers import reverse
+
+from rest_framework.renderers import JSONRenderer
+
+from nodeshot.core.layers.models import Layer
+
+from ...models import Node
+from ...serializers import NodeGeoSerializer, NodeGeoFastSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare the speed of NodeGeoSerializer and NodeGeoFastSerializer\n\
+            temporary nodes are created in a transaction which is rolled back at the end'
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--nodes',
+            action='store',
+            dest='nodes',
+            type='int',
+            default=50000,
+            help='Number of temporary nodes to create (defaults to 50000)'
+        ),
+    )
+
+    def output(self, message):
+        self.stdout.write('%s\n\r' % message)
+
+    def create_nodes(self, count):
+        """ creates count nodes on the first layer of the database """
+        layer = Layer.objects.first()
+        if layer is None:
+            raise CommandError('at least one layer is needed to run the benchmark')
+        nodes = []
+        for i in range(count):
+            nodes.append(Node(name='benchmark node %d' % i,
+                              slug='benchmark-node-%d' % i,
+                              layer=layer,
+                              geometry=Point(12.0 + (i % 1000) * 0.001, 41.0 + (i / 1000) * 0.001),
+                              description='benchmark node number %d' % i))
+        Node.objects.bulk_create(nodes, batch_size=1000)
+
+    def measure(self, label, serializer):
+        """ renders serializer.data and prints the elapsed time """
+        start = time.time()
+        output = JSONRenderer().render(serializer.data)
+        self.output('%s: %.2f seconds' % (label, time.time() - start))
+        return output
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get(reverse('api_node_gejson_list'))
+        context = {'request': request}
+        try:
+            with transaction.atomic():
+                self.create_nodes(options['nodes'])
+                queryset = Node.objects.published().select_related('layer', 'status', 'user').order_by('pk')
+                self.output('serializing %d nodes...' % queryset.count())
+                standard = self.measure('NodeGeoSerializer', NodeGeoSerializer(queryset, many=True, context=context))
+                fast = self.measure('NodeGeoFastSerializer', NodeGeoFastSerializer(queryset, context=context))
+                self.output('output is identical: %s' % (standard == fast))
+                raise Rollback()
+        except Rollback:
+            pass
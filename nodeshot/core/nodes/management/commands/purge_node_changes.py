@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction, connection
+from django.db.models import Max
+
+from nodeshot.core.base.utils import ago
+
+from ...models import NodeChange, NodeChangePurge
+from ...models.change import SEQUENCE_LOCK
+from ...settings import CHANGES_RETENTION_DAYS
+
+
+class Command(BaseCommand):
+    help = "Delete the changes of nodes older than NODESHOT_NODES_CHANGES_RETENTION_DAYS"
+
+    def output(self, message):
+        self.stdout.write('%s\n\r' % message)
+
+    def handle(self, *args, **options):
+        """ Purge the change log """
+        # changes which have not been numbered yet are numbered before being purged
+        NodeChange.sequence()
+        old_changes = NodeChange.objects.filter(added__lte=ago(days=CHANGES_RETENTION_DAYS),
+                                                seq__isnull=False)
+        watermark = old_changes.aggregate(seq=Max('seq'))['seq']
+
+        if watermark is None:
+            self.output('there are no old node changes to purge')
+            return
+
+        with transaction.atomic():
+            # numbering of new changes waits for the purge
+            connection.cursor().execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK])
+            changes = NodeChange.objects.filter(seq__lte=watermark)
+            count = changes.count()
+            changes.delete()
+            # consumers which are behind the watermark are detected by the change feed
+            NodeChangePurge.objects.create(seq=watermark)
+        self.output('%d node changes deleted successfully.' % count)
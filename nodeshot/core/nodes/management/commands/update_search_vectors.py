@@ -0,0 +1,32 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from ...models import Node
+from ...search import update_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Update the full text search vector of all the nodes (eg: after changing NODESHOT_NODES_SEARCH_CONFIG)'
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--chunk-size',
+            action='store',
+            dest='chunk_size',
+            type='int',
+            default=1000,
+            help='Number of nodes updated with each query (defaults to 1000)'
+        ),
+    )
+
+    def output(self, message):
+        self.stdout.write('%s\n\r' % message)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        ids = list(Node.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for i in range(0, len(ids), chunk_size):
+            updated += update_search_vector(Node.objects.filter(pk__in=ids[i:i + chunk_size]))
+        self.output('updated search vector of %d nodes' % updated)
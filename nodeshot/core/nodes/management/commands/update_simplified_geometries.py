@@ -0,0 +1,37 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from ...models import Node
+from ...geometry import update_simplified_geometries
+
+
+class Command(BaseCommand):
+    help = 'Update the simplified geometries of nodes and layers (eg: after changing NODESHOT_NODES_SIMPLIFY_TOLERANCES)'
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--chunk-size',
+            action='store',
+            dest='chunk_size',
+            type='int',
+            default=1000,
+            help='Number of nodes updated with each query (defaults to 1000)'
+        ),
+    )
+
+    def output(self, message):
+        self.stdout.write('%s\n\r' % message)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        ids = list(Node.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for i in range(0, len(ids), chunk_size):
+            updated += update_simplified_geometries(Node.objects.filter(pk__in=ids[i:i + chunk_size]))
+        self.output('updated simplified geometries of %d nodes' % updated)
+        # areas of layers
+        if hasattr(Node, 'layer'):
+            Layer = Node._meta.get_field('layer').rel.to
+            updated = update_simplified_geometries(Layer.objects.all(), field='area')
+            self.output('updated simplified areas of %d layers' % updated)
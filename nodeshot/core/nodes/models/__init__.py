@@ -1,12 +1,15 @@
 from .node import Node
 from .image import Image
 from .status import Status
+from .change import NodeChange, NodeChangePurge
 
 
 __all__ = [
     'Node',
     'Image',
-    'Status'
+    'Status',
+    'NodeChange',
+    'NodeChangePurge'
 ]
 
 
@@ -14,20 +17,98 @@ __all__ = [
 
 
 from django.dispatch import receiver
-from django.db.models.signals import pre_delete, post_save
-from django.core.cache import cache
-from ..signals import node_status_changed
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from nodeshot.core.base.cache import invalidate_tags
+from ..signals import node_status_changed, nodes_bulk_created, nodes_bulk_updated
+from ..geometry import simplified_geometries
+
+
+@receiver(pre_save, sender=Node)
+def set_representative_point(sender, instance, **kwargs):
+    """
+    keeps the representative point in sync with the geometry
+    (pre_save is used because it's sent also when loading fixtures)
+    """
+    if instance.geometry and (instance.representative_point is None or instance.geometry_has_changed):
+        instance.representative_point = instance.compute_point()
+
+
+@receiver(pre_save, sender=Node)
+def set_simplified_geometries(sender, instance, **kwargs):
+    """ keeps the simplified versions of the geometry in sync """
+    if instance.geometry and (instance.geometry_has_changed or
+                              (instance.geometry_low is None and instance.geometry.geom_type not in ('Point', 'MultiPoint'))):
+        for level, geometry in simplified_geometries(instance.geometry).items():
+            setattr(instance, 'geometry_%s' % level, geometry)
+
+
+def _old_layer_tags(instances):
+    """ returns the tags of the layers which the specified nodes are leaving """
+    return ['layer:%s' % instance._current_layer_id for instance in instances
+            if instance._current_layer_id and instance._current_layer_id != getattr(instance, 'layer_id', None)]
 
 
-@receiver(post_save, sender=Status)
-@receiver(pre_delete, sender=Status)
 @receiver(post_save, sender=Node)
 @receiver(pre_delete, sender=Node)
 @receiver(node_status_changed, sender=Node)
-def clear_cache(sender, **kwargs):
-    # clear only cached pages if supported
-    if hasattr(cache, 'delete_pattern'):
-        cache.delete_pattern('views.decorators.cache.cache*')
-    # otherwise clear the entire cache
-    else:
-        cache.clear()
+def clear_node_cache(sender, instance, **kwargs):
+    """
+    invalidates cached responses which might contain the node:
+    global node collection and collection of its layer (and of its previous layer);
+    layers are tagged by id to avoid retrieving the layer at each save
+    """
+    tags = ['nodes']
+    if getattr(instance, 'layer_id', None):
+        tags.append('layer:%s' % instance.layer_id)
+    tags += _old_layer_tags([instance])
+    invalidate_tags(*tags)
+
+
+@receiver(nodes_bulk_created, sender=Node)
+@receiver(nodes_bulk_updated, sender=Node)
+def clear_nodes_cache(sender, instances, **kwargs):
+    """ invalidates cached responses which might contain nodes created or updated in bulk """
+    tags = set(['nodes'])
+    for instance in instances:
+        if getattr(instance, 'layer_id', None):
+            tags.add('layer:%s' % instance.layer_id)
+    tags.update(_old_layer_tags(instances))
+    invalidate_tags(*tags)
+
+
+@receiver(post_save, sender=Node)
+def log_node_saved(sender, instance, created, **kwargs):
+    """ writes the change log used by the change feed """
+    if created:
+        NodeChange.log('created', [instance])
+        return
+    # nodes moved to another layer disappear from the feed of the old layer
+    old_layer_id = instance._current_layer_id
+    if old_layer_id and old_layer_id != getattr(instance, 'layer_id', None):
+        NodeChange.log('deleted', [instance], layer_id=old_layer_id)
+    NodeChange.log('updated', [instance])
+
+
+@receiver(post_delete, sender=Node)
+def log_node_deleted(sender, instance, **kwargs):
+    """ leaves a tombstone in the change log """
+    NodeChange.log('deleted', [instance])
+
+
+@receiver(nodes_bulk_created, sender=Node)
+def log_nodes_bulk_created(sender, instances, **kwargs):
+    NodeChange.log('created', instances)
+
+
+@receiver(nodes_bulk_updated, sender=Node)
+def log_nodes_bulk_updated(sender, instances, **kwargs):
+    NodeChange.log('updated', instances)
+
+
+@receiver(post_save, sender=Status)
+@receiver(pre_delete, sender=Status)
+@receiver(post_delete, sender=Status)
+def clear_status_cache(sender, **kwargs):
+    """ invalidates cached responses which contain statuses and the status registry """
+    invalidate_tags('statuses')
+    Status.clear_registry()
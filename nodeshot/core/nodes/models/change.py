@@ -0,0 +1,135 @@
+from django.db import models, connection, transaction
+from django.utils.timezone import now
+from django.utils.translation import ugettext_lazy as _
+
+from nodeshot.core.base.managers import AccessLevelPublishedManager
+
+
+# key of the advisory lock which serializes the numbering of the changes
+SEQUENCE_LOCK = 0x6e6f6465
+
+
+class NodeChange(models.Model):
+    """
+    Log of the changes of nodes used by the change feed (/api/v1/nodes/changes/).
+    Deleted nodes leave a tombstone (node_id is not a foreign key on purpose).
+
+    The sequence number (seq) is not the primary key: changes are numbered only once
+    they have been committed (see NodeChange.sequence), so a transaction which commits
+    late can't add changes behind the sequence numbers already returned by the feed.
+
+    access_level and is_published store the state of the node at the time of the change,
+    the feed uses them to send tombstones only to the clients which could see the node.
+    """
+    ACTIONS = (
+        ('created', _('created')),
+        ('updated', _('updated')),
+        ('deleted', _('deleted')),
+    )
+    seq = models.BigIntegerField(_('sequence number'), blank=True, null=True, unique=True, editable=False)
+    node_id = models.IntegerField(_('node id'), db_index=True)
+    slug = models.SlugField(max_length=75)
+    layer_id = models.IntegerField(_('layer id'), blank=True, null=True, db_index=True)
+    action = models.CharField(_('action'), max_length=7, choices=ACTIONS)
+    access_level = models.SmallIntegerField(_('access level'), default=0)
+    is_published = models.BooleanField(_('published'), default=True)
+    added = models.DateTimeField(_('added on'), default=now, db_index=True)
+
+    objects = AccessLevelPublishedManager()
+
+    class Meta:
+        db_table = 'nodes_nodechange'
+        app_label = 'nodes'
+        ordering = ['id']
+        verbose_name = _('node change')
+        verbose_name_plural = _('node changes')
+
+    def __unicode__(self):
+        return '%s %s (%s)' % (self.action, self.slug, self.seq)
+
+    @classmethod
+    def log(cls, action, nodes, layer_id=None):
+        """
+        logs the specified action for each one of the nodes with one query,
+        layer_id overrides the layer of the nodes (used for the tombstones of nodes changing layer)
+        """
+        cls.objects.bulk_create([cls(node_id=node.pk,
+                                     slug=node.slug,
+                                     layer_id=layer_id or getattr(node, 'layer_id', None),
+                                     action=action,
+                                     access_level=node.access_level,
+                                     is_published=node.is_published)
+                                 for node in nodes])
+
+    @classmethod
+    def log_queryset(cls, action, queryset):
+        """
+        logs the specified action for each one of the nodes contained in queryset
+        with one INSERT ... SELECT (used when nodes are updated without sending signals)
+        returns the number of logged changes
+        """
+        subquery, params = queryset.order_by().values_list('id', flat=True).query.sql_with_params()
+        layer_column = 'layer_id' if hasattr(queryset.model, 'layer') else 'NULL'
+        sql = """
+        INSERT INTO %(table)s (node_id, slug, layer_id, action, access_level, is_published, added)
+        SELECT id, slug, %(layer_column)s, %%s, access_level, is_published, %%s FROM %(node_table)s
+        WHERE id IN (%(subquery)s) ORDER BY id
+        """ % {
+            'table': cls._meta.db_table,
+            'node_table': queryset.model._meta.db_table,
+            'layer_column': layer_column,
+            # placeholders of the subquery are left untouched and filled by cursor.execute
+            'subquery': subquery
+        }
+        cursor = connection.cursor()
+        cursor.execute(sql, [action, now()] + list(params))
+        return cursor.rowcount
+
+    @classmethod
+    def sequence(cls):
+        """
+        assigns the next sequence numbers to the committed changes which don't have one yet,
+        in the order in which they have been logged; numbering is serialized by an advisory lock
+        so sequence numbers become visible in ascending order and are never reused after a purge
+        """
+        sql = """
+        UPDATE %(table)s SET seq = numbered.seq
+        FROM (SELECT id, row_number() OVER (ORDER BY id) + GREATEST(
+                  (SELECT COALESCE(MAX(seq), 0) FROM %(table)s),
+                  (SELECT COALESCE(MAX(seq), 0) FROM %(purge_table)s)
+              ) AS seq
+              FROM %(table)s WHERE seq IS NULL) AS numbered
+        WHERE %(table)s.id = numbered.id
+        """ % {
+            'table': cls._meta.db_table,
+            'purge_table': NodeChangePurge._meta.db_table
+        }
+        with transaction.atomic():
+            cursor = connection.cursor()
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK])
+            cursor.execute(sql)
+            return cursor.rowcount
+
+
+class NodeChangePurge(models.Model):
+    """
+    Purges of the change log (see the purge_node_changes command),
+    seq is the highest sequence number deleted by the purge
+    """
+    seq = models.BigIntegerField(_('sequence number'))
+    added = models.DateTimeField(_('added on'), default=now)
+
+    class Meta:
+        db_table = 'nodes_nodechangepurge'
+        app_label = 'nodes'
+        ordering = ['seq']
+        verbose_name = _('node change purge')
+        verbose_name_plural = _('node change purges')
+
+    def __unicode__(self):
+        return '%s' % self.seq
+
+    @classmethod
+    def watermark(cls):
+        """ returns the highest sequence number which has been purged (0 if none) """
+        return cls.objects.aggregate(seq=models.Max('seq'))['seq'] or 0
@@ -1,16 +1,18 @@
 from django.contrib.gis.db import models
 from django.contrib.gis.geos.collections import GeometryCollection
-from django.contrib.gis.geos import GEOSException
+from django.contrib.gis.geos import GEOSGeometry, GEOSException
 from django.utils.translation import ugettext_lazy as _
 from django.template.defaultfilters import slugify
 
 from nodeshot.core.base.models import BaseAccessLevel
+from nodeshot.core.base.fields import TSVectorField
 from nodeshot.core.base.managers import HStoreGeoAccessLevelPublishedManager as NodeManager
 
 from django_hstore.fields import DictionaryField
 
 from ..settings import settings, PUBLISHED_DEFAULT, HSTORE_SCHEMA
 from ..signals import node_status_changed
+from ..search import SearchVector
 from .status import Status
 
 
@@ -38,6 +40,14 @@ class Node(BaseAccessLevel):
         _('geometry'),
         help_text=_('geometry of the node (point, polygon, line)')
     )
+    # point of the geometry which is always inside it (same as geometry for points),
+    # kept in sync on save, see the point property
+    representative_point = models.PointField(_('representative point'), blank=True, null=True, editable=False)
+    # simplified versions of the geometry used at low zoom levels, kept in sync on save
+    # (empty for points, see nodeshot.core.nodes.geometry)
+    geometry_low = models.GeometryField(blank=True, null=True, editable=False, spatial_index=False)
+    geometry_medium = models.GeometryField(blank=True, null=True, editable=False, spatial_index=False)
+    geometry_high = models.GeometryField(blank=True, null=True, editable=False, spatial_index=False)
     elev = models.FloatField(_('elevation'), blank=True, null=True)
     address = models.CharField(_('address'), max_length=150, blank=True, null=True)
 
@@ -49,6 +59,9 @@ class Node(BaseAccessLevel):
     data = DictionaryField(_('extra data'), null=True, blank=True,
                            editable=False, schema=HSTORE_SCHEMA)
 
+    # full text search, computed by the database on save (see nodeshot.core.nodes.search)
+    search_vector = TSVectorField()
+
     # manager
     objects = NodeManager()
 
@@ -56,9 +69,16 @@ class Node(BaseAccessLevel):
     # explained here:
     # http://stackoverflow.com/questions/1355150/django-when-saving-how-can-you-check-if-a-field-has-changed
     _current_status = None
+    # same for geometry (a hash, see _geometry_fingerprint) and layer
+    # (used to skip validation and derived fields of unchanged coordinates)
+    _current_geometry = None
+    _current_layer_id = None
+    # and for is_published (used to update the statistics of layers)
+    _current_is_published = None
 
     # needed for extensible validation
     _additional_validation = []
+    _additional_bulk_validation = []
 
     class Meta:
         db_table = 'nodes_node'
@@ -68,11 +88,36 @@ class Node(BaseAccessLevel):
         return '%s' % self.name
 
     def __init__(self, *args, **kwargs):
-        """ Fill __current_status """
+        """ Fill __current_status, _current_geometry, _current_layer_id and _current_is_published """
         super(Node, self).__init__(*args, **kwargs)
         # set current status, but only if it is an existing node
         if self.pk:
             self._current_status = self.status_id
+            self._set_current_geometry()
+
+    def _set_current_geometry(self):
+        self._current_geometry = self._geometry_fingerprint()
+        self._current_layer_id = getattr(self, 'layer_id', None)
+        self._current_is_published = self.__dict__.get('is_published')
+
+    def _geometry_fingerprint(self):
+        """
+        returns a hash of the geometry (None if not set); the raw value loaded from the
+        database is not converted to a GEOS object, since it's the same hex EWKB of GEOSGeometry.hexewkb
+        """
+        geometry = self.__dict__.get('geometry')
+        if isinstance(geometry, GEOSGeometry):
+            geometry = geometry.hexewkb
+        return hash(geometry) if geometry else None
+
+    @property
+    def geometry_has_changed(self):
+        """ True if the node is new or if its geometry or layer changed since it was loaded """
+        if not self.pk or self._current_geometry is None:
+            return True
+        if getattr(self, 'layer_id', None) != self._current_layer_id:
+            return True
+        return self._geometry_fingerprint() != self._current_geometry
 
     def _autofill_slug(self):
         slugified_name = slugify(self.name)
@@ -91,29 +136,31 @@ class Node(BaseAccessLevel):
             * converts geometry collections of just 1 item to that item (eg: a collection of 1 Point becomes a Point)
             * intercepts changes to status and fires node_status_changed signal
             * set default status
+            * makes the database compute the full text search vector in the same query
         """
         # geometry collection check
         if isinstance(self.geometry, GeometryCollection) and 0 < len(self.geometry) < 2:
             self.geometry = self.geometry[0]
         # if no status specified
-        if not self.status and not self.status_id:
-            try:
-                self.status = Status.objects.filter(is_default=True)[0]
-            except IndexError:
-                pass
+        if not self.status_id:
+            default = Status.get_default()
+            # statuses of the registry are shared, only the id is assigned
+            self.status_id = default.pk if default else None
+            self.__dict__.pop(Node.status.cache_name, None)
+        self.search_vector = SearchVector(self)
         super(Node, self).save(*args, **kwargs)
         # if status of a node changes
-        if (self.status and self._current_status and self.status.id != self._current_status) or\
-           (self.status_id and self._current_status and self.status_id != self._current_status):
+        if self.status_id and self._current_status and self.status_id != self._current_status:
             # send django signal
             node_status_changed.send(
                 sender=self.__class__,
                 instance=self,
-                old_status=Status.objects.get(pk=self._current_status),
+                old_status=Status.get_cached(pk=self._current_status),
                 new_status=self.status
             )
-        # update _current_status
+        # update _current_status, _current_geometry and _current_layer_id
         self._current_status = self.status_id
+        self._set_current_geometry()
 
     def extensible_validation(self):
         """
@@ -141,25 +188,62 @@ class Node(BaseAccessLevel):
         # add method to this class
         setattr(class_, method_name, method)
 
+    @classmethod
+    def bulk_validation(class_, nodes, exclude=None):
+        """
+        Validate a list of new nodes all at once with set based queries.
+        Bulk validation methods are introduced through the class method Node.add_bulk_validation_method()
+
+        :param exclude: optional list of names of bulk validation methods to skip
+        :returns: dictionary which maps the index of each invalid node to a list of error messages
+        """
+        errors = {}
+        exclude = exclude or []
+        for validation_method in class_._additional_bulk_validation:
+            if validation_method.func_name in exclude:
+                continue
+            for index, message in validation_method(nodes).items():
+                errors.setdefault(index, []).append(message)
+        return errors
+
+    @classmethod
+    def add_bulk_validation_method(class_, method):
+        """
+        Extend validation of lists of nodes by adding a function to the _additional_bulk_validation list.
+        The function receives a list of nodes and must return a dictionary
+        which maps the index of each invalid node to an error message.
+
+        :method function: function to be added to _additional_bulk_validation
+        """
+        class_._additional_bulk_validation.append(method)
+
     @property
     def owner(self):
         return self.user
 
     @property
     def point(self):
-        """ returns location of node. If node geometry is not a point a center  point will be returned """
+        """
+        returns location of node. If node geometry is not a point a center point will be returned
+        (the representative_point stored on save, unless the geometry has been changed since)
+        """
+        if self.representative_point is not None and not self.geometry_has_changed:
+            return self.representative_point
         if not self.geometry:
             raise ValueError('geometry attribute must be set before trying to get point property')
+        return self.compute_point()
+
+    def compute_point(self):
+        """ computes the point returned by the point property with GEOS """
         if self.geometry.geom_type == 'Point':
             return self.geometry
-        else:
-            try:
-                # point_on_surface guarantees that the point is within the geometry
-                return self.geometry.point_on_surface
-            except GEOSException:
-                # fall back on centroid which may not be within the geometry
-                # for example, a horseshoe shaped polygon
-                return self.geometry.centroid
+        try:
+            # point_on_surface guarantees that the point is within the geometry
+            return self.geometry.point_on_surface
+        except GEOSException:
+            # fall back on centroid which may not be within the geometry
+            # for example, a horseshoe shaped polygon
+            return self.geometry.centroid
 
     if 'grappelli' in settings.INSTALLED_APPS:
         @staticmethod
@@ -1,10 +1,21 @@
-from django.db import models
+import uuid
+from threading import local
+
+from django.db import models, transaction
+from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 
 from nodeshot.core.base.models import BaseOrdered
 from nodeshot.core.base.fields import RGBColorField
 
 
+REGISTRY_VERSION_KEY = 'status-registry-version'
+# statuses loaded by the current process, see Status.get_registry()
+_registry = {}
+# set when statuses change inside a transaction of the current thread, see Status.clear_registry()
+_pending = local()
+
+
 class Status(BaseOrdered):
     """
     Status of a node, eg: active, potential, approved
@@ -73,3 +84,93 @@ class Status(BaseOrdered):
 
         # update __current_status
         self._current_is_default = self.is_default
+
+    # ------ Registry ------ #
+
+    @classmethod
+    def get_registry(cls):
+        """
+        Returns a dictionary containing all the statuses, loaded with one query
+        and kept in memory until a status is saved or deleted:
+            * ``id``: statuses indexed by primary key
+            * ``slug``: statuses indexed by lowercase slug
+            * ``default``: the default status or None
+
+        Other processes are notified of changes through a version key stored in the cache.
+        The returned statuses are shared, do not modify them.
+        """
+        global _registry
+        # statuses have been changed by a transaction which has ended since
+        if getattr(_pending, 'changed', False) and transaction.get_autocommit():
+            cls.registry_changed()
+        version = cache.get(REGISTRY_VERSION_KEY)
+        # the key has been evicted: start a new version, so every process reloads its registry
+        if version is None:
+            cache.add(REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(REGISTRY_VERSION_KEY)
+        if not _registry or _registry['version'] != version:
+            statuses = list(cls.objects.all())
+            default = None
+            for status in statuses:
+                if status.is_default:
+                    default = status
+            # replaced at once to be safe with threads
+            _registry = {
+                'version': version,
+                'id': dict((status.pk, status) for status in statuses),
+                'slug': dict((status.slug.lower(), status) for status in statuses),
+                'default': default
+            }
+        return _registry
+
+    @classmethod
+    def get_cached(cls, pk=None, slug=None):
+        """
+        Returns the status with the specified pk or slug (case insensitive)
+        from the status registry, or None if it does not exist
+        """
+        registry = cls.get_registry()
+        if pk is not None:
+            return registry['id'].get(pk)
+        if slug:
+            return registry['slug'].get(slug.lower())
+        return None
+
+    @classmethod
+    def get_default(cls):
+        """ returns the default status from the status registry (None if there is none) """
+        return cls.get_registry()['default']
+
+    @classmethod
+    def clear_registry(cls):
+        """
+        empties the status registry of the current process immediately and,
+        if no transaction is in progress, the one of every process;
+        inside a transaction other processes might reload the old statuses under a new version,
+        the caller must call registry_changed() once the transaction has ended
+        (otherwise it's called by the next get_registry() outside of transactions)
+        """
+        global _registry
+        _registry = {}
+        if transaction.get_autocommit():
+            cls._change_registry_version()
+        else:
+            _pending.changed = True
+
+    @classmethod
+    def registry_changed(cls):
+        """
+        called once a transaction which saved or deleted statuses has been committed or rolled back:
+        empties the registry of the current process, which might contain rolled back statuses,
+        and the one of every other process
+        """
+        if getattr(_pending, 'changed', False):
+            _pending.changed = False
+            cls._change_registry_version()
+
+    @classmethod
+    def _change_registry_version(cls):
+        global _registry
+        _registry = {}
+        # the version never expires
+        cache.set(REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
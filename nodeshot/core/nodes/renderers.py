@@ -0,0 +1,17 @@
+from rest_framework import renderers
+
+
+class MVTRenderer(renderers.BaseRenderer):
+    """
+    Renders Mapbox Vector Tiles which have been already encoded by the database
+    """
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'mvt'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # errors (eg: 404) are returned as empty tiles
+        if not isinstance(data, str):
+            return ''
+        return data
@@ -0,0 +1,106 @@
+"""
+full text search of nodes (PostgreSQL)
+"""
+import re
+
+from django.db import connection
+from psycopg2.extensions import ISQLQuote, adapt
+
+from .settings import SEARCH_CONFIG
+
+
+__all__ = [
+    'SearchVector',
+    'update_search_vector',
+    'search_nodes',
+]
+
+
+# name and slug weigh more than address and description
+SEARCH_VECTOR_EXPRESSION = """
+    setweight(to_tsvector('%(config)s', coalesce(%(name)s, '')), 'A') ||
+    setweight(to_tsvector('%(config)s', replace(coalesce(%(slug)s, ''), '-', ' ')), 'A') ||
+    setweight(to_tsvector('%(config)s', coalesce(%(address)s, '')), 'B') ||
+    setweight(to_tsvector('%(config)s', coalesce(%(description)s, '')), 'C')
+"""
+SEARCH_VECTOR_SQL = "UPDATE nodes_node SET search_vector = %(expression)s WHERE id IN (%(subquery)s)"
+
+SEARCH_RANK_SQL = "ts_rank(nodes_node.search_vector, to_tsquery('%s', %%s))" % SEARCH_CONFIG
+# substrings of name, address and description (ILIKE, uses the trigram indexes)
+LIKE_WHERE_SQL = "(nodes_node.name ILIKE %s OR nodes_node.address ILIKE %s OR nodes_node.description ILIKE %s)"
+SEARCH_WHERE_SQL = "(nodes_node.search_vector @@ to_tsquery('%s', %%s) OR %s)" % (SEARCH_CONFIG, LIKE_WHERE_SQL)
+
+
+class SearchVector(object):
+    """
+    search vector of a node which is computed by the database in the same
+    INSERT or UPDATE which saves the node (assigned to Node.search_vector by Node.save):
+    psycopg2 adapts it to the SQL expression which converts the texts of the node
+    """
+    def __init__(self, node):
+        self.texts = {
+            'name': node.name,
+            'slug': node.slug,
+            'address': node.address,
+            'description': node.description
+        }
+        self.connection = None
+
+    def __conform__(self, protocol):
+        if protocol is ISQLQuote:
+            return self
+
+    def prepare(self, connection):
+        # needed to quote texts with the encoding of the connection
+        self.connection = connection
+
+    def getquoted(self):
+        values = {'config': SEARCH_CONFIG}
+        for key, text in self.texts.items():
+            quoted = adapt(text)
+            if self.connection is not None and hasattr(quoted, 'prepare'):
+                quoted.prepare(self.connection)
+            values[key] = quoted.getquoted()
+        return SEARCH_VECTOR_EXPRESSION % values
+
+
+def update_search_vector(queryset):
+    """
+    updates the search vector of the nodes contained in queryset with one query
+    returns the number of updated nodes
+    """
+    subquery, params = queryset.order_by().values_list('id', flat=True).query.sql_with_params()
+    sql = SEARCH_VECTOR_SQL % {
+        'expression': SEARCH_VECTOR_EXPRESSION % {
+            'config': SEARCH_CONFIG,
+            'name': 'name',
+            'slug': 'slug',
+            'address': 'address',
+            'description': 'description'
+        },
+        # placeholders of the subquery are left untouched and filled by cursor.execute
+        'subquery': subquery
+    }
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.rowcount
+
+
+def search_nodes(queryset, text):
+    """
+    filters the nodes which match the search text and sorts them by relevance:
+        * words are searched as prefixes in name, slug, address and description (full text search)
+        * text is searched in the name, address and description of the nodes (ILIKE, uses the trigram indexes)
+    """
+    # escape wildcards of LIKE
+    like = '%%%s%%' % text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    words = re.findall(r'\w+', text, re.UNICODE)
+    if not words:
+        return queryset.extra(where=[LIKE_WHERE_SQL], params=[like] * 3)
+    # eg: "fuso lab" becomes "fuso:* & lab:*"
+    tsquery = ' & '.join('%s:*' % word for word in words)
+    return queryset.extra(select={'search_rank': SEARCH_RANK_SQL},
+                          select_params=[tsquery],
+                          where=[SEARCH_WHERE_SQL],
+                          params=[tsquery] + [like] * 3,
+                          order_by=['-search_rank'])
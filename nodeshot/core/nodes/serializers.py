@@ -1,11 +1,15 @@
+import simplejson as json
 from copy import copy
 
+from django.utils.datastructures import SortedDict
+
 from rest_framework import serializers, pagination
 from rest_framework.reverse import reverse
 from rest_framework.exceptions import NotAuthenticated, PermissionDenied
 from rest_framework_gis import serializers as geoserializers
 
 from nodeshot.core.base.serializers import GeoJSONPaginationSerializer
+from nodeshot.core.base.utils import queryset_iterator
 from .settings import settings, ADDITIONAL_NODE_FIELDS
 from .base import ExtensibleNodeSerializer
 from .models import Node, Status, Image
@@ -16,6 +20,7 @@ __all__ = [
     'NodeCreatorSerializer',
     'NodeDetailSerializer',
     'NodeGeoSerializer',
+    'NodeGeoFastSerializer',
     'PaginatedNodeListSerializer',
     'PaginatedGeojsonNodeListSerializer',
     'ImageListSerializer',
@@ -26,9 +31,23 @@ __all__ = [
 ]
 
 
+class StatusField(serializers.PrimaryKeyRelatedField):
+    """ looks up statuses in the status registry instead of querying the database """
+    def from_native(self, data):
+        try:
+            status = Status.get_cached(pk=int(data))
+        except (TypeError, ValueError):
+            status = None
+        # fall back on the default behaviour, which returns the right validation errors
+        if status is None:
+            return super(StatusField, self).from_native(data)
+        return status
+
+
 class NodeDetailSerializer(ExtensibleNodeSerializer):
     """ node detail """
     layer = serializers.SlugRelatedField(slug_field='slug')
+    status = StatusField(queryset=Status.objects.all(), required=False)
     can_edit = serializers.SerializerMethodField('get_can_edit')
 
     def get_can_edit(self, obj):
@@ -93,6 +112,99 @@ class NodeGeoSerializer(geoserializers.GeoFeatureModelSerializer, NodeListSerial
     pass
 
 
+class NodeGeoFastSerializer(object):
+    """
+    Produces the same output of NodeGeoSerializer (many=True) without instantiating
+    model objects and without going through the field machinery of the serializer:
+        * only the needed columns are retrieved with values()
+        * geometries are converted to GeoJSON by the database (ST_AsGeoJSON)
+        * the url of the details of the nodes is reversed only once
+
+    If simplify is one of the levels of nodeshot.core.nodes.geometry.SIMPLIFY_LEVELS
+    the precomputed simplified geometries are returned instead of the original ones.
+    """
+    # properties in the same order of NodeListSerializer.Meta.fields
+    # (slug and geometry are excluded because they're used as id and geometry of features)
+    lookups = SortedDict((
+        ('name', 'name'),
+        ('layer', 'layer__slug'),
+        ('layer_name', 'layer__name'),
+        ('user', 'user__username'),
+        ('status', 'status__slug'),
+        ('elev', 'elev'),
+        ('address', 'address'),
+        ('description', 'description'),
+        ('updated', 'updated'),
+        ('added', 'added'),
+    ))
+    # 15 decimal digits, the same precision of the GeoJSON produced by GEOSGeometry
+    precision = 15
+    # placeholder used to reverse the url of the details only once
+    slug_placeholder = '___slug___'
+
+    def __init__(self, queryset, context=None, simplify=None):
+        self.queryset = queryset
+        self.context = context or {}
+        self.simplify = simplify
+        self.datetime_field = serializers.DateTimeField()
+
+    def get_details_url(self):
+        """ returns the url of the details of a node with a placeholder instead of the slug """
+        return reverse('api_node_details',
+                       kwargs={'slug': self.slug_placeholder},
+                       request=self.context.get('request'),
+                       format=self.context.get('format'))
+
+    def get_values(self):
+        """ returns a values() queryset which retrieves only the needed columns """
+        # extra columns might be used for ordering (eg: search_rank)
+        extra = list(self.queryset.query.extra)
+        columns = ['id', 'slug', 'geojson'] + self.lookups.values() + extra
+        if not self.simplify:
+            return self.queryset.geojson(precision=self.precision).values(*columns)
+        # simplified geometries are empty for points
+        sql = 'ST_AsGeoJSON(COALESCE(%(table)s.geometry_%(level)s, %(table)s.geometry), %(precision)d)' % {
+            'table': Node._meta.db_table,
+            'level': self.simplify,
+            'precision': self.precision
+        }
+        return self.queryset.extra(select={'geojson': sql}).values(*columns)
+
+    def to_native(self, row, details_url):
+        """ converts a row returned by get_values() in a GeoJSON feature """
+        properties = SortedDict()
+        for key, lookup in self.lookups.items():
+            properties[key] = row[lookup]
+        properties['updated'] = self.datetime_field.to_native(properties['updated'])
+        properties['added'] = self.datetime_field.to_native(properties['added'])
+        properties['details'] = details_url.replace(self.slug_placeholder, row['slug'])
+        feature = SortedDict()
+        feature['id'] = row['slug']
+        feature['type'] = 'Feature'
+        feature['geometry'] = json.loads(row['geojson']) if row['geojson'] else None
+        feature['properties'] = properties
+        return feature
+
+    def features(self, chunk_size=None):
+        """
+        generator that yields features one by one,
+        if chunk_size is specified rows are retrieved in chunks (see queryset_iterator)
+        """
+        details_url = self.get_details_url()
+        rows = self.get_values()
+        if chunk_size:
+            rows = queryset_iterator(rows, chunk_size)
+        for row in rows:
+            yield self.to_native(row, details_url)
+
+    @property
+    def data(self):
+        return {
+            'type': 'FeatureCollection',
+            'features': list(self.features())
+        }
+
+
 class ImageListSerializer(serializers.ModelSerializer):
     """ Serializer used to show list """
     file_url = serializers.SerializerMethodField('get_image_file')
@@ -154,7 +266,9 @@ ExtensibleNodeSerializer.add_relationship(
     'images',
     serializer=ImageRelationSerializer,
     many=True,
-    queryset=lambda obj, request: obj.image_set.accessible_to(request.user).all()
+    queryset=lambda obj, request: obj.image_set.accessible_to(request.user).all(),
+    batch=lambda ids, request: Image.objects.filter(node_id__in=ids).accessible_to(request.user),
+    batch_key='node_id'
 )
 
 
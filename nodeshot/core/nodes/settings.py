@@ -12,3 +12,30 @@ else:
 
 ELEVATION_API_KEY = getattr(settings, 'NODESHOT_GOOGLE_ELEVATION_API_KEY', None)
 ELEVATION_DEFAULT_SAMPLING = getattr(settings, 'NODESHOT_GOOGLE_ELEVATION_DEFAULT_SAMPLING', 50)
+
+TILES_CACHE_TIMEOUT = getattr(settings, 'NODESHOT_NODES_TILES_CACHE_TIMEOUT', 86400)
+TILES_EXTENT = getattr(settings, 'NODESHOT_NODES_TILES_EXTENT', 4096)
+TILES_BUFFER = getattr(settings, 'NODESHOT_NODES_TILES_BUFFER', 64)
+
+CLUSTER_MAX_ZOOM = getattr(settings, 'NODESHOT_NODES_CLUSTER_MAX_ZOOM', 12)
+CLUSTER_GRID_SIZE = getattr(settings, 'NODESHOT_NODES_CLUSTER_GRID_SIZE', 60)
+
+FAST_SERIALIZATION = getattr(settings, 'NODESHOT_NODES_FAST_SERIALIZATION', True)
+
+# text search configuration of PostgreSQL used for the full text search of nodes
+SEARCH_CONFIG = getattr(settings, 'NODESHOT_NODES_SEARCH_CONFIG', 'simple')
+
+# maximum number of features accepted by the bulk creation endpoint
+BULK_MAX_FEATURES = getattr(settings, 'NODESHOT_NODES_BULK_MAX_FEATURES', 1000)
+
+# tolerances in degrees of the precomputed simplified geometries (see nodeshot.core.nodes.geometry)
+SIMPLIFY_TOLERANCES = getattr(settings, 'NODESHOT_NODES_SIMPLIFY_TOLERANCES', {
+    'low': 0.01,
+    'medium': 0.001,
+    'high': 0.0001
+})
+
+# maximum number of changes returned by each request to the change feed
+CHANGES_MAX_RESULTS = getattr(settings, 'NODESHOT_NODES_CHANGES_MAX_RESULTS', 500)
+# days after which the changes are deleted by the purge_node_changes command
+CHANGES_RETENTION_DAYS = getattr(settings, 'NODESHOT_NODES_CHANGES_RETENTION_DAYS', 30)
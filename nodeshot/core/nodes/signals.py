@@ -1,3 +1,5 @@
 import django.dispatch
 
 node_status_changed = django.dispatch.Signal(providing_args=["instance", "old_status", "new_status"])
+nodes_bulk_created = django.dispatch.Signal(providing_args=["instances"])
+nodes_bulk_updated = django.dispatch.Signal(providing_args=["instances", "old_statuses"])
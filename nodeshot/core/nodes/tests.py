@@ -13,9 +13,10 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
-from nodeshot.core.base.tests import user_fixtures, BaseTestCase
+from nodeshot.core.base.tests import user_fixtures, BaseTestCase, streamed_json, local_memory_cache
 
-from .models import Node, Status, Image
+from .models import Node, Status, Image, NodeChange, NodeChangePurge
+from .models import status as status_module
 
 
 class NodeModelsTest(TestCase):
@@ -65,6 +66,64 @@ class NodeModelsTest(TestCase):
         self.assertEqual(default_statuses.count(), 1)
         self.assertEqual(default_statuses[0].pk, unconfirmed.pk)
 
+    def test_status_registry(self):
+        """ test status registry is loaded once and refreshed when statuses change """
+        Status.get_registry()
+        with self.assertNumQueries(0):
+            default = Status.get_default()
+            self.assertEqual(Status.get_cached(pk=default.pk), default)
+            self.assertEqual(Status.get_cached(slug=default.slug.upper()), default)
+            self.assertIsNone(Status.get_cached(slug='nonexistent'))
+            self.assertIsNone(Status.get_cached(pk=0))
+        self.assertEqual(default.pk, Status.objects.get(is_default=True).pk)
+        # new nodes get the default status from the registry
+        node = Node.objects.get(pk=1)
+        node.pk = None
+        node.name = node.slug = 'registry-test'
+        node.status = None
+        node.save()
+        self.assertEqual(node.status, default)
+        # saving a status refreshes the registry
+        testing = Status(name='testing', slug='testing', description='testing', is_default=True)
+        testing.save()
+        self.assertEqual(Status.get_default().pk, testing.pk)
+        self.assertEqual(Status.get_cached(slug='testing').pk, testing.pk)
+        # deleting a status too
+        testing.delete()
+        self.assertIsNone(Status.get_cached(slug='testing'))
+
+    @local_memory_cache(status_module)
+    def test_status_registry_version(self):
+        from django.db import transaction
+        key = status_module.REGISTRY_VERSION_KEY
+        # a missing version is created
+        Status.get_registry()
+        version = status_module.cache.get(key)
+        self.assertIsNotNone(version)
+        # the version is changed only once the transaction has ended
+        Status.objects.first().save()
+        self.assertEqual(status_module.cache.get(key), version)
+        Status.registry_changed()
+        self.assertNotEqual(status_module.cache.get(key), version)
+        # statuses which have been rolled back are removed from the registry
+        try:
+            with transaction.atomic():
+                Status(name='rolled back', slug='rolled-back', description='rolled back').save()
+                self.assertIsNotNone(Status.get_cached(slug='rolled-back'))
+                raise ValueError()
+        except ValueError:
+            pass
+        Status.registry_changed()
+        self.assertIsNone(Status.get_cached(slug='rolled-back'))
+        # nodes don't receive the shared instances of the registry
+        node = Node.objects.get(pk=1)
+        node.pk = None
+        node.name = node.slug = 'registry-instance'
+        node.status = None
+        node.save()
+        self.assertEqual(node.status_id, Status.get_default().pk)
+        self.assertIsNot(node.status, Status.get_default())
+
     def test_current_status(self):
         """ test that node._current_status is none for new nodes """
         n = Node()
@@ -177,6 +236,30 @@ class NodeModelsTest(TestCase):
         node.geometry = GEOSGeometry("""{"type": "Polygon", "coordinates": [[[12.501493164066, 41.990441051094], [12.583890625003, 41.957770034531], [12.618222900394, 41.912820024702], [12.607923217778, 41.877552973685], [12.582088180546, 41.82423212474], [12.574148841861, 41.813357913568], [12.551532455447, 41.799730560554], [12.525053688052, 41.795155470656], [12.510505386356, 41.793715689492], [12.43308610535, 41.803249638226], [12.388883300784, 41.813613798573], [12.371030517581, 41.870906276755], [12.382016845706, 41.898511105474], [12.386136718753, 41.912820024702], [12.38064355469, 41.926104006681], [12.38064355469, 41.955727539561], [12.413602539065, 41.974107637675], [12.445188232426, 41.983295698272], [12.45617456055, 41.981254021593], [12.476773925785, 41.985337309484], [12.490506835941, 41.985337309484], [12.506986328129, 41.990441051094], [12.501493164066, 41.990441051094]]]}""")
         node.point  # must not raise GEOSException
 
+    def test_node_representative_point(self):
+        node = Node.objects.first()
+        # fixtures are loaded with representative points too
+        self.assertEqual(node.representative_point, node.geometry)
+        # reading the geometry doesn't change it
+        self.assertFalse(node.geometry_has_changed)
+        polygon = GEOSGeometry('POLYGON ((12.45 41.88, 12.55 41.88, 12.55 41.92, 12.45 41.92, 12.45 41.88))')
+        node.geometry = polygon
+        self.assertTrue(node.geometry_has_changed)
+        # the point of the new geometry is computed on the fly until the node is saved
+        self.assertTrue(polygon.contains(node.point))
+        self.assertFalse(polygon.contains(node.representative_point))
+        node.save()
+        self.assertFalse(node.geometry_has_changed)
+        node = Node.objects.get(pk=node.pk)
+        self.assertTrue(polygon.contains(node.representative_point))
+        self.assertEqual(node.point, node.representative_point)
+        # spatial queries can use the stored point
+        self.assertIn(node, Node.objects.filter(representative_point__within=polygon))
+        # geometry changes update the stored point
+        node.geometry = GEOSGeometry('POINT (12.6 41.9)')
+        node.save()
+        self.assertEqual(Node.objects.get(pk=node.pk).representative_point, node.geometry)
+
     def test_image_manager(self):
         """ test manager methods of Image model """
         # admin can see all the images
@@ -208,6 +291,147 @@ class NodeModelsTest(TestCase):
         self.assertEqual(node.geometry, point)
 
 
+    @local_memory_cache()
+    def test_cache_invalidation(self):
+        from nodeshot.core.base import cache as cache_utils
+        from .models import clear_node_cache
+        node = Node.objects.get(slug='fusolab')
+        other_layer = Node.objects.exclude(layer_id=node.layer_id).first().layer_id
+        tags = ['nodes', 'layer:%s' % node.layer_id, 'layer:%s' % other_layer]
+        versions = [cache_utils.get_tags_version([tag]) for tag in tags]
+        self.assertEqual(versions, [cache_utils.get_tags_version([tag]) for tag in tags])
+        # the layer is not retrieved
+        node = Node.objects.get(slug='fusolab')
+        with self.assertNumQueries(0):
+            clear_node_cache(sender=Node, instance=node)
+        node.save()
+        new_versions = [cache_utils.get_tags_version([tag]) for tag in tags]
+        # global collection and layer of the node are invalidated
+        for old, new in zip(versions[0:2], new_versions[0:2]):
+            self.assertNotEqual(old, new)
+        # other layers are not
+        self.assertEqual(versions[2], new_versions[2])
+        # deferred invalidation
+        with cache_utils.deferred_invalidation():
+            node.save()
+            self.assertEqual(new_versions[0], cache_utils.get_tags_version(['nodes']))
+        self.assertNotEqual(new_versions[0], cache_utils.get_tags_version(['nodes']))
+        # moving the node to another layer invalidates both layers
+        versions = [cache_utils.get_tags_version([tag]) for tag in tags]
+        node.layer = Node.objects.exclude(layer_id=node.layer_id).first().layer
+        node.save()
+        new_versions = [cache_utils.get_tags_version([tag]) for tag in tags]
+        self.assertNotEqual(versions[1], new_versions[1])
+        self.assertNotEqual(versions[2], new_versions[2])
+
+
+    def test_nodeshot_batch(self):
+        from django.db.models.signals import post_save, post_delete
+        from nodeshot.core.base.settings import DISCONNECTABLE_SIGNALS
+        from nodeshot.core.base.utils import nodeshot_batch, call_after_batch
+        received = []
+        batches = []
+        calls = []
+
+        def handler(sender, **kwargs):
+            received.append(kwargs)
+
+        def connect():
+            post_save.connect(handler, sender=Node)
+            post_delete.connect(handler, sender=Node)
+
+        def disconnect():
+            post_save.disconnect(handler, sender=Node)
+            post_delete.disconnect(handler, sender=Node)
+
+        def call(ids):
+            calls.append(sorted(ids))
+
+        entry = {
+            'disconnect': disconnect,
+            'reconnect': connect,
+            'receivers': [(post_save, handler, Node), (post_delete, handler, Node)],
+            'batch': lambda events: batches.append(events)
+        }
+        connect()
+        DISCONNECTABLE_SIGNALS.append(entry)
+        try:
+            with nodeshot_batch():
+                node = Node.objects.get(slug='fusolab')
+                node.save()
+                node.save()
+                new_node = Node(name='batch', layer_id=node.layer_id, geometry=node.geometry)
+                new_node.save()
+                new_node.save()
+                call_after_batch(call, [node.pk])
+                call_after_batch(call, [node.pk, new_node.pk])
+                # nothing is processed until the end of the block
+                self.assertEqual(received, [])
+                self.assertEqual(batches, [])
+                self.assertEqual(calls, [])
+            # one batch with one event for each node
+            self.assertEqual(received, [])
+            self.assertEqual(len(batches), 1)
+            events = [kwargs for signal, kwargs in batches[0]]
+            self.assertEqual([kwargs['instance'].pk for kwargs in events], [node.pk, new_node.pk])
+            self.assertFalse(events[0]['created'])
+            self.assertTrue(events[1]['created'])
+            self.assertEqual(calls, [sorted([node.pk, new_node.pk])])
+            # receivers are reconnected
+            node.save()
+            self.assertEqual(len(received), 1)
+            # registrars without batch function receive one event for each object
+            del entry['batch']
+            with nodeshot_batch():
+                node.save()
+                node.save()
+            self.assertEqual(len(received), 2)
+            # events of objects deleted in the batch are dropped, except the ones of the deletion
+            with nodeshot_batch():
+                node.save()
+                new_node.save()
+                new_node.delete()
+            self.assertEqual(len(received), 4)
+            self.assertNotIn('created', received[-1])
+            self.assertEqual([kwargs['instance'] for kwargs in received[-2:]], [node, new_node])
+        finally:
+            DISCONNECTABLE_SIGNALS.remove(entry)
+            disconnect()
+
+
+    def test_relationships_batch_mode(self):
+        from django.test.client import RequestFactory
+        from .base import ExtensibleNodeSerializer
+        from .serializers import ImageRelationSerializer
+
+        class NodeRelationshipsSerializer(ExtensibleNodeSerializer):
+            _relationships = {}
+
+            class Meta:
+                model = Node
+                fields = ('slug', 'relationships')
+
+        NodeRelationshipsSerializer.add_relationship(
+            'images',
+            serializer=ImageRelationSerializer,
+            many=True,
+            queryset=lambda obj, request: obj.image_set.accessible_to(request.user).all(),
+            batch=lambda ids, request: Image.objects.filter(node_id__in=ids).accessible_to(request.user),
+            batch_key='node_id'
+        )
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = {'request': request, 'format': None}
+        queryset = Node.objects.all()
+        # images of all the nodes are retrieved with one query
+        with self.assertNumQueries(2):
+            batch = NodeRelationshipsSerializer(queryset, many=True, context=context).data
+        single = [NodeRelationshipsSerializer(node, context=context).data for node in queryset]
+        self.assertEqual([node['relationships']['images'] for node in batch],
+                         [node['relationships']['images'] for node in single])
+        self.assertTrue(any(node['relationships']['images'] for node in batch))
+
+
 # ------ API tests ------ #
 
 
@@ -253,12 +477,212 @@ class NodesApiTest(BaseTestCase):
         node = Node.objects.get(slug='test-distance')
         self.assertEqual(node.name, "test distance")
 
+    def test_node_bulk_create(self):
+        url = reverse('api_node_bulk_create')
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [12.51, 41.89]},
+                "properties": {"name": "bulk one", "layer": "rome", "address": "via dei test"}
+            },
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [12.52, 41.9]},
+                "properties": {"name": "bulk two", "layer": "rome"}
+            }
+        ]
+        collection = {"type": "FeatureCollection", "features": features}
+
+        # POST: 403 - unauthenticated
+        response = self.client.post(url, json.dumps(collection), content_type='application/json')
+        self.assertEqual(403, response.status_code)
+
+        self.client.login(username='registered', password='tester')
+
+        # POST: 400 - not a FeatureCollection
+        response = self.client.post(url, json.dumps(features[0]), content_type='application/json')
+        self.assertEqual(400, response.status_code)
+
+        # POST: 400 - nothing is created if any feature is invalid
+        invalid = {"type": "Feature", "geometry": None, "properties": {"name": "pomezia", "layer": "wrong"}}
+        data = {"type": "FeatureCollection", "features": features + [invalid]}
+        node_count = Node.objects.count()
+        response = self.client.post(url, json.dumps(data), content_type='application/json')
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(response.data['features'][0], {})
+        self.assertEqual(response.data['features'][1], {})
+        self.assertIn('geometry', response.data['features'][2])
+        self.assertIn('layer', response.data['features'][2])
+        self.assertIn('name', response.data['features'][2])
+        self.assertEqual(Node.objects.count(), node_count)
+
+        # POST: 400 - duplicated names in the same collection
+        data = {"type": "FeatureCollection", "features": [features[0], features[0]]}
+        response = self.client.post(url, json.dumps(data), content_type='application/json')
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(response.data['features'][0], {})
+        self.assertIn('name', response.data['features'][1])
+
+        # POST: 201
+        response = self.client.post(url, json.dumps(collection), content_type='application/json')
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(response.data['type'], 'FeatureCollection')
+        self.assertEqual(len(response.data['features']), 2)
+        self.assertEqual(Node.objects.count(), node_count + 2)
+        node = Node.objects.get(slug='bulk-one')
+        self.assertEqual(node.user.username, 'registered')
+        self.assertEqual(node.layer.slug, 'rome')
+        self.assertEqual(node.status, Status.objects.filter(is_default=True)[0])
+        self.assertEqual(node.address, 'via dei test')
+        # search vector is updated
+        response = self.client.get(reverse('api_node_list'), {'search': 'bulk'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        # PUT: 400 - nodes which don't exist or which can't be changed by the user
+        data = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "id": "bulk-one", "properties": {"description": "changed"}},
+            {"type": "Feature", "id": "idontexist", "properties": {"description": "changed"}},
+            {"type": "Feature", "id": "fusolab", "properties": {"description": "changed"}}
+        ]}
+        response = self.client.put(url, json.dumps(data), content_type='application/json')
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(response.data['features'][0], {})
+        self.assertIn('__all__', response.data['features'][1])
+        self.assertIn('__all__', response.data['features'][2])
+        self.assertNotEqual(Node.objects.get(slug='fusolab').description, 'changed')
+
+        # PUT: 200 - only the properties which are sent are changed
+        data = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "id": "bulk-one", "properties": {"description": "changed"}},
+            {
+                "type": "Feature",
+                "id": "bulk-two",
+                "geometry": {"type": "Point", "coordinates": [12.53, 41.91]},
+                "properties": {"name": "bulk three"}
+            }
+        ]}
+        response = self.client.put(url, json.dumps(data), content_type='application/json')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(len(response.data['features']), 2)
+        node = Node.objects.get(slug='bulk-one')
+        self.assertEqual(node.description, 'changed')
+        self.assertEqual(node.address, 'via dei test')
+        node = Node.objects.get(slug='bulk-three')
+        self.assertEqual(node.geometry, GEOSGeometry('POINT (12.53 41.91)'))
+        self.assertEqual(node.layer.slug, 'rome')
+
+    def test_node_bulk_update(self):
+        from .bulk import bulk_update_nodes
+        from .search import search_nodes
+        from .signals import nodes_bulk_updated
+        nodes = list(Node.objects.order_by('pk')[0:2])
+        nodes[0].description = 'bulkupdated'
+        nodes[1].geometry = GEOSGeometry('POINT (12.5 41.9)')
+        received = []
+
+        def handler(sender, instances, **kwargs):
+            received.append(instances)
+
+        nodes_bulk_updated.connect(handler, sender=Node)
+        try:
+            bulk_update_nodes(nodes)
+        finally:
+            nodes_bulk_updated.disconnect(handler, sender=Node)
+        self.assertEqual(received, [nodes])
+        self.assertEqual(Node.objects.get(pk=nodes[0].pk).description, 'bulkupdated')
+        # derived columns are updated too
+        self.assertEqual(Node.objects.get(pk=nodes[1].pk).representative_point, nodes[1].geometry)
+        self.assertEqual(search_nodes(Node.objects.all(), 'bulkupdated').count(), 1)
+        self.assertEqual(NodeChange.objects.order_by('-id')[0].node_id, nodes[1].pk)
+
+    def test_node_bulk_update_changed_fields(self):
+        from .bulk import features_to_nodes, bulk_update_nodes
+        admin = User.objects.get(username='admin')
+        node = Node.objects.order_by('pk')[0]
+        features = [{"type": "Feature", "id": node.slug, "properties": {"description": "changed"}}]
+        nodes, errors = features_to_nodes(features, user=admin, update=True)
+        self.assertEqual(errors, [{}])
+        # columns which are not in the features are not written
+        Node.objects.filter(pk=node.pk).update(address='changed meanwhile')
+        bulk_update_nodes(nodes)
+        node = Node.objects.get(pk=node.pk)
+        self.assertEqual(node.description, 'changed')
+        self.assertEqual(node.address, 'changed meanwhile')
+
+    def test_node_list_cursor_pagination(self):
+        url = reverse('api_node_list')
+        expected = list(Node.objects.published().access_level_up_to('public')
+                                    .order_by('updated', 'id').values_list('slug', flat=True))
+        # follow next links
+        response = self.client.get(url, {'cursor': '', 'limit': 3})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        slugs = [node['slug'] for node in response.data['results']]
+        pages = [slugs[:]]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            page = [node['slug'] for node in response.data['results']]
+            pages.append(page)
+            slugs += page
+        self.assertEqual(slugs, expected)
+        # go back with previous links
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            pages.pop()
+            self.assertEqual([node['slug'] for node in response.data['results']], pages[-1])
+        self.assertEqual(len(pages), 1)
+        # invalid cursor
+        response = self.client.get(url, {'cursor': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
     def test_node_list_search(self):
         url = reverse('api_node_list')
 
         # GET: 200
         response = self.client.get(url, {"search": "Fusolab"})
         self.assertEqual(response.data['count'], 1)
+        # prefix of a word
+        response = self.client.get(url, {"search": "fuso"})
+        self.assertEqual(response.data['count'], 1)
+        # part of the name
+        response = self.client.get(url, {"search": "usolab"})
+        self.assertEqual(response.data['count'], 1)
+        # search vector is updated on save
+        node = Node.objects.get(slug='fusolab')
+        node.description = 'xyzzyhackerspace'
+        node.save()
+        response = self.client.get(url, {"search": "xyzzyhacker"})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['slug'], 'fusolab')
+        self.assertIsNotNone(Node.objects.get(pk=node.pk).search_vector)
+        # part of the description and of the address
+        response = self.client.get(url, {"search": "yzzyhackersp"})
+        self.assertEqual(response.data['count'], 1)
+        node.address = 'via xyzzystreet 10'
+        node.save()
+        response = self.client.get(url, {"search": "zzystree"})
+        self.assertEqual(response.data['count'], 1)
+        # wildcards are escaped
+        response = self.client.get(url, {"search": "%"})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_node_geojson_list_search_order(self):
+        from nodeshot.core.base.utils import queryset_iterator
+        from .search import search_nodes
+        nodes = list(Node.objects.published().order_by('pk'))
+        # the first node matches only in the description, the last one in the name
+        first, last = nodes[0], nodes[-1]
+        first.description = 'zork'
+        first.save()
+        last.name = 'Zork'
+        last.save()
+        expected = [last.slug, first.slug]
+        # results sorted by relevance are not split in chunks by primary key
+        queryset = search_nodes(Node.objects.published(), 'zork')
+        self.assertEqual([node.slug for node in queryset_iterator(queryset, chunk_size=1)], expected)
+        response = self.client.get(reverse('api_node_gejson_list'), {'search': 'zork'})
+        features = streamed_json(response)['features']
+        self.assertEqual([feature['id'] for feature in features], expected)
 
     def test_node_list_filter_layers(self):
         url = reverse('api_node_list')
@@ -285,13 +709,211 @@ class NodesApiTest(BaseTestCase):
     def test_node_geojson_list_filter_layers(self):
         url = reverse('api_node_gejson_list')
         response = self.client.get(url, {"layers": "rome"})
-        self.assertEqual(len(response.data['features']), 4)
+        self.assertEqual(len(streamed_json(response)['features']), 4)
         response = self.client.get(url, {"layers": "viterbo"})
-        self.assertEqual(len(response.data['features']), 2)
+        self.assertEqual(len(streamed_json(response)['features']), 2)
         response = self.client.get(url, {"layers": "rome,viterbo"})
-        self.assertEqual(len(response.data['features']), 6)
+        self.assertEqual(len(streamed_json(response)['features']), 6)
         response = self.client.get(url, {"layers": "rome,viterbo,pisa"})
-        self.assertEqual(len(response.data['features']), 8)
+        self.assertEqual(len(streamed_json(response)['features']), 8)
+
+    def test_node_geojson_list_bbox(self):
+        url = reverse('api_node_gejson_list')
+        response = self.client.get(url, {"bbox": "12.4,41.6,12.6,42.0"})
+        self.assertEqual(len(streamed_json(response)['features']), 4)
+        response = self.client.get(url, {"bbox": "0,0,1,1"})
+        self.assertEqual(len(streamed_json(response)['features']), 0)
+        response = self.client.get(url, {"bbox": "0,0,1"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {"bbox": "a,b,c,d"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_node_geojson_fast_serializer(self):
+        from django.test.client import RequestFactory
+        from rest_framework.renderers import JSONRenderer
+        from .serializers import NodeGeoSerializer, NodeGeoFastSerializer
+        request = RequestFactory().get(reverse('api_node_gejson_list'))
+        context = {'request': request}
+        queryset = Node.objects.published().select_related('layer', 'status', 'user').order_by('pk')
+        renderer = JSONRenderer()
+        # output must be identical
+        standard = renderer.render(NodeGeoSerializer(queryset, many=True, context=context).data)
+        fast = renderer.render(NodeGeoFastSerializer(queryset, context=context).data)
+        self.assertEqual(fast, standard)
+        # streamed features are the same
+        serializer = NodeGeoFastSerializer(queryset, context=context)
+        features = list(serializer.features(chunk_size=3))
+        self.assertEqual(renderer.render(features), renderer.render(serializer.data['features']))
+        self.assertEqual(len(features), queryset.count())
+
+    @local_memory_cache()
+    def test_node_geojson_list_conditional_get(self):
+        url = reverse('api_node_gejson_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        # collection has not changed
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        # filters change the version of the collection
+        response = self.client.get(url, {'layers': 'rome'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # collection has changed
+        Node.objects.first().save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('Authorization', response['Vary'])
+        etag = response['ETag']
+        # related data changed without touching the nodes
+        layer = Node.objects.first().layer
+        layer.name = 'renamed'
+        layer.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # the version depends on the group of the user
+        self.client.login(username='admin', password='tester')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_node_geojson_list_zoom_clusters(self):
+        url = reverse('api_node_gejson_list')
+        # low zoom level: all nodes are grouped in one cluster
+        response = self.client.get(url, {"zoom": 1})
+        self.assertEqual(len(response.data['features']), 1)
+        self.assertTrue(response.data['features'][0]['properties']['cluster'])
+        self.assertEqual(response.data['features'][0]['properties']['count'], 8)
+        # high zoom level: nodes are returned as usual
+        response = self.client.get(url, {"zoom": 18})
+        features = streamed_json(response)['features']
+        self.assertEqual(len(features), 8)
+        self.assertNotIn('cluster', features[0]['properties'])
+        # layer geojson list
+        url = reverse('api_layer_nodes_geojson', args=['rome'])
+        response = self.client.get(url, {"zoom": 1})
+        self.assertEqual(len(response.data['features']), 1)
+        self.assertEqual(response.data['features'][0]['properties']['count'], 4)
+        response = self.client.get(url, {"zoom": "wrong"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_node_geojson_list_simplify(self):
+        from .geometry import simplify_level_for_zoom
+        self.assertEqual(simplify_level_for_zoom(5), 'low')
+        self.assertEqual(simplify_level_for_zoom(10), 'medium')
+        self.assertEqual(simplify_level_for_zoom(12), 'high')
+        self.assertIsNone(simplify_level_for_zoom(18))
+        # polygon with many vertices along one side
+        coords = ['%s 41.9' % (12.5 + i * 0.0001) for i in range(100)] + ['12.51 41.91', '12.5 41.91', '12.5 41.9']
+        node = Node.objects.get(slug='fusolab')
+        node.geometry = GEOSGeometry('POLYGON ((%s))' % ', '.join(coords))
+        node.save()
+        node = Node.objects.get(pk=node.pk)
+        self.assertTrue(node.geometry_low.num_coords < node.geometry.num_coords)
+        self.assertTrue(node.geometry_high.num_coords < node.geometry.num_coords)
+        # points are not simplified
+        self.assertIsNone(Node.objects.exclude(pk=node.pk).first().geometry_low)
+
+        def get_coordinates(response):
+            for feature in streamed_json(response)['features']:
+                if feature['id'] == 'fusolab':
+                    return feature['geometry']['coordinates'][0]
+
+        url = reverse('api_node_gejson_list')
+        response = self.client.get(url)
+        self.assertEqual(len(get_coordinates(response)), 103)
+        response = self.client.get(url, {'simplify': 'low'})
+        self.assertEqual(len(get_coordinates(response)), node.geometry_low.num_coords)
+        self.assertEqual(len(streamed_json(self.client.get(url, {'simplify': 'low'}))['features']), 8)
+        # zoom level chooses the simplification level
+        response = self.client.get(url, {'zoom': 18})
+        self.assertEqual(len(get_coordinates(response)), 103)
+        response = self.client.get(url, {'simplify': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_node_changes(self):
+        url = reverse('api_node_changes')
+        # without since only the sequence number of the last change is returned
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['changes'], [])
+        last = response.data['last']
+        self.assertEqual(last, NodeChange.objects.order_by('-seq')[0].seq)
+        # two updates of the same node and one deletion
+        node = Node.objects.get(slug='fusolab')
+        node.description = 'changed'
+        node.save()
+        node.save()
+        deleted = Node.objects.published().access_level_up_to('public').exclude(slug='fusolab').first()
+        deleted_slug = deleted.slug
+        deleted.delete()
+        # nodes which anonymous users can't see don't leave tombstones in their feed
+        Node.objects.get(slug='hidden-rome').delete()
+        response = self.client.get(url, {'since': last})
+        changes = response.data['changes']
+        self.assertEqual([change['action'] for change in changes], ['updated', 'deleted'])
+        self.assertEqual(changes[0]['slug'], 'fusolab')
+        self.assertEqual(changes[0]['feature']['properties']['description'], 'changed')
+        self.assertEqual(changes[1]['slug'], deleted_slug)
+        self.assertIsNone(changes[1]['feature'])
+        self.assertFalse(response.data['more'])
+        # the tombstone is sent to the users who could see the node
+        self.client.login(username='admin', password='tester')
+        response = self.client.get(url, {'since': last})
+        self.assertIn('hidden-rome', [change['slug'] for change in response.data['changes']])
+        self.client.logout()
+        # nothing changed since the last request
+        last = response.data['last']
+        response = self.client.get(url, {'since': last})
+        self.assertEqual(response.data['changes'], [])
+        # a change committed late is numbered after the changes already returned
+        late = NodeChange.objects.filter(node_id=node.pk).order_by('id')[0]
+        NodeChange.objects.filter(pk=late.pk).update(seq=None)
+        response = self.client.get(url, {'since': last})
+        self.assertEqual([change['slug'] for change in response.data['changes']], ['fusolab'])
+        self.assertTrue(response.data['changes'][0]['seq'] > last)
+        # filter by layer
+        response = self.client.get(url, {'since': 0, 'layers': 'idontexist'})
+        self.assertEqual(response.data['changes'], [])
+        response = self.client.get(url, {'since': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+        # changes have been purged
+        NodeChangePurge.objects.create(seq=last)
+        response = self.client.get(url, {'since': last - 1})
+        self.assertEqual(response.status_code, 410)
+        # the purge watermark is explicit: gaps in the sequence don't matter
+        NodeChange.objects.filter(seq=last + 1).delete()
+        response = self.client.get(url, {'since': last})
+        self.assertEqual(response.status_code, 200)
+
+    def test_node_tiles(self):
+        url = reverse('api_node_tiles', args=[0, 0, 0])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertTrue(len(response.content) > 0)
+        # tile which does not contain any node
+        url = reverse('api_node_tiles', args=[10, 0, 0])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.content), 0)
+        # layer which does not exist
+        url = reverse('api_node_tiles', args=[0, 0, 0])
+        response = self.client.get(url, {'layers': 'idontexist'})
+        self.assertEqual(len(response.content), 0)
+        # invalid tile
+        url = reverse('api_node_tiles', args=[1, 2, 0])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        # the extension must be preceded by a dot
+        url = reverse('api_node_tiles', args=[0, 0, 0]).replace('.mvt', 'xmvt')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
 
     def test_node_details(self):
         """ test node details """
@@ -506,7 +1128,7 @@ class NodesApiTest(BaseTestCase):
         response = self.client.get(url)
         # ensure all results are returned by default
         count = Node.objects.published().access_level_up_to('public').count()
-        self.assertEqual(len(response.data['features']), count)
+        self.assertEqual(len(streamed_json(response)['features']), count)
         # ensure pagination doesn't break geojson format
         response = self.client.get(url, {'limit': '1'})
         self.assertIn('type', response.data)
@@ -0,0 +1,80 @@
+"""
+Mapbox Vector Tiles (MVT) utilities, tiles are encoded by PostGIS (requires PostGIS >= 2.4)
+"""
+from django.db import connection
+
+from .settings import TILES_EXTENT, TILES_BUFFER
+
+
+__all__ = [
+    'tile_is_valid',
+    'tile_bounds',
+    'render_tile',
+]
+
+
+# half of the circumference of the earth in spherical mercator (EPSG:3857)
+MERCATOR_MAX = 20037508.342789244
+
+TILE_SQL = """
+SELECT ST_AsMVT(tile, 'nodes', %(extent)s, 'geom') FROM (
+    SELECT n.slug, n.name,
+           l.slug AS layer,
+           s.slug AS status,
+           ST_AsMVTGeom(
+               ST_Transform(n.geometry, 3857),
+               ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 3857),
+               %(extent)s, %(buffer)s, true
+           ) AS geom
+    FROM nodes_node n
+    LEFT JOIN layers_layer l ON l.id = n.layer_id
+    LEFT JOIN nodes_status s ON s.id = n.status_id
+    WHERE n.id IN (%(subquery)s)
+    AND n.geometry && ST_Transform(ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 3857), 4326)
+) AS tile WHERE tile.geom IS NOT NULL
+"""
+
+
+def tile_is_valid(z, x, y):
+    """ returns True if x and y are valid coordinates at zoom level z """
+    if z < 0 or z > 30:
+        return False
+    limit = 2 ** z
+    return 0 <= x < limit and 0 <= y < limit
+
+
+def tile_bounds(z, x, y):
+    """
+    returns the bounds of the specified tile in spherical mercator (EPSG:3857)
+    as a tuple (xmin, ymin, xmax, ymax)
+    """
+    size = (MERCATOR_MAX * 2) / (2 ** z)
+    xmin = -MERCATOR_MAX + x * size
+    ymax = MERCATOR_MAX - y * size
+    return (xmin, ymax - size, xmin + size, ymax)
+
+
+def render_tile(queryset, z, x, y):
+    """
+    returns the binary representation of the tile z/x/y
+    containing the nodes of the specified queryset
+
+    :param queryset: Node queryset (already filtered according to the access level of the user)
+    """
+    xmin, ymin, xmax, ymax = tile_bounds(z, x, y)
+    # filters of the queryset are executed in a subquery
+    subquery, subquery_params = queryset.order_by().values_list('id', flat=True).query.sql_with_params()
+    sql = TILE_SQL % {
+        'extent': TILES_EXTENT,
+        'buffer': TILES_BUFFER,
+        'xmin': xmin,
+        'ymin': ymin,
+        'xmax': xmax,
+        'ymax': ymax,
+        # placeholders of the subquery are left untouched and filled by cursor.execute
+        'subquery': subquery
+    }
+    cursor = connection.cursor()
+    cursor.execute(sql, subquery_params)
+    tile = cursor.fetchone()[0]
+    return str(tile) if tile else ''
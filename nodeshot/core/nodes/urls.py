@@ -4,6 +4,9 @@ from django.conf.urls import patterns, url
 urlpatterns = patterns('nodeshot.core.nodes.views',  # noqa
     url(r'^nodes/$', 'node_list', name='api_node_list'),
     url(r'^nodes.geojson$', 'geojson_list', name='api_node_gejson_list'),
+    url(r'^nodes/tiles/(?P<z>[0-9]+)/(?P<x>[0-9]+)/(?P<y>[0-9]+)\.mvt$', 'node_tiles', name='api_node_tiles'),
+    url(r'^nodes/bulk/$', 'node_bulk_create', name='api_node_bulk_create'),
+    url(r'^nodes/changes/$', 'node_changes', name='api_node_changes'),
     url(r'^nodes/(?P<slug>[-\w]+)/$', 'node_details', name='api_node_details'),
 
     # images
@@ -1,18 +1,30 @@
 from django.http import Http404
 from django.utils.translation import ugettext_lazy as _
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.db.models import Q
+from django.db.models import Q, Max
+from django.utils.datastructures import SortedDict
+from django.contrib.gis.geos import Polygon
 
 from rest_framework import permissions, authentication, generics
+from rest_framework.response import Response
+from rest_framework.exceptions import ParseError
+from rest_framework_extensions.cache.decorators import cache_response
 
-from nodeshot.core.base.mixins import ACLMixin, CustomDataMixin
+from nodeshot.core.base.mixins import (ACLMixin, CustomDataMixin, StreamingGeoJSONMixin,
+                                      ConditionalGetMixin, CursorPaginationMixin)
 from nodeshot.core.base.utils import Hider
+from nodeshot.core.base.cache import cache_by_group, cache_by_group_and_querystring, tagged
 
-from .settings import REVERSION_ENABLED
+from .settings import (REVERSION_ENABLED, TILES_CACHE_TIMEOUT, CLUSTER_MAX_ZOOM,
+                       FAST_SERIALIZATION, BULK_MAX_FEATURES, CHANGES_MAX_RESULTS)
 from .permissions import IsOwnerOrReadOnly
+from .renderers import MVTRenderer
+from .tiles import tile_is_valid, render_tile
+from .clustering import cluster_queryset
+from .geometry import SIMPLIFY_LEVELS, simplify_level_for_zoom
+from .search import search_nodes
+from .bulk import features_to_nodes, bulk_create_nodes, bulk_update_nodes
 from .serializers import *  # noqa
-from .models import Node, Status, Image
+from .models import Node, Status, Image, NodeChange, NodeChangePurge
 
 
 if REVERSION_ENABLED:
@@ -44,15 +56,16 @@ def get_queryset_or_404(queryset, kwargs):
     return obj
 
 
-class NodeList(NodeListBase):
+class NodeList(CursorPaginationMixin, NodeListBase):
     """
     Retrieve list of all published nodes.
 
     Parameters:
 
-     * `search=<word>`: search <word> in name, slug, description and address of nodes
+     * `search=<word>`: search <word> in name, slug, description and address of nodes (sorted by relevance)
      * `layers=<layer1>,<layer2>`: retrieve nodes of specified layers (comma separated)
      * `limit=<n>`: specify number of items per page (defaults to 50)
+     * `cursor`: paginate by cursor (sorted by last update), follow the `next` and `previous` links
 
     ### POST
 
@@ -65,6 +78,7 @@ class NodeList(NodeListBase):
     pagination_serializer_class = PaginatedNodeListSerializer
     paginate_by_param = 'limit'
     paginate_by = 50
+    cursor_ordering = ('updated', 'id')
 
     def pre_save(self, obj):
         """ automatically determine user on creation """
@@ -83,22 +97,195 @@ class NodeList(NodeListBase):
         search = self.request.QUERY_PARAMS.get('search', None)
         layers = self.request.QUERY_PARAMS.get('layers', None)
         if search is not None:
-            search_query = (
-                Q(name__icontains=search) |
-                Q(slug__icontains=search) |
-                Q(description__icontains=search) |
-                Q(address__icontains=search)
-            )
-            # add instructions for search to queryset
-            queryset = queryset.filter(search_query)
+            # full text search, results are sorted by relevance
+            queryset = search_nodes(queryset, search)
         if layers is not None:
             # look for nodes that are assigned to the specified layers
             queryset = queryset.filter(Q(layer__slug__in=layers.split(',')))
         return queryset
 
+    def get_layer_tags(self):
+        """
+        returns the tags of the layers specified in the querystring (layers are tagged by id)
+        or ['nodes'] if nodes are not filtered by layer
+        """
+        layers = self.request.QUERY_PARAMS.get('layers', None)
+        if layers is None:
+            return ['nodes']
+        Layer = Node._meta.get_field('layer').rel.to
+        ids = Layer.objects.filter(slug__in=layers.split(',')).values_list('id', flat=True)
+        return ['layer:%s' % layer_id for layer_id in ids]
+
+    def get_cache_tags(self):
+        """
+        nodes filtered by layer are invalidated only when nodes of those layers change,
+        layers, statuses and users are included because their names are shown
+        """
+        return self.get_layer_tags() + ['layers', 'statuses', 'users']
+
 node_list = NodeList.as_view()
 
 
+class NodeBulkCreate(generics.GenericAPIView):
+    """
+    ### POST
+
+    Create many nodes at once by sending a GeoJSON FeatureCollection. Requires authentication.
+
+    The properties of each feature must contain `name` and `layer` (slug),
+    optional properties are `status` (slug), `elev`, `address` and `description`.
+
+    ### PUT
+
+    Change many nodes at once by sending a GeoJSON FeatureCollection. Requires authentication.
+
+    The `id` of each feature must be the slug of a node which the user is allowed to change,
+    only the geometry and the properties contained in the feature are changed.
+
+    Nodes are created (or changed) only if all the features are valid, otherwise
+    a list containing the errors of each feature is returned.
+    """
+    authentication_classes = (authentication.SessionAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = NodeGeoSerializer
+
+    def get_features(self):
+        """ returns the features of the FeatureCollection sent by the client """
+        data = self.request.DATA
+        if not isinstance(data, dict) or data.get('type') != 'FeatureCollection' or\
+           not isinstance(data.get('features'), list):
+            raise ParseError(_('a GeoJSON FeatureCollection is required'))
+        features = data['features']
+        if not features:
+            raise ParseError(_('the FeatureCollection does not contain any feature'))
+        if len(features) > BULK_MAX_FEATURES:
+            raise ParseError(_('at most %d features can be sent at once') % BULK_MAX_FEATURES)
+        return features
+
+    def post(self, request, *args, **kwargs):
+        nodes, errors = features_to_nodes(self.get_features(), user=request.user)
+        if any(errors):
+            return Response({'features': errors}, status=400)
+        nodes = bulk_create_nodes(nodes)
+        serializer = self.get_serializer(nodes, many=True)
+        return Response(serializer.data, status=201)
+
+    def put(self, request, *args, **kwargs):
+        nodes, errors = features_to_nodes(self.get_features(), user=request.user, update=True)
+        if any(errors):
+            return Response({'features': errors}, status=400)
+        nodes = bulk_update_nodes(nodes)
+        serializer = self.get_serializer(nodes, many=True)
+        return Response(serializer.data)
+
+node_bulk_create = NodeBulkCreate.as_view()
+
+
+class NodeChangeList(ACLMixin, generics.GenericAPIView):
+    """
+    Retrieve in order the changes of nodes (created, updated, deleted)
+    which happened after the change with sequence number `since`.
+
+    Each node is listed once with its most recent change: created and updated
+    nodes contain their GeoJSON feature, deleted nodes (and nodes which are not
+    visible anymore) contain only their slug. Tombstones are sent only for nodes
+    which have been visible to the current user, changes of the other nodes are omitted.
+
+    To follow the feed pass `last` as `since` in the next request,
+    if `more` is true there are other changes to retrieve.
+
+    Parameters:
+
+     * `since=<seq>`: sequence number of the last change already received,
+        if omitted only the sequence number of the last change is returned
+     * `layers=<layer1>,<layer2>`: retrieve changes of nodes of the specified layers
+
+    Responds with 410 Gone if the changes following `since` have been purged:
+    in that case retrieve all the nodes again.
+    """
+    authentication_classes = (authentication.SessionAuthentication,)
+    queryset = Node.objects.published()
+    max_results = CHANGES_MAX_RESULTS
+
+    def get_since(self):
+        """ returns the since querystring parameter as integer or None """
+        since = self.request.QUERY_PARAMS.get('since', None)
+        if since is None:
+            return None
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ParseError(_('since parameter must be a non-negative integer'))
+        return since
+
+    def get_changes(self):
+        """ returns the numbered changes, filtered by layer if requested """
+        changes = NodeChange.objects.filter(seq__isnull=False)
+        layers = self.request.QUERY_PARAMS.get('layers', None)
+        if layers is not None and hasattr(Node, 'layer'):
+            Layer = Node._meta.get_field('layer').rel.to
+            layer_ids = Layer.objects.filter(slug__in=layers.split(',')).values('id')
+            changes = changes.filter(layer_id__in=layer_ids)
+        return changes
+
+    def get_features(self, ids):
+        """ returns a dictionary of the GeoJSON features of the visible nodes indexed by id """
+        queryset = self.get_queryset().filter(pk__in=ids)
+        serializer = NodeGeoFastSerializer(queryset, context=self.get_serializer_context())
+        details_url = serializer.get_details_url()
+        return dict((row['id'], serializer.to_native(row, details_url)) for row in serializer.get_values())
+
+    def get_previously_visible(self, ids, until):
+        """ returns the ids of the nodes which have been visible to the current user up to the change until """
+        changes = NodeChange.objects.filter(node_id__in=ids, seq__lte=until)
+        changes = changes.published().accessible_to(user=self.request.user)
+        return set(changes.values_list('node_id', flat=True).distinct())
+
+    def get(self, request, *args, **kwargs):
+        since = self.get_since()
+        NodeChange.sequence()
+        if since is None:
+            last = NodeChange.objects.aggregate(last=Max('seq'))['last'] or 0
+            return Response({'since': None, 'last': last, 'more': False, 'changes': []})
+        # the changes following since have been purged
+        if since < NodeChangePurge.watermark():
+            return Response({'detail': _('changes have been purged, retrieve all the nodes again')},
+                            status=410)
+        rows = list(self.get_changes().filter(seq__gt=since).order_by('seq')[:self.max_results])
+        # keep only the most recent change of each node
+        latest = SortedDict()
+        for change in rows:
+            latest.pop(change.node_id, None)
+            latest[change.node_id] = change
+        features = self.get_features([change.node_id for change in latest.values()
+                                      if change.action != 'deleted'])
+        hidden = [node_id for node_id in latest.keys() if node_id not in features]
+        visible = self.get_previously_visible(hidden, rows[-1].seq) if hidden else set()
+        changes = []
+        for change in latest.values():
+            feature = features.get(change.node_id)
+            # nodes which the user has never seen are omitted
+            if not feature and change.node_id not in visible:
+                continue
+            changes.append(SortedDict((
+                ('seq', change.seq),
+                ('action', change.action if feature else 'deleted'),
+                ('node', change.node_id),
+                ('slug', feature['id'] if feature else change.slug),
+                ('feature', feature),
+            )))
+        return Response({
+            'since': since,
+            'last': rows[-1].seq if rows else since,
+            'more': len(rows) == self.max_results,
+            'changes': changes
+        })
+
+node_changes = NodeChangeList.as_view()
+
+
 class NodeDetail(NodeDetailBase):
     """
     Retrieve details of specified node. Node must be published and accessible.
@@ -120,14 +307,119 @@ class NodeDetail(NodeDetailBase):
 node_details = NodeDetail.as_view()
 
 
-class NodeGeoJSONList(NodeList):
+class SimplifiedGeometryMixin(object):
+    """
+    Parses the parameters which select the precomputed simplified geometries:
+
+     * `simplify=<level>`: one of low, medium, high (see nodeshot.core.nodes.geometry)
+     * `zoom=<n>`: zoom level of the map, used to choose the level if simplify is not specified
+    """
+    def get_zoom(self):
+        """ returns the zoom querystring parameter as integer or None """
+        zoom = self.request.QUERY_PARAMS.get('zoom', None)
+        if zoom is None:
+            return None
+        try:
+            zoom = int(zoom)
+        except ValueError:
+            zoom = -1
+        if zoom < 0:
+            raise ParseError(_('zoom parameter must be a non-negative integer'))
+        return zoom
+
+    def get_simplify_level(self):
+        """ returns the level of simplification which has been requested or None """
+        level = self.request.QUERY_PARAMS.get('simplify', None)
+        if level is None:
+            zoom = self.get_zoom()
+            return simplify_level_for_zoom(zoom) if zoom is not None else None
+        if level not in SIMPLIFY_LEVELS:
+            raise ParseError(_('simplify parameter must be one of: %s') % ', '.join(SIMPLIFY_LEVELS))
+        return level
+
+
+class NodeGeoJSONListMixin(SimplifiedGeometryMixin, StreamingGeoJSONMixin):
+    """
+    Unpaginated GeoJSON lists of nodes are streamed (see StreamingGeoJSONMixin)
+    and serialized with NodeGeoFastSerializer unless NODESHOT_NODES_FAST_SERIALIZATION is False.
+
+    Adds the following parameters to GeoJSON lists of nodes:
+
+     * `bbox=<min_lng>,<min_lat>,<max_lng>,<max_lat>`: retrieve only nodes contained in the bounding box
+     * `zoom=<n>`: zoom level of the map, below NODESHOT_NODES_CLUSTER_MAX_ZOOM
+        nodes which are close to each other are grouped in clusters
+        and geometries are simplified according to the zoom level
+     * `simplify=<level>`: retrieve the simplified geometries of the specified level (low, medium, high)
+
+    Simplified geometries are returned only by unpaginated lists serialized with NodeGeoFastSerializer.
+    """
+    fast_serialization = FAST_SERIALIZATION
+
+    def get_bbox(self):
+        """ returns a Polygon from the bbox querystring parameter or None """
+        bbox = self.request.QUERY_PARAMS.get('bbox', None)
+        if bbox is None:
+            return None
+        try:
+            return Polygon.from_bbox([float(coord) for coord in bbox.split(',')])
+        except ValueError:
+            raise ParseError(_('bbox parameter must be in the format: min_lng,min_lat,max_lng,max_lat'))
+
+    def get_queryset(self):
+        """ filter nodes contained in bbox if specified """
+        queryset = super(NodeGeoJSONListMixin, self).get_queryset()
+        bbox = self.get_bbox()
+        if bbox is not None:
+            queryset = queryset.filter(geometry__intersects=bbox)
+        return queryset
+
+    def get_features(self, queryset):
+        """ features of streamed responses """
+        if not self.fast_serialization:
+            return super(NodeGeoJSONListMixin, self).get_features(queryset)
+        serializer = NodeGeoFastSerializer(queryset, context=self.get_serializer_context(),
+                                           simplify=self.get_simplify_level())
+        return serializer.features(chunk_size=self.streaming_chunk_size)
+
+    def get_feature_collection(self, queryset):
+        """ returns the FeatureCollection of the nodes contained in queryset """
+        if self.fast_serialization:
+            serializer = NodeGeoFastSerializer(queryset, context=self.get_serializer_context(),
+                                               simplify=self.get_simplify_level())
+        else:
+            serializer = self.get_serializer(queryset, many=True)
+        return serializer.data
+
+    def list(self, request, *args, **kwargs):
+        """ return clusters instead of nodes at low zoom levels (pagination is ignored) """
+        zoom = self.get_zoom()
+        if zoom is None or zoom >= CLUSTER_MAX_ZOOM:
+            # paginated and streamed responses
+            if self.get_paginate_by() or self.is_streamable():
+                return super(NodeGeoJSONListMixin, self).list(request, *args, **kwargs)
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response(self.get_feature_collection(queryset))
+        queryset = self.filter_queryset(self.get_queryset())
+        clusters, single_ids = cluster_queryset(queryset, zoom)
+        # nodes which are alone in their cell are returned as usual
+        data = self.get_feature_collection(queryset.filter(id__in=single_ids))
+        data['features'] += clusters
+        return Response(data)
+
+
+class NodeGeoJSONList(ConditionalGetMixin, NodeGeoJSONListMixin, NodeList):
     """
     Retrieve list of all published nodes in GeoJSON format.
+    Supports conditional requests (ETag and Last-Modified).
 
     Parameters:
 
      * `search=<word>`: search <word> in name, slug, description and address of nodes
      * `layers=<layer1>,<layer2>`: retrieve nodes of specified layers
+     * `bbox=<min_lng>,<min_lat>,<max_lng>,<max_lat>`: retrieve only nodes contained in the bounding box
+     * `zoom=<n>`: zoom level of the map, at low zoom levels nodes are grouped in clusters
+        and geometries are simplified
+     * `simplify=<level>`: retrieve simplified geometries (low, medium, high)
      * `limit=<n>`: specify number of items per page (show all by default)
      * `page=<n>`: show page n
     """
@@ -140,6 +432,37 @@ class NodeGeoJSONList(NodeList):
 geojson_list = NodeGeoJSONList.as_view()
 
 
+class NodeTileList(NodeList):
+    """
+    Retrieve published nodes contained in the tile `z/x/y` in Mapbox Vector Tile format.
+    Tiles are built by the database (requires PostGIS >= 2.4) and cached by user group.
+
+    Parameters:
+
+     * `search=<word>`: search <word> in name, slug, description and address of nodes
+     * `layers=<layer1>,<layer2>`: retrieve nodes of specified layers (comma separated)
+    """
+    renderer_classes = (MVTRenderer,)
+    post = Hider()
+
+    def get_cache_tags(self):
+        """
+        tiles filtered by layer are invalidated only when nodes of those layers change
+        (or when layers change, since the filter might match a new layer)
+        """
+        return self.get_layer_tags() + ['layers', 'statuses']
+
+    @cache_response(TILES_CACHE_TIMEOUT, key_func=tagged(cache_by_group_and_querystring))
+    def get(self, request, *args, **kwargs):
+        """ Retrieve tile z/x/y """
+        z, x, y = int(kwargs['z']), int(kwargs['x']), int(kwargs['y'])
+        if not tile_is_valid(z, x, y):
+            raise Http404(_('Tile not found'))
+        return Response(render_tile(self.get_queryset(), z, x, y))
+
+node_tiles = NodeTileList.as_view()
+
+
 # -------- Images -------- #
 
 
@@ -248,9 +571,12 @@ class StatusList(generics.ListAPIView):
     queryset = Status.objects.all()
     serializer_class = StatusListSerializer
 
-    @method_decorator(cache_page(86400))  # cache for 1 day
-    def dispatch(self, *args, **kwargs):
-        return super(StatusList, self).dispatch(*args, **kwargs)
+    def get_cache_tags(self):
+        return ['statuses']
+
+    @cache_response(86400, key_func=tagged(cache_by_group))  # cache for 1 day
+    def get(self, request, *args, **kwargs):
+        return super(StatusList, self).get(request, *args, **kwargs)
 
 status_list = StatusList.as_view()
 
@@ -0,0 +1,41 @@
+from django.dispatch import receiver
+from django.conf import settings
+
+from nodeshot.core.layers.signals import layer_nodes_published_changed
+
+from ..tasks import send_message
+
+
+# ------ NODES OF LAYER PUBLISHED / UNPUBLISHED ------ #
+
+@receiver(layer_nodes_published_changed)
+def layer_nodes_published_changed_handler(sender, **kwargs):
+    obj = kwargs['instance']
+    action = 'published' if kwargs['is_published'] else 'unpublished'
+    message = '%d nodes of layer "%s" have been %s' % (kwargs['count'], obj.name, action)
+    send_message.delay(message)
+
+
+# ------ DISCONNECT UTILITY ------ #
+
+def disconnect():
+    """ disconnect signals """
+    layer_nodes_published_changed.disconnect(layer_nodes_published_changed_handler)
+
+
+def reconnect():
+    """ reconnect signals """
+    layer_nodes_published_changed.connect(layer_nodes_published_changed_handler)
+
+
+from nodeshot.core.base.settings import DISCONNECTABLE_SIGNALS
+DISCONNECTABLE_SIGNALS.append(
+    {
+        'disconnect': disconnect,
+        'reconnect': reconnect,
+        'receivers': [
+            (layer_nodes_published_changed, layer_nodes_published_changed_handler, None)
+        ]
+    }
+)
+setattr(settings, 'NODESHOT_DISCONNECTABLE_SIGNALS', DISCONNECTABLE_SIGNALS)
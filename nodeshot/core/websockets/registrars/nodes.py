@@ -2,7 +2,7 @@ from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
 from django.conf import settings
 
-from nodeshot.core.nodes.signals import node_status_changed
+from nodeshot.core.nodes.signals import node_status_changed, nodes_bulk_created
 from nodeshot.core.nodes.models import Node
 
 from ..tasks import send_message
@@ -17,6 +17,12 @@ def node_created_handler(sender, **kwargs):
         message = 'node "%s" has been added' % obj.name
         send_message.delay(message)
 
+
+@receiver(nodes_bulk_created, sender=Node)
+def nodes_bulk_created_handler(sender, **kwargs):
+    message = '%d nodes have been added' % len(kwargs['instances'])
+    send_message.delay(message)
+
 # ------ NODE STATUS CHANGED ------ #
 
 @receiver(node_status_changed)
@@ -42,6 +48,7 @@ def node_deleted_handler(sender, **kwargs):
 def disconnect():
     """ disconnect signals """
     post_save.disconnect(node_created_handler, sender=Node)
+    nodes_bulk_created.disconnect(nodes_bulk_created_handler, sender=Node)
     node_status_changed.disconnect(node_status_changed_handler)
     pre_delete.disconnect(node_deleted_handler, sender=Node)
 
@@ -49,15 +56,54 @@ def disconnect():
 def reconnect():
     """ reconnect signals """
     post_save.connect(node_created_handler, sender=Node)
+    nodes_bulk_created.connect(nodes_bulk_created_handler, sender=Node)
     node_status_changed.connect(node_status_changed_handler)
     pre_delete.connect(node_deleted_handler, sender=Node)
 
 
+# ------ BATCH UTILITY ------ #
+
+def batch(events):
+    """ sends one message for each kind of event buffered by nodeshot_batch """
+    added = []
+    status_changed = []
+    deleted = []
+    for signal, kwargs in events:
+        if signal is post_save and kwargs['created']:
+            added.append(kwargs['instance'])
+        elif signal is nodes_bulk_created:
+            added += kwargs['instances']
+        elif signal is node_status_changed:
+            status_changed.append(kwargs)
+        elif signal is pre_delete:
+            deleted.append(kwargs['instance'])
+    # single events are sent as usual
+    if len(added) == 1:
+        node_created_handler(sender=Node, instance=added[0], created=True)
+    elif added:
+        send_message.delay('%d nodes have been added' % len(added))
+    if len(status_changed) == 1:
+        node_status_changed_handler(**status_changed[0])
+    elif status_changed:
+        send_message.delay('%d nodes changed their status' % len(status_changed))
+    if len(deleted) == 1:
+        node_deleted_handler(sender=Node, instance=deleted[0])
+    elif deleted:
+        send_message.delay('%d nodes have been deleted' % len(deleted))
+
+
 from nodeshot.core.base.settings import DISCONNECTABLE_SIGNALS
 DISCONNECTABLE_SIGNALS.append(
     {
         'disconnect': disconnect,
-        'reconnect': reconnect
+        'reconnect': reconnect,
+        'receivers': [
+            (post_save, node_created_handler, Node),
+            (nodes_bulk_created, nodes_bulk_created_handler, Node),
+            (node_status_changed, node_status_changed_handler, None),
+            (pre_delete, node_deleted_handler, Node)
+        ],
+        'batch': batch
     }
 )
 setattr(settings, 'NODESHOT_DISCONNECTABLE_SIGNALS', DISCONNECTABLE_SIGNALS)
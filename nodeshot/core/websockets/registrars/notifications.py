@@ -40,7 +40,10 @@ from nodeshot.core.base.settings import DISCONNECTABLE_SIGNALS
 DISCONNECTABLE_SIGNALS.append(
     {
         'disconnect': disconnect,
-        'reconnect': reconnect
+        'reconnect': reconnect,
+        'receivers': [
+            (post_save, new_notification_handler, Notification)
+        ]
     }
 )
 setattr(settings, 'NODESHOT_DISCONNECTABLE_SIGNALS', DISCONNECTABLE_SIGNALS)
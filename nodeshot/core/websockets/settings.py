@@ -10,5 +10,6 @@ LISTENING_ADDRESS = getattr(settings, 'NODESHOT_WEBSOCKETS_LISTENING_ADDRESS', '
 LISTENING_PORT = getattr(settings, 'NODESHOT_WEBSOCKETS_LISTENING_PORT', 8080)
 REGISTER = getattr(settings, 'NODESHOT_WEBSOCKETS_REGISTER', (
     'nodeshot.core.websockets.registrars.nodes',
+    'nodeshot.core.websockets.registrars.layers',
     'nodeshot.core.websockets.registrars.notifications',
 ))
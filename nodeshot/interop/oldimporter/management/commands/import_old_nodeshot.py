@@ -23,8 +23,9 @@ from nodeshot.community.profiles.settings import EMAIL_CONFIRMATION
 if EMAIL_CONFIRMATION:
     from nodeshot.community.profiles.models import EmailAddress
 
-from nodeshot.core.base.utils import pause_disconnectable_signals, resume_disconnectable_signals
+from nodeshot.core.base.utils import pause_disconnectable_signals, resume_disconnectable_signals, nodeshot_batch
 from nodeshot.core.nodes.models import Node, Status
+from nodeshot.core.layers.spatial import LayerAreaIndex
 from nodeshot.networking.net.models import *  # noqa
 from nodeshot.networking.net.models.choices import INTERFACE_TYPES
 from nodeshot.networking.links.models import Link
@@ -144,12 +145,14 @@ class Command(BaseCommand):
             self.extract_users()
             self.import_admins()
             self.import_users()
-            self.import_nodes()
-            self.check_deleted_nodes()
-            self.import_devices()
-            self.import_interfaces()
-            self.import_links()
-            self.check_deleted_links()
+            # side effects of node and link changes are processed once at the end
+            with nodeshot_batch():
+                self.import_nodes()
+                self.check_deleted_nodes()
+                self.import_devices()
+                self.import_interfaces()
+                self.import_links()
+                self.check_deleted_links()
             self.import_contacts()
 
             self.confirm_operation_completed()
@@ -485,6 +488,8 @@ choose (enter the number of) one of the following layers:
         self.message('saving nodes into local DB...')
 
         saved_nodes = []
+        # layer areas are loaded only once and looked up in memory
+        layer_index = LayerAreaIndex()
 
         # loop over all old node and create new nodes
         for old_node in self.old_nodes:
@@ -509,7 +514,7 @@ choose (enter the number of) one of the following layers:
             node.updated = old_node.updated
             node.data['imported'] = 'true'
 
-            intersecting_layers = node.intersecting_layers
+            intersecting_layers = layer_index.query(node.geometry)
             # if more than one intersecting layer
             if len(intersecting_layers) > 1:
                 # prompt user
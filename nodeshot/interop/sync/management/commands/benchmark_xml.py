@@ -0,0 +1,90 @@
+import os
+import time
+import hashlib
+import resource
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from ...synchronizers.base import XMLParserMixin, XMLStreamParserMixin
+
+
+TESTING_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'static', 'nodeshot', 'testing')
+# fields read by the GeoRss synchronizer
+FIELDS = ['title', 'georss:point', 'summary', 'updated']
+
+
+class Command(BaseCommand):
+    help = 'Compare the speed and memory usage of the minidom and the streaming (iterparse) XML parsers\n\
+            on a big GeoRSS feed built from the entries of georss-simple.xml'
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--items',
+            action='store',
+            dest='items',
+            type='int',
+            default=100000,
+            help='Number of items of the GeoRSS feed (defaults to 100000)'
+        ),
+        make_option(
+            '--output',
+            action='store',
+            dest='output',
+            default=None,
+            help='Write the generated GeoRSS feed to the specified file'
+        ),
+    )
+
+    def output(self, message):
+        self.stdout.write('%s\n\r' % message)
+
+    def build_feed(self, count):
+        """ returns a GeoRSS (atom) feed containing count entries copied from georss-simple.xml """
+        with open(os.path.join(TESTING_PATH, 'georss-simple.xml')) as f:
+            source = f.read()
+        start = source.index('<entry>')
+        end = source.rindex('</entry>') + len('</entry>')
+        entries = ['<entry>%s' % entry for entry in source[start:end].split('<entry>') if entry.strip()]
+        body = []
+        for i in range(count):
+            entry = entries[i % len(entries)]
+            # ensure titles are unique
+            body.append(entry.replace('<title>', '<title>%d ' % i, 1))
+        return '%s%s%s' % (source[:start], '\n    '.join(body), source[end:])
+
+    def measure(self, label, items):
+        """ reads the fields of each item, prints elapsed time and peak memory usage """
+        start = time.time()
+        checksum = hashlib.md5()
+        count = 0
+        for item in items():
+            count += 1
+            for field in FIELDS:
+                checksum.update(item(field).encode('utf-8'))
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        self.output('%s: %d items in %.2f seconds, peak memory %.1f MB' % (label, count, time.time() - start, peak))
+        return checksum.hexdigest()
+
+    def handle(self, *args, **options):
+        data = self.build_feed(options['items'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(data)
+        self.output('parsing a GeoRSS feed of %d items (%.1f MB)...' % (options['items'], len(data) / 1048576.0))
+
+        def stream():
+            for item in XMLStreamParserMixin.iter_items(data, 'entry'):
+                yield lambda field: XMLStreamParserMixin.get_text(item, field, '')
+
+        def dom():
+            parser = XMLParserMixin()
+            parser.data = data
+            parser.parse()
+            for item in parser.parsed_data.getElementsByTagName('entry'):
+                yield lambda field: XMLParserMixin.get_text(item, field, '')
+
+        # peak memory can only grow, the streaming parser is measured first
+        streaming = self.measure('iterparse', stream)
+        standard = self.measure('minidom', dom)
+        self.output('output is identical: %s' % (streaming == standard))
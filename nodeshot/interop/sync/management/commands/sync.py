@@ -1,5 +1,12 @@
+import sys
+import time
+from Queue import Queue
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+
 from django.core.management.base import BaseCommand, CommandError
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
+from django.db import connection
 from django.db.models import Q
 from django.utils.module_loading import import_by_path
 
@@ -23,6 +30,22 @@ class Command(BaseCommand):
                  e.g. --exclude=layer1-slug,layer2-slug,layer3-slug\n\
                  (works only if no layer has been specified)'
         ),
+        make_option(
+            '--workers',
+            action='store',
+            dest='workers',
+            type='int',
+            default=1,
+            help='Number of threads which fetch and parse external layers concurrently\n\
+                 (data is always saved one layer at time, each layer in its own transaction)'
+        ),
+        make_option(
+            '--force',
+            action='store_true',
+            dest='force',
+            default=False,
+            help='Synchronize layers even if their external source has not changed since the last synchronization'
+        ),
     )
 
     def retrieve_layers(self, *args, **options):
@@ -81,6 +104,7 @@ class Command(BaseCommand):
         """ execute sync command """
         # store verbosity level in instance attribute for later use
         self.verbosity = int(options.get('verbosity'))
+        self.force = options.get('force', False)
 
         # blank line
         self.stdout.write('\r\n')
@@ -94,7 +118,24 @@ class Command(BaseCommand):
         else:
             self.verbose('going to process %d layers...' % len(layers))
 
-        # loop over
+        synchronizers = self.get_synchronizers(layers)
+        workers = options.get('workers') or 1
+
+        if workers > 1 and len(synchronizers) > 1:
+            self.verbose('fetching layers with %d workers...' % workers)
+            # save layers in the order in which their data becomes available
+            for instance, exc_info in prefetch(synchronizers, min(workers, len(synchronizers))):
+                self.sync_layer(instance, exc_info)
+        else:
+            for instance in synchronizers:
+                self.sync_layer(instance)
+
+        self.stdout.write('\r\n')
+
+    def get_synchronizers(self, layers):
+        """ returns a list containing the synchronizer instance of each layer which can be synchronized """
+        synchronizers = []
+
         for layer in layers:
             # retrieve interop class if available
             try:
@@ -116,16 +157,82 @@ class Command(BaseCommand):
             Synchronizer = import_by_path(synchronizer_path)
             self.stdout.write('imported module %s\r\n' % Synchronizer.__name__)
 
-            # try running
             try:
-                instance = Synchronizer(layer, verbosity=self.verbosity)
-                self.stdout.write('Processing layer "%s"\r\n' % layer.slug)
-                messages = instance.sync()
+                synchronizers.append(Synchronizer(layer, verbosity=self.verbosity, force=self.force))
             except ImproperlyConfigured, e:
                 self.stdout.write('Validation error: %s\r\n' % e)
-                continue
 
-            for message in messages:
-                self.stdout.write('%s\n\r' % message)
+        return synchronizers
 
-        self.stdout.write('\r\n')
+    def sync_layer(self, instance, exc_info=None):
+        """
+        saves the data of a layer and reports how long it took,
+        exc_info contains the exception raised while fetching data in a worker thread (if any)
+        """
+        start = time.time()
+        # data fetched by a worker thread before the layer is processed
+        prefetched = instance.fetched or exc_info is not None
+        self.stdout.write('Processing layer "%s"\r\n' % instance.layer.slug)
+
+        # try running
+        try:
+            if exc_info:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            messages = instance.sync()
+        except ImproperlyConfigured, e:
+            self.stdout.write('Validation error: %s\r\n' % e)
+            return
+
+        for message in messages:
+            self.stdout.write('%s\n\r' % message)
+
+        elapsed = time.time() - start
+        if prefetched:
+            elapsed += instance.timings.get('fetch', 0)
+
+        self.stdout.write('Layer "%s" synchronized in %.2f seconds (fetch: %.2f, save: %.2f)\r\n' % (
+            instance.layer.slug,
+            elapsed,
+            instance.timings.get('fetch', 0),
+            instance.timings.get('save', 0)
+        ))
+
+
+def fetch(instance):
+    """
+    retrieves and parses the data of a layer in a worker thread,
+    exceptions are returned and raised again in the main thread when the layer is processed
+    """
+    try:
+        instance.fetch()
+    except Exception:
+        return instance, sys.exc_info()
+    finally:
+        # close the connection which might have been opened by the thread
+        connection.close()
+    return instance, None
+
+
+def prefetch(synchronizers, workers):
+    """
+    fetches the data of the synchronizers with a pool of threads and yields the results of fetch
+    in the order in which they become available; a new layer is fetched only when a previous one
+    has been yielded, so at most "workers" layers are fetched ahead of the one which is being saved
+    """
+    synchronizers = iter(synchronizers)
+    results = Queue()
+    pool = ThreadPool(workers)
+    try:
+        pending = 0
+        for instance in islice(synchronizers, workers):
+            pool.apply_async(fetch, (instance,), callback=results.put)
+            pending += 1
+        while pending:
+            result = results.get()
+            pending -= 1
+            for instance in islice(synchronizers, 1):
+                pool.apply_async(fetch, (instance,), callback=results.put)
+                pending += 1
+            yield result
+    finally:
+        pool.terminate()
@@ -11,10 +11,11 @@ check_dependencies(
 
 
 from .layer_external import LayerExternal
+from .layer_external_state import LayerExternalState
 from .node_external import NodeExternal
 
 
-__all__ = ['LayerExternal', 'NodeExternal']
+__all__ = ['LayerExternal', 'LayerExternalState', 'NodeExternal']
 
 
 # ------ patch LayerNodesList view to support external layers ------ #
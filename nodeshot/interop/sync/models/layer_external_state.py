@@ -0,0 +1,27 @@
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+
+class LayerExternalState(models.Model):
+    """
+    HTTP caching info of the data source of an external layer,
+    stored after each successful synchronization and used to skip
+    the synchronization when the source has not changed since the last one
+    """
+    external = models.OneToOneField('sync.LayerExternal', verbose_name=_('external layer'), related_name='state')
+    config_hash = models.CharField(_('configuration hash'), max_length=40, blank=True,
+                                   help_text=_('SHA1 hash of the configuration used in the last synchronization'))
+    etag = models.CharField(_('ETag'), max_length=255, blank=True)
+    last_modified = models.CharField(_('Last-Modified'), max_length=64, blank=True)
+    content_hash = models.CharField(_('content hash'), max_length=40, blank=True,
+                                    help_text=_('SHA1 hash of the data retrieved in the last synchronization'))
+    updated = models.DateTimeField(_('updated on'), auto_now=True)
+
+    class Meta:
+        app_label = 'sync'
+        db_table = 'layers_external_state'
+        verbose_name = _('external layer state')
+        verbose_name_plural = _('external layer states')
+
+    def __unicode__(self):
+        return '%s state' % self.external
@@ -1,4 +1,5 @@
 from django.db import models
+from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
 from nodeshot.core.nodes.models import Node
@@ -28,8 +29,36 @@ class NodeExternal(models.Model):
 
 from django.dispatch import receiver
 from django.db.models.signals import pre_delete, post_save
+from nodeshot.core.base.utils import call_after_batch
+from nodeshot.core.nodes.signals import nodes_bulk_created, nodes_bulk_updated
 
-from ..tasks import push_changes_to_external_layers
+from ..tasks import push_changes_to_external_layers, push_many_changes_to_external_layers
+
+
+def get_external_layer(layer):
+    """ returns the external layer info of layer if its changes must be pushed, None otherwise """
+    if layer.is_external is False or not hasattr(layer, 'external') or layer.external.synchronizer_path is None:
+        return None
+    return layer.external
+
+
+def get_changes(nodes, operation):
+    """ returns the (node, external_layer, operation) tuples of the nodes of external layers """
+    external_layers = {}
+    changes = []
+    for node in nodes:
+        if node.layer_id not in external_layers:
+            external_layers[node.layer_id] = get_external_layer(node.layer)
+        external_layer = external_layers[node.layer_id]
+        if external_layer is not None:
+            changes.append((node, external_layer, operation))
+    return changes
+
+
+def push_changes(changes):
+    """ pushes all the changes to the external layers with one background job """
+    if changes:
+        push_many_changes_to_external_layers.delay(list(changes))
 
 
 @receiver(post_save, sender=Node)
@@ -37,24 +66,99 @@ def save_external_nodes(sender, **kwargs):
     """ sync by creating nodes in external layers when needed """
     node = kwargs['instance']
     operation = 'add' if kwargs['created'] is True else 'change'
+    external_layer = get_external_layer(node.layer)
 
-    if node.layer.is_external is False or not hasattr(node.layer, 'external') or node.layer.external.synchronizer_path is None:
+    if external_layer is None:
         return False
 
-    push_changes_to_external_layers.delay(node=node, external_layer=node.layer.external, operation=operation)
+    push_changes_to_external_layers.delay(node=node, external_layer=external_layer, operation=operation)
+
+
+@receiver(nodes_bulk_created, sender=Node)
+@receiver(nodes_bulk_updated, sender=Node)
+def save_bulk_external_nodes(sender, instances, **kwargs):
+    """ same as save_external_nodes for nodes created or updated in bulk (one background job) """
+    operation = 'add' if kwargs['signal'] is nodes_bulk_created else 'change'
+    push_changes(get_changes(instances, operation))
 
 
 @receiver(pre_delete, sender=Node)
 def delete_external_nodes(sender, **kwargs):
-    """ sync by deleting nodes from external layers when needed """
+    """
+    sync by deleting nodes from external layers when needed
+    (inside nodeshot_batch deletions are pushed at the end of the batch with one background job)
+    """
     node = kwargs['instance']
+    external_layer = get_external_layer(node.layer)
 
-    if node.layer.is_external is False or not hasattr(node.layer, 'external') or node.layer.external.synchronizer_path is None:
+    if external_layer is None:
         return False
 
+    # the external id must be read before the node is deleted
     if hasattr(node, 'external') and node.external.external_id:
-        push_changes_to_external_layers.delay(
-            node=node.external.external_id,
-            external_layer=node.layer.external,
-            operation='delete'
-        )
+        call_after_batch(push_changes, [(node.external.external_id, external_layer, 'delete')])
+
+
+# ------ DISCONNECT UTILITY ------ #
+
+def disconnect():
+    """ disconnect signals """
+    post_save.disconnect(save_external_nodes, sender=Node)
+    nodes_bulk_created.disconnect(save_bulk_external_nodes, sender=Node)
+    nodes_bulk_updated.disconnect(save_bulk_external_nodes, sender=Node)
+
+
+def reconnect():
+    """ reconnect signals """
+    post_save.connect(save_external_nodes, sender=Node)
+    nodes_bulk_created.connect(save_bulk_external_nodes, sender=Node)
+    nodes_bulk_updated.connect(save_bulk_external_nodes, sender=Node)
+
+
+def disconnect_delete():
+    """ disconnect signals """
+    pre_delete.disconnect(delete_external_nodes, sender=Node)
+
+
+def reconnect_delete():
+    """ reconnect signals """
+    pre_delete.connect(delete_external_nodes, sender=Node)
+
+
+# ------ BATCH UTILITY ------ #
+
+def batch(events):
+    """ pushes the changes of all the nodes saved inside nodeshot_batch with one background job """
+    nodes = {'add': [], 'change': []}
+    for signal, kwargs in events:
+        if signal is post_save:
+            nodes['add' if kwargs['created'] else 'change'].append(kwargs['instance'])
+        elif signal is nodes_bulk_created:
+            nodes['add'] += kwargs['instances']
+        elif signal is nodes_bulk_updated:
+            nodes['change'] += kwargs['instances']
+    push_changes(get_changes(nodes['add'], 'add') + get_changes(nodes['change'], 'change'))
+
+
+from nodeshot.core.base.settings import DISCONNECTABLE_SIGNALS
+DISCONNECTABLE_SIGNALS.append(
+    {
+        'disconnect': disconnect,
+        'reconnect': reconnect,
+        'receivers': [
+            (post_save, save_external_nodes, Node),
+            (nodes_bulk_created, save_bulk_external_nodes, Node),
+            (nodes_bulk_updated, save_bulk_external_nodes, Node)
+        ],
+        'batch': batch
+    }
+)
+# deletions are not buffered because the external id must be read before the node is deleted,
+# they are grouped with call_after_batch instead
+DISCONNECTABLE_SIGNALS.append(
+    {
+        'disconnect': disconnect_delete,
+        'reconnect': reconnect_delete
+    }
+)
+setattr(settings, 'NODESHOT_DISCONNECTABLE_SIGNALS', DISCONNECTABLE_SIGNALS)
@@ -12,3 +12,6 @@ if 'nodeshot.networking.links' in settings.INSTALLED_APPS:
     DEFAULT_SYNCHRONIZERS.append(('nodeshot.interop.sync.synchronizers.Cnml', 'CNML (periodic sync)'))
 
 SYNCHRONIZERS = DEFAULT_SYNCHRONIZERS + getattr(settings, 'NODESHOT_SYNCHRONIZERS', [])
+
+# number of external items which are compared and saved at once during synchronizations
+CHUNK_SIZE = getattr(settings, 'NODESHOT_SYNC_CHUNK_SIZE', 1000)
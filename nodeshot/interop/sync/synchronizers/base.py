@@ -1,16 +1,29 @@
 from __future__ import absolute_import
 
+import time
+import hashlib
+import threading
 import requests
+from cStringIO import StringIO
 from xml.dom import minidom
+from xml.etree.cElementTree import iterparse
 from dateutil import parser as DateParser
 
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.contrib.gis.geos import GeometryCollection
 from django.template.defaultfilters import slugify
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
-from nodeshot.core.base.utils import pause_disconnectable_signals, resume_disconnectable_signals
+from nodeshot.core.base.utils import pause_disconnectable_signals, resume_disconnectable_signals, nodeshot_batch
 from nodeshot.core.nodes.models import Node, Status
+from nodeshot.core.nodes.bulk import bulk_create_nodes, bulk_update_nodes
+
+from ..models import LayerExternalState
+from ..settings import CHUNK_SIZE
 
 
 __all__ = [
@@ -21,9 +34,23 @@ __all__ = [
     # mixins
     'HttpRetrieverMixin',
     'XMLParserMixin',
+    'XMLStreamParserMixin',
 ]
 
 
+# connections to external sources are pooled and reused across synchronizations,
+# sessions are not thread safe so each thread (see sync --workers) uses its own one
+_local = threading.local()
+
+
+def get_session():
+    """ returns the requests session of the current thread """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
 class BaseSynchronizer(object):
     """
     Base Synchronizer
@@ -44,8 +71,18 @@ class BaseSynchronizer(object):
         """
         self.layer = layer
         self.verbosity = kwargs.get('verbosity', 1)
+        # if True the external source is synchronized even if it has not changed
+        self.force = kwargs.get('force', False)
         self.load_config()
         self.message = ""
+        # set by retrieve_data if the external source has not changed since the last synchronization
+        self.unchanged = False
+        # LayerExternalState instance which is saved after the data has been saved
+        self.source_state = None
+        # set by fetch(), which might have been called already by the sync command
+        self.fetched = False
+        # seconds spent fetching and saving data
+        self.timings = {}
 
     def load_config(self, config=None):
         self.config = config or self.layer.external.config
@@ -69,21 +106,40 @@ class BaseSynchronizer(object):
         """ anything that should be executed after the import is complete goes here """
         pass
 
+    def fetch(self):
+        """
+        retrieves and parses the external data,
+        does not write to the database so it can run in a worker thread (see the sync command)
+        """
+        start = time.time()
+        self.retrieve_data()
+        if not self.unchanged:
+            self.parse()
+        self.fetched = True
+        self.timings['fetch'] = time.time() - start
+
     def sync(self):
         """
         This is the method that does everything automatically (at least attempts to).
 
         Steps:
             0. Call "before_start" method (which might be implemented by children classes)
-            1. Retrieve data from external source
-            2. Parse the data
-            3. Save the data locally
+            1. Retrieve data from external source (unless already fetched)
+            2. Parse the data (unless already fetched)
+            3. Save the data locally (in a transaction)
             4. Call "after_complete" method (which might be implemented by children classes)
+
+        Steps 2, 3 and 4 are skipped if the external source has not changed since the last synchronization.
         """
         self.before_start()
-        self.retrieve_data()
-        self.parse()
+        if not self.fetched:
+            self.fetch()
+
+        if self.unchanged:
+            self.message = 'external source unchanged since last synchronization, nothing to do'
+            return [self.message]
 
+        start = time.time()
         # TRICK: disable new_nodes_allowed_for_layer validation
         try:
             Node._additional_validation.remove('new_nodes_allowed_for_layer')
@@ -92,15 +148,24 @@ class BaseSynchronizer(object):
         # avoid sending zillions of notifications
         pause_disconnectable_signals()
 
-        self.save()
-
-        # Re-enable new_nodes_allowed_for_layer validation
         try:
-            Node._additional_validation.insert(0, 'new_nodes_allowed_for_layer')
-        except ValueError as e:
-            print "WARNING! got exception: %s" % e
-        # reconnect signals
-        resume_disconnectable_signals()
+            # coalesce the remaining signals and cache invalidation at the end
+            # (after the changes of the layer have been committed)
+            with nodeshot_batch():
+                with transaction.atomic():
+                    self.save()
+                    # the next synchronization can be skipped if the source does not change
+                    if self.source_state is not None:
+                        self.source_state.save()
+        finally:
+            # Re-enable new_nodes_allowed_for_layer validation
+            try:
+                Node._additional_validation.insert(0, 'new_nodes_allowed_for_layer')
+            except ValueError as e:
+                print "WARNING! got exception: %s" % e
+            # reconnect signals
+            resume_disconnectable_signals()
+        self.timings['save'] = time.time() - start
 
         self.after_complete()
 
@@ -125,15 +190,67 @@ class BaseSynchronizer(object):
 
 
 class HttpRetrieverMixin(object):
-    """ Retrieve external data through HTTP """
+    """
+    Retrieve external data through HTTP
+
+    ETag, Last-Modified and hash of the content retrieved in the last synchronization
+    are stored in LayerExternalState, if the source has not changed the synchronization is skipped
+
+    If stream is True the body of the response is not downloaded by retrieve_data,
+    parse must read it incrementally from self.response
+    """
+    stream = False
 
     def retrieve_data(self):
         """ retrieve data from an HTTP URL """
         # shortcuts for readability
         url = self.config.get('url')
-
-        # do HTTP request and store content
-        self.data = requests.get(url, verify=self.verify_ssl).content
+        state = self.get_source_state()
+        # caching info is valid only if the configuration (URL, field mapping, ecc) has not changed
+        config_hash = hashlib.sha1(repr((self.layer.external.synchronizer_path,
+                                         sorted(self.config.items())))).hexdigest()
+        conditional = state.config_hash == config_hash and not self.force
+
+        headers = {}
+        if conditional and state.etag:
+            headers['If-None-Match'] = state.etag
+        if conditional and state.last_modified:
+            headers['If-Modified-Since'] = state.last_modified
+
+        # do HTTP request
+        response = get_session().get(url, headers=headers, verify=self.verify_ssl, stream=self.stream)
+
+        if conditional and response.status_code == 304:
+            self.unchanged = True
+            return
+
+        if self.stream:
+            # content is read while it is parsed, its hash can't be compared in advance
+            self.response = response
+            content_hash = ''
+        else:
+            # store content
+            self.data = response.content
+            content_hash = hashlib.sha1(self.data).hexdigest()
+
+            # some servers do not support conditional requests
+            if conditional and state.content_hash == content_hash:
+                self.unchanged = True
+                return
+
+        state.config_hash = config_hash
+        state.etag = response.headers.get('ETag', '')
+        state.last_modified = response.headers.get('Last-Modified', '')
+        state.content_hash = content_hash
+        self.source_state = state
+
+    def get_source_state(self):
+        """ returns the LayerExternalState of the layer (unsaved if the layer has never been synchronized) """
+        external = self.layer.external
+        try:
+            return external.state
+        except LayerExternalState.DoesNotExist:
+            return LayerExternalState(external=external)
 
 
 class XMLParserMixin(object):
@@ -161,6 +278,77 @@ class XMLParserMixin(object):
             return ''
 
 
+class XMLStreamParserMixin(object):
+    """
+    Streaming XML Parsing utility methods
+
+    Items are parsed with iterparse into compact dictionaries of tag/text pairs
+    which are passed to parse_item, the DOM of the whole document is never built
+    """
+    # name of the tag of the elements which represent items
+    item_tag = 'item'
+
+    def parse(self):
+        """ parse data lazily, items are parsed one at a time while they are saved """
+        self.parsed_data = self.iter_items(self.data, self.item_tag)
+
+    @staticmethod
+    def iter_items(data, item_tag):
+        """
+        yields a dictionary for each element named item_tag found in data
+
+        keys are the names of the descendants of the item written as in the document (eg: "georss:point"),
+        values are their text content, if a tag appears more than once the first one is used
+        """
+        namespaces = {}
+        # elements which are being parsed
+        stack = []
+
+        for event, value in iterparse(StringIO(data), events=('start-ns', 'start', 'end')):
+            if event == 'start-ns':
+                prefix, uri = value
+                namespaces[uri] = prefix
+                continue
+            if event == 'start':
+                stack.append(value)
+                continue
+            stack.pop()
+
+            if _qualified_name(value.tag, namespaces) != item_tag:
+                continue
+
+            item = {}
+            for element in value.iter():
+                if element is not value:
+                    item.setdefault(_qualified_name(element.tag, namespaces), element.text or '')
+            yield item
+
+            # free memory used by the item
+            value.clear()
+            if stack:
+                stack[-1].remove(value)
+
+    @staticmethod
+    def get_text(item, tag, default=False):
+        """ returns text content of an xml tag """
+        try:
+            return unicode(item[tag])
+        except KeyError as e:
+            if default is not False:
+                return default
+            else:
+                raise IndexError(e)
+
+
+def _qualified_name(tag, namespaces):
+    """ converts tags in the form of "{uri}name" to "prefix:name" """
+    if not tag.startswith('{'):
+        return tag
+    uri, name = tag[1:].split('}', 1)
+    prefix = namespaces.get(uri)
+    return '%s:%s' % (prefix, name) if prefix else name
+
+
 class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
     """
     Base Synchronizer for GIS formats like geojson, georss, kml, ecc
@@ -330,6 +518,17 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
         """
         raise NotImplementedError("Not Implemented")
 
+    def _get_user(self, username):
+        """ returns the user with the specified username or None (users are looked up once) """
+        if not hasattr(self, '_users'):
+            self._users = {}
+        if username not in self._users:
+            try:
+                self._users[username] = User.objects.get(username=username)
+            except User.DoesNotExist:
+                self._users[username] = None
+        return self._users[username]
+
     def _convert_item(self, item):
         """
         take a parsed item as input and returns a python dictionary
@@ -348,13 +547,7 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
             item['status'] = self.default_status
 
         # get status or get default status or None
-        try:
-            item['status'] = Status.objects.get(slug__iexact=item['status'])
-        except Status.DoesNotExist:
-            try:
-                item['status'] = Status.objects.filter(is_default=True)[0]
-            except IndexError:
-                item['status'] = None
+        item['status'] = Status.get_cached(slug=item['status']) or Status.get_default()
 
         # slugify slug
         item['slug'] = slugify(item['name'])
@@ -366,10 +559,7 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
             item['is_published'] = ''
 
         # get user or None
-        try:
-            item['user'] = User.objects.get(username=item['user'])
-        except User.DoesNotExist:
-            item['user'] = None
+        item['user'] = self._get_user(item['user'])
 
         if not item['elev']:
             item['elev'] = None
@@ -437,30 +627,40 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
          3. delete old data
          4. generate report that will be printed
 
+        items are processed in chunks of CHUNK_SIZE: the nodes of the layer which correspond
+        to the items of a chunk are loaded with one query and compared in memory with the items,
+        then the differences are applied with one bulk insert and one transaction of updates;
+        nodes which are not found in external items are deleted at the end
+
         constraints:
          * ensure new nodes do not take a name/slug which is already used
          * validate through django before saving
          * use good defaults
         """
         self.key_mapping()
-        # retrieve all items
+        # retrieve all items (might be parsed lazily)
         items = self.parsed_data
 
-        # init empty lists
-        added_nodes = []
-        changed_nodes = []
-        unmodified_nodes = []
+        # counters
+        self.counts = {
+            'added': 0,
+            'changed': 0,
+            'unmodified': 0
+        }
+        total_items = 0
+
+        # slugs of the nodes of this layer
+        layer_slugs = set(Node.objects.filter(layer=self.layer).values_list('slug', flat=True))
+        # slugs of the nodes of other layers
+        other_layers_slugs = set(Node.objects.exclude(layer=self.layer).values_list('slug', flat=True))
+        # slugs of the external items processed so far, needed to perform delete operations
+        processed_slugs = set()
 
-        # retrieve a list of all the slugs of this layer
-        layer_nodes_slug_list = Node.objects.filter(layer=self.layer).values_list('slug', flat=True)
-        # keep a list of all the nodes of other layers
-        other_layers_slug_list = Node.objects.exclude(layer=self.layer).values_list('slug', flat=True)
-        # init empty list of slug of external nodes that will be needed to perform delete operations
-        processed_slug_list = []
-        deleted_nodes_count = 0
+        chunk = []
 
         # loop over every item
         for item in items:
+            total_items += 1
 
             item = self._convert_item(item)
 
@@ -470,7 +670,7 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
 
             while True:
                 # items might have the same name... so we add a number..
-                if item['slug'] in processed_slug_list or item['slug'] in other_layers_slug_list:
+                if item['slug'] in processed_slugs or item['slug'] in other_layers_slugs:
                     needed_different_name = True
                     number = number + 1
                     item['name'] = "%s - %d" % (original_name, number)
@@ -480,15 +680,63 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
                         self.verbose('needed a different name for %s, trying "%s"' % (original_name, item['name']))
                     break
 
+            processed_slugs.add(item['slug'])
+            chunk.append(item)
+
+            if len(chunk) >= CHUNK_SIZE:
+                self._save_chunk(chunk)
+                chunk = []
+
+        if chunk:
+            self._save_chunk(chunk)
+
+        # delete old nodes (not found in external items)
+        deleted_slugs = sorted(layer_slugs - processed_slugs)
+        for i in range(0, len(deleted_slugs), CHUNK_SIZE):
+            Node.objects.filter(layer=self.layer, slug__in=deleted_slugs[i:i + CHUNK_SIZE]).delete()
+        for slug in deleted_slugs:
+            self.verbose('node "%s" deleted' % slug)
+
+        # message that will be returned
+        self.message = """
+            %s nodes added
+            %s nodes changed
+            %s nodes deleted
+            %s nodes unmodified
+            %s total external records processed
+            %s total local nodes for this layer
+        """ % (
+            self.counts['added'],
+            self.counts['changed'],
+            len(deleted_slugs),
+            self.counts['unmodified'],
+            total_items,
+            Node.objects.filter(layer=self.layer).count()
+        )
+
+    def _save_chunk(self, items):
+        """
+        compares a chunk of converted items with the corresponding nodes of the layer,
+        then validates and saves new and changed nodes
+        """
+        added_nodes = []
+        changed_nodes = []
+
+        # nodes of this layer indexed by slug
+        layer_nodes = {}
+        for node in Node.objects.filter(layer=self.layer, slug__in=[item['slug'] for item in items]):
+            # avoid a query for each node when the layer is accessed
+            node.layer = self.layer
+            layer_nodes[node.slug] = node
+
+        for item in items:
             # default values
             added = False
             changed = False
 
-            try:
-                # edit existing node
-                node = Node.objects.get(slug=item['slug'], layer=self.layer)
-            except Node.DoesNotExist:
-                # add a new node
+            # edit existing node or add a new one
+            node = layer_nodes.get(item['slug'])
+            if node is None:
                 node = Node()
                 node.layer = self.layer
                 added = True
@@ -519,21 +767,10 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
 
             # store any additional key/value in HStore data field
             for key, value in item['data'].items():
-                if node.data[key] != value:
+                if node.data.get(key) != value:
                     node.data[key] = value
                     changed = True
 
-            # perform save or update only if necessary
-            if added or changed:
-                try:
-                    node.full_clean()
-                    if None not in [node.added, node.updated]:
-                        node.save(auto_update=False)
-                    else:
-                        node.save()
-                except Exception as e:
-                    raise Exception('error while processing "%s": %s' % (node.name, e))
-
             if added:
                 added_nodes.append(node)
                 self.verbose('new node saved with name "%s"' % node.name)
@@ -541,41 +778,39 @@ class GenericGisSynchronizer(HttpRetrieverMixin, BaseSynchronizer):
                 changed_nodes.append(node)
                 self.verbose('node "%s" updated' % node.name)
             else:
-                unmodified_nodes.append(node)
+                self.counts['unmodified'] += 1
                 self.verbose('node "%s" unmodified' % node.name)
 
-            # fill node list container
-            processed_slug_list.append(node.slug)
-
-        # delete old nodes
-        for local_node in layer_nodes_slug_list:
-            # if local node not found in external nodes
-            if local_node not in processed_slug_list:
-                # retrieve from DB and delete
-                node = Node.objects.get(slug=local_node)
-                # store node name to print it later
-                node_name = node.name
-                node.delete()
-                # then increment count that will be included in message
-                deleted_nodes_count = deleted_nodes_count + 1
-                self.verbose('node "%s" deleted' % node_name)
+        # validate and save new and changed nodes
+        self._validate_nodes(added_nodes + changed_nodes)
+        if added_nodes:
+            bulk_create_nodes(added_nodes)
+        if changed_nodes:
+            bulk_update_nodes(changed_nodes)
 
-        # message that will be returned
-        self.message = """
-            %s nodes added
-            %s nodes changed
-            %s nodes deleted
-            %s nodes unmodified
-            %s total external records processed
-            %s total local nodes for this layer
-        """ % (
-            len(added_nodes),
-            len(changed_nodes),
-            deleted_nodes_count,
-            len(unmodified_nodes),
-            len(items),
-            Node.objects.filter(layer=self.layer).count()
-        )
+        self.counts['added'] += len(added_nodes)
+        self.counts['changed'] += len(changed_nodes)
+
+    def _validate_nodes(self, nodes):
+        """
+        validates new and changed nodes all at once before anything is saved
+        (new nodes are allowed regardless of the configuration of the layer)
+        """
+        date = now()
+        for node in nodes:
+            # same as Node.save
+            if isinstance(node.geometry, GeometryCollection) and 0 < len(node.geometry) < 2:
+                node.geometry = node.geometry[0]
+            # same as BaseDate.save without auto_update
+            if None in [node.added, node.updated]:
+                node.updated = date
+            try:
+                node.clean_fields(exclude=['status', 'layer', 'user', 'search_vector'])
+            except ValidationError as e:
+                raise Exception('error while processing "%s": %s' % (node.name, e))
+        errors = Node.bulk_validation(nodes, exclude=['bulk_new_nodes_allowed_for_layer'])
+        for index, messages in sorted(errors.items()):
+            raise Exception('error while processing "%s": %s' % (nodes[index].name, ', '.join(messages)))
 
 
 class XmlSynchronizer(HttpRetrieverMixin, XMLParserMixin, BaseSynchronizer):
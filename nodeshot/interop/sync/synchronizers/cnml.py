@@ -138,7 +138,7 @@ class Cnml(GenericGisSynchronizer):
 
     def _ensure_status(self):
         for key, status_data in self.STATUS_MAPPING.items():
-            if Status.objects.filter(slug__exact=key).count() < 1:
+            if Status.get_cached(slug=key) is None:
                 new_status = Status(**status_data)
                 new_status.full_clean()
                 new_status.save()
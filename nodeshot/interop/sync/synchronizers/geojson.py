@@ -1,15 +1,91 @@
 from __future__ import absolute_import
 
+from decimal import Decimal
+
 import simplejson as json
-from django.contrib.gis.geos import GEOSGeometry
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.gis.geos import (GEOSGeometry, Point, LineString, Polygon,
+                                     MultiPoint, MultiLineString, MultiPolygon, GeometryCollection)
+from django.utils.translation import ugettext_lazy as _
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 from .base import GenericGisSynchronizer
 
 
+def _position(coordinates):
+    return tuple(float(number) for number in coordinates)
+
+
+def _positions(coordinates):
+    return [_position(position) for position in coordinates]
+
+
+def _polygon(coordinates):
+    return Polygon(*[_positions(ring) for ring in coordinates])
+
+
+def build_geometry(geometry):
+    """
+    builds a GEOS geometry directly from a GeoJSON geometry object
+    (avoids serializing the geometry back to JSON and parsing it again)
+    """
+    geometry_type = geometry['type']
+    if geometry_type == 'GeometryCollection':
+        result = GeometryCollection(*[build_geometry(member) for member in geometry['geometries']])
+    else:
+        coordinates = geometry['coordinates']
+        if geometry_type == 'Point':
+            result = Point(_position(coordinates))
+        elif geometry_type == 'LineString':
+            result = LineString(_positions(coordinates))
+        elif geometry_type == 'Polygon':
+            result = _polygon(coordinates)
+        elif geometry_type == 'MultiPoint':
+            result = MultiPoint(*[Point(_position(position)) for position in coordinates])
+        elif geometry_type == 'MultiLineString':
+            result = MultiLineString(*[LineString(_positions(line)) for line in coordinates])
+        elif geometry_type == 'MultiPolygon':
+            result = MultiPolygon(*[_polygon(polygon) for polygon in coordinates])
+        else:
+            return GEOSGeometry(json.dumps(geometry))
+    result.srid = 4326
+    return result
+
+
 class GeoJson(GenericGisSynchronizer):
     """ GeoJSON synchronizer """
+    SCHEMA = GenericGisSynchronizer.SCHEMA[0:2] + [
+        {
+            'name': 'streaming',
+            'class': 'BooleanField',
+            'kwargs': {
+                'default': False,
+                'help_text': _('Parse features while they are downloaded instead of loading the whole file '
+                               'in memory, recommended for very large files (requires ijson)')
+            }
+        }
+    ] + GenericGisSynchronizer.SCHEMA[2:]
+
+    def load_config(self, config=None):
+        super(GeoJson, self).load_config(config)
+        streaming = self.config.get('streaming', False)
+        # ensure correct boolean
+        self.stream = streaming is True or streaming == 'True'
+
+    def clean(self):
+        if self.stream and ijson is None:
+            raise ImproperlyConfigured('ijson not installed, install it with "pip install ijson"')
 
     def parse(self):
         """ parse geojson and ensure is collection """
+        if self.stream:
+            self.parsed_data = self.iter_features()
+            return
+
         try:
             self.parsed_data = json.loads(self.data)
         except Exception as e:
@@ -20,6 +96,21 @@ class GeoJson(GenericGisSynchronizer):
 
         self.parsed_data = self.parsed_data['features']
 
+    def iter_features(self):
+        """ yields the features of the collection while the body of the response is read """
+        if ijson is None:
+            raise ImproperlyConfigured('ijson not installed, install it with "pip install ijson"')
+        self.response.raw.decode_content = True
+        try:
+            for feature in ijson.items(self.response.raw, 'features.item'):
+                # ijson returns numbers as decimals
+                for key, value in feature['properties'].items():
+                    if isinstance(value, Decimal):
+                        feature['properties'][key] = float(value)
+                yield feature
+        finally:
+            self.response.close()
+
     def parse_item(self, item):
         result = {
             "name": item['properties'].pop(self.keys['name'], ''),
@@ -27,7 +118,7 @@ class GeoJson(GenericGisSynchronizer):
             "address": item['properties'].pop(self.keys['address'], ''),
             "is_published": item['properties'].pop(self.keys['is_published'], True),
             "user": item['properties'].pop(self.keys['user'], None),
-            "geometry": GEOSGeometry(json.dumps(item['geometry'])),
+            "geometry": build_geometry(item['geometry']),
             "elev": item['properties'].pop(self.keys['elev'], None),
             "description": item['properties'].pop(self.keys['description'], ''),
             "notes": item['properties'].pop(self.keys['notes'], ''),
@@ -2,10 +2,10 @@ from __future__ import absolute_import
 
 from django.contrib.gis.geos import GEOSGeometry
 from django.utils.translation import ugettext_lazy as _
-from .base import XMLParserMixin, GenericGisSynchronizer
+from .base import XMLStreamParserMixin, GenericGisSynchronizer
 
 
-class GeoRss(XMLParserMixin, GenericGisSynchronizer):
+class GeoRss(XMLStreamParserMixin, GenericGisSynchronizer):
     """ Generic GeoRSS (simple version only) synchronizer """
     SCHEMA = [
         {
@@ -161,12 +161,10 @@ class GeoRss(XMLParserMixin, GenericGisSynchronizer):
 
     def parse(self):
         """ parse data """
-        super(GeoRss, self).parse()
-
         # support RSS and ATOM
-        tag_name = 'item' if '<item>' in self.data else 'entry'
+        self.item_tag = 'item' if '<item>' in self.data else 'entry'
 
-        self.parsed_data = self.parsed_data.getElementsByTagName(tag_name)
+        super(GeoRss, self).parse()
 
     def parse_item(self, item):
         try:
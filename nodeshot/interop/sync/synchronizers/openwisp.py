@@ -1,16 +1,12 @@
 from __future__ import absolute_import
 
 from django.contrib.gis.geos import Point
-from .base import XMLParserMixin, GenericGisSynchronizer
+from .base import XMLStreamParserMixin, GenericGisSynchronizer
 
 
-class OpenWisp(XMLParserMixin, GenericGisSynchronizer):
+class OpenWisp(XMLStreamParserMixin, GenericGisSynchronizer):
     """ OpenWisp GeoRSS synchronizer class """
-
-    def parse(self):
-        """ parse data """
-        super(OpenWisp, self).parse()
-        self.parsed_data = self.parsed_data.getElementsByTagName('item')
+    item_tag = 'item'
 
     def parse_item(self, item):
         guid = self.get_text(item, 'guid')
@@ -41,3 +41,32 @@ def push_changes_to_external_layers(node, external_layer, operation):
     # call method only if supported
     if hasattr(instance, operation):
         getattr(instance, operation)(node)
+
+
+@task
+def push_many_changes_to_external_layers(changes):
+    """
+    Same as push_changes_to_external_layers for many nodes in one background job,
+    the synchronizer of each external layer is instantiated only once.
+
+    :param changes: list of (node, external_layer, operation) tuples
+    :type changes: list
+    """
+    from nodeshot.core.nodes.models import Node
+    # nodes are retrieved again with one query (see push_changes_to_external_layers)
+    nodes = Node.objects.in_bulk([node.pk for node, external_layer, operation in changes
+                                  if not isinstance(node, basestring)])
+    synchronizers = {}
+    for node, external_layer, operation in changes:
+        if not isinstance(node, basestring):
+            node = nodes.get(node.pk)
+            # deleted in the meantime
+            if node is None:
+                continue
+        if external_layer.pk not in synchronizers:
+            Synchronizer = import_by_path(external_layer.synchronizer_path)
+            synchronizers[external_layer.pk] = Synchronizer(external_layer.layer)
+        instance = synchronizers[external_layer.pk]
+        # call method only if supported
+        if hasattr(instance, operation):
+            getattr(instance, operation)(node)
@@ -1,6 +1,10 @@
+import os
 import sys
+import threading
+import simplejson as json
 
 from cStringIO import StringIO
+from unittest import skipIf
 
 from django.test import TestCase
 from django.core import management
@@ -11,10 +15,13 @@ from django.contrib.gis.geos import Point, GEOSGeometry
 from nodeshot.core.layers.models import Layer
 from nodeshot.core.nodes.models import Node, Status
 from nodeshot.core.base.tests import user_fixtures
+from nodeshot.core.base.utils import nodeshot_batch
 
-from .models import LayerExternal, NodeExternal
+from .models import LayerExternal, LayerExternalState, NodeExternal
 from .settings import settings, SYNCHRONIZERS
 from .tasks import synchronize_external_layers
+from .synchronizers import base
+from .synchronizers.geojson import build_geometry, ijson
 
 
 TEST_FILES_PATH = '%snodeshot/testing' % settings.STATIC_URL
@@ -33,6 +40,20 @@ def capture_output(command, args=[], kwargs={}):
     return output.getvalue()
 
 
+class PushSynchronizer(base.BaseSynchronizer):
+    """ records the changes pushed to the external layer """
+    pushed = []
+
+    def add(self, node):
+        self.pushed.append(('add', node.slug))
+
+    def change(self, node):
+        self.pushed.append(('change', node.slug))
+
+    def delete(self, external_id):
+        self.pushed.append(('delete', external_id))
+
+
 class SyncTest(TestCase):
     fixtures = [
         'initial_data.json',
@@ -66,6 +87,30 @@ class SyncTest(TestCase):
         n.full_clean()
         n.save()
 
+    def test_push_changes_batch(self):
+        """ changes of nodes of external layers are pushed at the end of nodeshot_batch """
+        layer = Layer.objects.get(slug='vienna')
+        external = LayerExternal(layer=layer)
+        external.synchronizer_path = 'nodeshot.interop.sync.tests.PushSynchronizer'
+        external.save()
+        layer = Layer.objects.get(pk=layer.pk)
+        PushSynchronizer.pushed = []
+        with nodeshot_batch():
+            for i in range(2):
+                Node.objects.create(name='push %d' % i, slug='push-%d' % i,
+                                    layer=layer, geometry='POINT (16.37 48.20)')
+            # not pushed until the end of the batch
+            self.assertEqual(PushSynchronizer.pushed, [])
+        self.assertEqual(sorted(PushSynchronizer.pushed), [('add', 'push-0'), ('add', 'push-1')])
+        # deletions
+        PushSynchronizer.pushed = []
+        node = Node.objects.get(slug='push-0')
+        NodeExternal.objects.create(node=node, external_id='7')
+        with nodeshot_batch():
+            Node.objects.get(pk=node.pk).delete()
+            self.assertEqual(PushSynchronizer.pushed, [])
+        self.assertEqual(PushSynchronizer.pushed, [('delete', '7')])
+
     def test_not_interoperable(self):
         """ test not interoperable """
         output = capture_output(management.call_command, ('sync', 'vienna'))
@@ -336,13 +381,33 @@ class SyncTest(TestCase):
         self.assertTrue(node.geometry.equals_exact(geometry) or node.geometry.equals(geometry))
         self.assertEqual(node.elev, 10.0)
 
-        # --- repeat --- #
+        # participation rows of synchronized nodes are created
+        from nodeshot.community.participation.models import NodeRatingCount, NodeParticipationSettings
+        self.assertEqual(NodeRatingCount.objects.filter(node__layer=layer).count(), 2)
+        self.assertEqual(NodeParticipationSettings.objects.filter(node__layer=layer).count(), 2)
+
+        # caching info of the source is stored
+        state = LayerExternalState.objects.get(external=external)
+        self.assertEqual(len(state.content_hash), 40)
+        self.assertEqual(len(state.config_hash), 40)
+
+        # --- repeat, source has not changed --- #
 
         output = capture_output(
             management.call_command,
             ['sync', 'vienna'],
             kwargs={'verbosity': 0}
         )
+        self.assertIn('external source unchanged', output)
+        self.assertNotIn('nodes unmodified', output)
+
+        # --- repeat forcing synchronization --- #
+
+        output = capture_output(
+            management.call_command,
+            ['sync', 'vienna'],
+            kwargs={'verbosity': 0, 'force': True}
+        )
 
         # ensure following text is in output
         self.assertIn('2 nodes unmodified', output)
@@ -455,7 +520,7 @@ class SyncTest(TestCase):
         output = capture_output(
             management.call_command,
             ['sync', 'vienna'],
-            kwargs={'verbosity': 0}
+            kwargs={'verbosity': 0, 'force': True}
         )
         # no changes
         self.assertIn('0 nodes added', output)
@@ -512,7 +577,7 @@ class SyncTest(TestCase):
         output = capture_output(
             management.call_command,
             ['sync', 'vienna'],
-            kwargs={'verbosity': 0}
+            kwargs={'verbosity': 0, 'force': True}
         )
 
         # ensure following text is in output
@@ -568,7 +633,7 @@ class SyncTest(TestCase):
         output = capture_output(
             management.call_command,
             ['sync', 'vienna'],
-            kwargs={'verbosity': 0}
+            kwargs={'verbosity': 0, 'force': True}
         )
 
         # ensure following text is in output
@@ -578,6 +643,160 @@ class SyncTest(TestCase):
         self.assertIn('2 total external', output)
         self.assertIn('2 total local', output)
 
+    def test_sync_workers(self):
+        """ test layers are fetched concurrently with --workers """
+        vienna = Layer.objects.get(slug='vienna')
+        vienna.new_nodes_allowed = False
+        vienna.save()
+        # second external layer
+        layer = Layer.objects.get(pk=vienna.pk)
+        layer.pk = None
+        layer.name = 'Vienna 2'
+        layer.slug = 'vienna2'
+        layer.save()
+
+        for layer, synchronizer, url in [(vienna, 'GeoJson', 'geojson1.json'),
+                                         (layer, 'OpenWisp', 'openwisp-georss.xml')]:
+            external = LayerExternal(layer=layer)
+            external.synchronizer_path = 'nodeshot.interop.sync.synchronizers.%s' % synchronizer
+            external._reload_schema()
+            external.url = '%s/%s' % (TEST_FILES_PATH, url)
+            external.full_clean()
+            external.save()
+
+        output = capture_output(
+            management.call_command,
+            ['sync', 'vienna', 'vienna2'],
+            kwargs={'verbosity': 0, 'workers': 2}
+        )
+
+        self.assertIn('2 nodes added', output)
+        self.assertIn('43 nodes added', output)
+        self.assertIn('Layer "vienna" synchronized in', output)
+        self.assertIn('Layer "vienna2" synchronized in', output)
+        self.assertEqual(Node.objects.filter(layer__slug='vienna').count(), 2)
+        self.assertEqual(Node.objects.filter(layer__slug='vienna2').count(), 43)
+
+        # HTTP sessions are not shared between threads
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(base.get_session()))
+        thread.start()
+        thread.join()
+        self.assertIs(base.get_session(), base.get_session())
+        self.assertIsNot(sessions[0], base.get_session())
+
+    def test_sync_prefetch_bounded(self):
+        """ workers fetch at most as many layers as the number of workers ahead of the one being saved """
+        from .management.commands.sync import prefetch
+
+        class FakeSynchronizer(object):
+            fetched = []
+
+            def fetch(self):
+                self.fetched.append(self)
+
+        synchronizers = [FakeSynchronizer() for i in range(10)]
+        saved = []
+        for instance, exc_info in prefetch(synchronizers, 2):
+            self.assertIsNone(exc_info)
+            saved.append(instance)
+            # the layer being saved plus the ones fetched ahead of it
+            self.assertLessEqual(len(FakeSynchronizer.fetched) - len(saved), 2)
+        self.assertEqual(sorted(saved), sorted(synchronizers))
+
+    def test_geojson_build_geometry(self):
+        """ geometries built from coordinates are the same as the ones parsed by GEOS """
+        path = os.path.join(os.path.dirname(__file__), 'static', 'nodeshot', 'testing')
+        for filename in ['geojson1.json', 'geojson2.json', 'geojson3.json', 'geojson4.json']:
+            with open(os.path.join(path, filename)) as f:
+                features = json.load(f)['features']
+            for feature in features:
+                geometry = GEOSGeometry(json.dumps(feature['geometry']))
+                built = build_geometry(feature['geometry'])
+                self.assertEqual(built.srid, geometry.srid)
+                self.assertTrue(built.equals_exact(geometry))
+
+    def test_sync_chunks(self):
+        """ items are saved in chunks """
+        layer = Layer.objects.external()[0]
+        layer.new_nodes_allowed = False
+        layer.save()
+        layer = Layer.objects.get(pk=layer.pk)
+
+        external = LayerExternal(layer=layer)
+        external.synchronizer_path = 'nodeshot.interop.sync.synchronizers.OpenWisp'
+        external._reload_schema()
+        external.url = '%s/openwisp-georss.xml' % TEST_FILES_PATH
+        external.full_clean()
+        external.save()
+
+        chunk_size = base.CHUNK_SIZE
+        base.CHUNK_SIZE = 10
+        try:
+            output = capture_output(
+                management.call_command,
+                ['sync', 'vienna'],
+                kwargs={'verbosity': 0}
+            )
+            self.assertIn('43 nodes added', output)
+            self.assertIn('43 total local', output)
+
+            external.url = '%s/openwisp-georss2.xml' % TEST_FILES_PATH
+            external.full_clean()
+            external.save()
+
+            output = capture_output(
+                management.call_command,
+                ['sync', 'vienna'],
+                kwargs={'verbosity': 0}
+            )
+            self.assertIn('5 nodes unmodified', output)
+            self.assertIn('38 nodes deleted', output)
+            self.assertIn('5 total local', output)
+        finally:
+            base.CHUNK_SIZE = chunk_size
+
+    @skipIf(ijson is None, 'ijson not installed')
+    def test_geojson_streaming_sync(self):
+        """ test GeoJSON sync in streaming mode """
+        layer = Layer.objects.external()[0]
+        layer.new_nodes_allowed = False
+        layer.save()
+        layer = Layer.objects.get(pk=layer.pk)
+
+        external = LayerExternal(layer=layer)
+        external.synchronizer_path = 'nodeshot.interop.sync.synchronizers.GeoJson'
+        external._reload_schema()
+        external.url = '%s/geojson1.json' % TEST_FILES_PATH
+        external.streaming = True
+        external.full_clean()
+        external.save()
+
+        output = capture_output(
+            management.call_command,
+            ['sync', 'vienna'],
+            kwargs={'verbosity': 0}
+        )
+
+        self.assertIn('2 nodes added', output)
+        self.assertIn('2 total external', output)
+        node = Node.objects.get(slug='simplegeojson')
+        self.assertEqual(node.elev, 10.0)
+
+        external.url = '%s/geojson2.json' % TEST_FILES_PATH
+        external.full_clean()
+        external.save()
+
+        output = capture_output(
+            management.call_command,
+            ['sync', 'vienna'],
+            kwargs={'verbosity': 0}
+        )
+
+        self.assertIn('1 nodes unmodified', output)
+        self.assertIn('1 nodes changed', output)
+        self.assertIn('2 total local', output)
+
     def test_nodeshot_sync(self):
         layer = Layer.objects.external()[0]
         layer.new_nodes_allowed = True
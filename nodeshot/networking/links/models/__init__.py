@@ -32,3 +32,44 @@ ExtensibleNodeSerializer.add_relationship(**{
     'view_name': 'api_node_links',
     'lookup_field': 'slug'
 })
+
+
+# ------ Signals ------ #
+
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from nodeshot.core.base.cache import invalidate_tags
+from nodeshot.core.base.utils import call_after_batch, in_batch
+from nodeshot.core.layers.models import LayerStats
+
+
+def refresh_layer_links_count(layer_ids, create=True):
+    """ stores the number of links of the specified layers in their statistics """
+    layer_ids = set(layer_id for layer_id in layer_ids if layer_id)
+    for layer_id in layer_ids:
+        LayerStats.refresh_links(layer_id, Link.objects.filter(layer_id=layer_id).count(), create=create)
+    if layer_ids:
+        invalidate_tags('layer_stats')
+
+
+@receiver(post_save, sender=Link)
+def link_saved_layer_stats(sender, instance, created, **kwargs):
+    """ updates the number of links of the layer (and of the previous layer if it changed) incrementally """
+    old_layer_id = None if created else instance._current_layer_id
+    if old_layer_id == instance.layer_id:
+        return
+    if in_batch():
+        call_after_batch(refresh_layer_links_count, [instance.layer_id, old_layer_id])
+        return
+    # missing statistics are created by counting the links
+    if instance.layer_id and not LayerStats.update_links(instance.layer_id, 1):
+        refresh_layer_links_count([instance.layer_id])
+    if old_layer_id:
+        LayerStats.update_links(old_layer_id, -1)
+    invalidate_tags('layer_stats')
+
+
+@receiver(post_delete, sender=Link)
+def link_deleted_layer_stats(sender, instance, **kwargs):
+    # the layer itself might be being deleted, in that case its stats must not be created again
+    call_after_batch(refresh_layer_links_count, [instance.layer_id], create=False)
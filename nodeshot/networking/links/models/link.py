@@ -80,6 +80,9 @@ class Link(BaseAccessLevel):
     # django manager
     objects = LinkManager()
 
+    # needed to update the statistics of the previous layer when the layer changes
+    _current_layer_id = None
+
     class Meta:
         app_label = 'links'
 
@@ -113,6 +116,12 @@ class Link(BaseAccessLevel):
             raise ValidationError(_('link cannot be between of interfaces of different types:\
                                     interface a is "%s" while b is "%s"') % format_tuple)
 
+    def __init__(self, *args, **kwargs):
+        """ Fill _current_layer_id """
+        super(Link, self).__init__(*args, **kwargs)
+        if self.pk:
+            self._current_layer_id = self.layer_id
+
     def save(self, *args, **kwargs):
         """
         Custom save does the following:
@@ -167,6 +176,8 @@ class Link(BaseAccessLevel):
             self.data['layer_slug'] = self.layer.slug
 
         super(Link, self).save(*args, **kwargs)
+        # update _current_layer_id
+        self._current_layer_id = self.layer_id
 
     @classmethod
     def find_from_tuple(cls, link):
@@ -4,7 +4,7 @@ from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 
 from nodeshot.core.base.tests import BaseTestCase
-from nodeshot.core.base.tests import user_fixtures
+from nodeshot.core.base.tests import user_fixtures, streamed_json
 from nodeshot.networking.net.models import Interface
 
 from .models import Link, Topology
@@ -173,7 +173,7 @@ class LinkTest(BaseTestCase):
         url = reverse('api_links_geojson_list')
         response = self.client.get(url)
         self.assertEquals(response.status_code, 200)
-        self.assertEqual(len(response.data['features']), 2)
+        self.assertEqual(len(streamed_json(response)['features']), 2)
         # GET: 200 - link details
         url = reverse('api_link_details', args=[link.id])
         response = self.client.get(url)
@@ -183,6 +183,12 @@ class LinkTest(BaseTestCase):
         response = self.client.get(url)
         self.assertEquals(response.status_code, 200)
 
+    def test_link_list_cursor_pagination(self):
+        self.link.save()
+        expected = Link.objects.access_level_up_to('public').order_by('id').values_list('id', flat=True)
+        self.assertEqual(len(expected), 2)
+        self.assertCursorPagination(reverse('api_link_list'), expected, limit=1)
+
     def test_node_links_api(self):
         link = self.link
         link.save()
@@ -4,21 +4,24 @@ from django.db.models import Q
 
 from rest_framework import authentication, generics
 
-from nodeshot.core.base.mixins import ACLMixin
+from nodeshot.core.base.mixins import (ACLMixin, StreamingGeoJSONMixin, ConditionalGetMixin,
+                                      CursorPaginationMixin)
 from nodeshot.core.nodes.models import Node
 
 from .serializers import *
 from .models import *
 
 
-class LinkList(ACLMixin, generics.ListAPIView):
+class LinkList(ConditionalGetMixin, CursorPaginationMixin, ACLMixin, generics.ListAPIView):
     """
-    Retrieve link list according to user access level
+    Retrieve link list according to user access level.
+    Supports conditional requests (ETag and Last-Modified).
 
     Parameters:
 
      * `limit=<n>`: specify number of items per page (defaults to 40)
      * `limit=0`: turns off pagination
+     * `cursor`: paginate by cursor, follow the `next` and `previous` links
     """
     authentication_classes = (authentication.SessionAuthentication,)
     queryset = Link.objects.all()
@@ -27,17 +30,26 @@ class LinkList(ACLMixin, generics.ListAPIView):
     paginate_by_param = 'limit'
     paginate_by = 40
 
+    def get_cache_tags(self):
+        """ links show the slug of their layer """
+        return ['layers']
+
 link_list = LinkList.as_view()
 
 
-class LinkGeoJSONList(ACLMixin, generics.ListAPIView):
+class LinkGeoJSONList(ConditionalGetMixin, ACLMixin, StreamingGeoJSONMixin, generics.ListAPIView):
     """
-    Retrieve link list in GeoJSON format
+    Retrieve link list in GeoJSON format.
+    Supports conditional requests (ETag and Last-Modified).
     """
     authentication_classes = (authentication.SessionAuthentication,)
     queryset = Link.objects.all()
     serializer_class = LinkListGeoJSONSerializer
 
+    def get_cache_tags(self):
+        """ links show the slug of their layer """
+        return ['layers']
+
 link_geojson_list = LinkGeoJSONList.as_view()
 
 
@@ -95,6 +95,11 @@ class NetTest(BaseTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data['results']), Device.objects.access_level_up_to('public').count())
 
+    def test_device_list_cursor_pagination(self):
+        expected = Device.objects.access_level_up_to('public').order_by('id').values_list('id', flat=True)
+        self.assertTrue(len(expected) > 2)
+        self.assertCursorPagination(reverse('api_device_list'), expected, limit=2)
+
     def test_device_list_search_api(self):
         """ API device list search """
         url = reverse('api_device_list')
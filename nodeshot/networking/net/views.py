@@ -4,7 +4,7 @@ from django.db.models import Q
 
 from rest_framework import authentication, generics
 
-from nodeshot.core.base.mixins import ACLMixin, CustomDataMixin
+from nodeshot.core.base.mixins import ACLMixin, CustomDataMixin, CursorPaginationMixin
 from nodeshot.core.nodes.models import Node
 
 from .permissions import IsOwnerOrReadOnly
@@ -15,7 +15,7 @@ from .models import *
 # ------ DEVICES ------ #
 
 
-class DeviceList(ACLMixin, generics.ListAPIView):
+class DeviceList(CursorPaginationMixin, ACLMixin, generics.ListAPIView):
     """
     Retrieve device list according to user access level
     
@@ -24,6 +24,7 @@ class DeviceList(ACLMixin, generics.ListAPIView):
      * `search=<word>`: search <word> in name, slug, description and address of nodes
      * `limit=<n>`: specify number of items per page (defaults to 40)
      * `limit=0`: turns off pagination
+     * `cursor`: paginate by cursor, follow the `next` and `previous` links
     """
     authentication_classes = (authentication.SessionAuthentication,)
     queryset = Device.objects.all().select_related('node')